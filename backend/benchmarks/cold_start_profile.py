@@ -0,0 +1,109 @@
+"""
+Cold-start profile of the Lambda handler modules.
+
+Each measurement runs in a fresh interpreter, as a Lambda cold start does:
+the handler module is imported, its AWS clients are built, and the slowest
+imports are listed from python -X importtime.
+
+    python benchmarks/cold_start_profile.py --runs 5 --top 8
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+from typing import Dict, Any, List
+
+LAMBDA_FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions')
+
+# Handler module -> AWS services its requests use
+HANDLERS = {
+    'document_processor': ['textract', 'rekognition', 's3'],
+    'face_comparison': ['rekognition', 's3'],
+    'liveness_session_manager': ['rekognition'],
+    'sanctions_screening': [],
+    'document_job_worker': ['sqs', 'lambda'],
+    'kyc_orchestrator': ['lambda', 's3']
+}
+
+# Runs inside the fresh interpreter; prints one JSON line
+MEASURE_SCRIPT = """
+import json, time, sys
+started_at = time.perf_counter()
+import {module}
+imported_at = time.perf_counter()
+loaded_modules = set(sys.modules)
+import aws_clients
+for service_name in {services!r}:
+    client = aws_clients.get_client(service_name)
+    getattr(client, 'meta')
+initialised_at = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported_at - started_at) * 1000,
+    'client_init_ms': (initialised_at - imported_at) * 1000,
+    'pil_loaded_at_import': 'PIL.Image' in loaded_modules
+}}))
+"""
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per handler')
+    parser.add_argument('--top', type=int, default=8, help='Slowest imports listed per handler')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+               KYC_METRICS_SINK='none')
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=LAMBDA_FUNCTIONS_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+def measure(module: str, services: List[str]) -> Dict[str, float]:
+    script = MEASURE_SCRIPT.format(module=module, services=services)
+    return json.loads(run_python(script).stdout.strip().splitlines()[-1])
+
+def slowest_imports(module: str, top: int) -> List[Dict[str, Any]]:
+    """
+    Parse python -X importtime output into the non-stdlib packages with the largest cumulative import time.
+    """
+    stderr = run_python(f"import {module}", '-X', 'importtime').stderr
+    packages: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        root = name.strip().split('.')[0]
+        if root == module or root in sys.stdlib_module_names or root.startswith('_'):
+            continue
+        # The first, outermost import of a package carries its full cost
+        packages[root] = max(packages.get(root, 0), int(cumulative_us))
+    ordered = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': name, 'cumulative_ms': round(micros / 1000, 1)} for name, micros in ordered]
+
+def main() -> None:
+    args = parse_args()
+    report = {}
+
+    for module, services in HANDLERS.items():
+        samples = [measure(module, services) for _ in range(args.runs)]
+        report[module] = {
+            'import_ms': round(median(sample['import_ms'] for sample in samples), 1),
+            'client_init_ms': round(median(sample['client_init_ms'] for sample in samples), 1),
+            'pil_loaded_at_import': samples[0]['pil_loaded_at_import'],
+            'slowest_imports': slowest_imports(module, args.top)
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for module, result in report.items():
+        total = result['import_ms'] + result['client_init_ms']
+        print(f"{module}: import {result['import_ms']} ms + clients {result['client_init_ms']} ms = {total:.1f} ms"
+              f" (PIL at import: {result['pil_loaded_at_import']})")
+        for entry in result['slowest_imports']:
+            print(f"    {entry['package']:<28}{entry['cumulative_ms']:>8} ms")
+
+if __name__ == '__main__':
+    main()
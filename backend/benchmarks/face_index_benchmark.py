@@ -0,0 +1,63 @@
+"""
+Search latency of the NumPy face index against index size.
+
+Fills the index with random unit vectors and times 1:N searches, reporting
+p50/p99 per size, plus enrollment throughput.
+
+    python benchmarks/face_index_benchmark.py --sizes 1000 10000 100000 --dimensions 128
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+from face_index import NumpyFaceIndex
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Index sizes to measure')
+    parser.add_argument('--dimensions', type=int, default=128, help='Face vector dimensions')
+    parser.add_argument('--queries', type=int, default=200, help='Searches per size')
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'size':>10} {'enroll/s':>12} {'search p50 ms':>14} {'search p99 ms':>14} {'MiB':>8}")
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dimensions)).astype(np.float32)
+        index = NumpyFaceIndex(embedder=lambda image_bytes: None, dimensions=args.dimensions)
+
+        started_at = time.perf_counter()
+        for row in range(size):
+            index.add_vector(f"session-{row}:0000000000000000", vectors[row])
+        enroll_rate = size / (time.perf_counter() - started_at)
+
+        # Half the queries are noisy copies of enrolled faces, so matches are returned
+        latencies = []
+        for query_number in range(args.queries):
+            if query_number % 2 == 0:
+                query = vectors[rng.integers(size)] + rng.normal(0, 0.05, args.dimensions).astype(np.float32)
+            else:
+                query = rng.standard_normal(args.dimensions).astype(np.float32)
+            started_at = time.perf_counter()
+            index.search_vector(query, threshold=90.0)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        memory_mib = index.vectors.nbytes / (1024 * 1024)
+        print(f"{size:>10} {enroll_rate:>12.0f} {percentile(latencies, 0.50):>14.3f} "
+              f"{percentile(latencies, 0.99):>14.3f} {memory_mib:>8.1f}")
+
+if __name__ == '__main__':
+    main()
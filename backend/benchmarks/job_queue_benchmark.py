@@ -0,0 +1,162 @@
+"""
+Synchronous against queued process_document during a throttling spike.
+
+The same documents go through the orchestrator twice with stubbed AWS
+clients throttling --throttle-rate of all calls:
+
+- sync: each client request runs the document inline, so a throttled
+  Textract or Rekognition call fails the request.
+- async: each request is queued on the in-process memory queue and gets a
+  ticket; a pool of --workers drains it with retries and backoff, and the
+  client polls job_status until the job is final.
+
+Reported per mode: documents processed, failures (or dead letters),
+client-facing request latency, and the time until every document was
+final. The retry and backoff delays are scaled down (--retry-base-seconds)
+so a run takes seconds rather than minutes.
+
+    python benchmarks/job_queue_benchmark.py --documents 200 --concurrency 16 --workers 4 --throttle-rate 0.2
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions'), BENCHMARKS_DIR]
+
+from stub_clients import build_images, build_stub_clients
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=200, help='Documents submitted per mode')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client requests in flight at once')
+    parser.add_argument('--workers', type=int, default=4, help='Worker threads draining the queue')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated latency of every AWS call')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Extra random latency of every AWS call')
+    parser.add_argument('--throttle-rate', type=float, default=0.2, help='Fraction of AWS calls throttled')
+    parser.add_argument('--max-attempts', type=int, default=4, help='Attempts before a job is dead-lettered')
+    parser.add_argument('--retry-base-seconds', type=float, default=0.05, help='Delay before the first retry')
+    parser.add_argument('--distinct-images', type=int, default=16, help='Distinct document images to cycle through')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def configure(args: argparse.Namespace) -> None:
+    # Read by the handler modules at import time
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.update({
+        'KYC_METRICS_SINK': 'none',
+        'KYC_DISPATCH_MODE': 'local',
+        'KYC_CACHE_ENABLED': 'false',
+        'KYC_IDEMPOTENCY_STORE': 'none',
+        'KYC_JOB_QUEUE': 'memory',
+        'KYC_JOB_WORKERS': str(args.workers),
+        'KYC_JOB_POLL_SECONDS': '0.05',
+        'KYC_JOB_MAX_ATTEMPTS': str(args.max_attempts),
+        'KYC_JOB_RETRY_BASE_SECONDS': str(args.retry_base_seconds),
+        'KYC_JOB_RETRY_MAX_SECONDS': str(args.retry_base_seconds * 16),
+        'KYC_JOB_BACKOFF_MAX_SECONDS': str(args.retry_base_seconds * 4),
+        'KYC_JOB_MAX_DEPTH': str(args.documents * 2)
+    })
+    for variable in ('DOCUMENT_BRANCH_WORKERS', 'DOCUMENT_PAGE_WORKERS', 'FACE_DOWNLOAD_WORKERS'):
+        os.environ.setdefault(variable, str(4 * max(args.concurrency, args.workers)))
+
+def document_event(mode: str, index: int, images: List[str]) -> Dict[str, Any]:
+    event = {
+        'action': 'process_document',
+        'session_id': f"{mode}-{index}",
+        'image_data': images[index % len(images)],
+        'document_type': 'passport'
+    }
+    if mode == 'async':
+        event['async'] = True
+    return event
+
+def summarize(latencies: List[float], elapsed: float, outcomes: Counter) -> Dict[str, Any]:
+    return {
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'all_final_s': round(elapsed, 2),
+        'outcomes': dict(outcomes)
+    }
+
+def run_sync(args: argparse.Namespace, images: List[str]) -> Dict[str, Any]:
+    import kyc_orchestrator
+
+    def request(index: int) -> Any:
+        started_at = time.perf_counter()
+        _, body = kyc_orchestrator.process_event(document_event('sync', index, images), None)
+        status = body['document_processing'].get('status', 'ERROR')
+        return (time.perf_counter() - started_at) * 1000, status
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(request, range(args.documents)))
+    elapsed = time.perf_counter() - started_at
+    return summarize([latency for latency, _ in results], elapsed, Counter(status for _, status in results))
+
+def run_async(args: argparse.Namespace, images: List[str]) -> Dict[str, Any]:
+    import kyc_orchestrator
+    import job_queue
+    import document_job_worker
+
+    def submit(index: int) -> Any:
+        started_at = time.perf_counter()
+        status_code, body = kyc_orchestrator.process_event(document_event('async', index, images), None)
+        return (time.perf_counter() - started_at) * 1000, status_code, body
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        tickets = list(executor.map(submit, range(args.documents)))
+
+    pending = {body['job_id']: body['session_id'] for _, status_code, body in tickets if status_code == 202}
+    outcomes = Counter(str(status_code) for _, status_code, _ in tickets if status_code != 202)
+    while pending:
+        for job_id in list(pending):
+            job = job_queue.get_job(job_id)
+            if job['state'] in job_queue.FINAL_JOB_STATES:
+                outcomes[job['state']] += 1
+                del pending[job_id]
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started_at
+
+    result = summarize([latency for latency, _, _ in tickets], elapsed, outcomes)
+    result['worker_outcomes'] = document_job_worker.start_local_pool().stats()
+    return result
+
+def main() -> None:
+    args = parse_args()
+    configure(args)
+    images = build_images(args.distinct_images)
+
+    # Stubs must be registered before the handlers build any client
+    import aws_clients
+    stubs = build_stub_clients(args.latency_ms, args.jitter_ms, default_body=base64.b64decode(images[0]),
+                               throttle_rate=args.throttle_rate)
+    for service_name, stub in stubs.items():
+        aws_clients.register_client(service_name, stub)
+
+    results = {'sync': run_sync(args, images), 'async': run_async(args, images)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.documents} documents, throttle rate {args.throttle_rate}, "
+          f"{args.concurrency} clients, {args.workers} workers, {args.max_attempts} attempts")
+    print(f"{'mode':>6}{'request p50 ms':>16}{'request p99 ms':>16}{'all final s':>13}  outcomes")
+    for mode, result in results.items():
+        print(f"{mode:>6}{result['p50_ms']:>16.2f}{result['p99_ms']:>16.2f}{result['all_final_s']:>13.2f}  "
+              f"{json.dumps(result['outcomes'])}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Offline benchmark of the KYC handlers against stubbed AWS backends.
+
+Replays synthetic events and the test_events/ fixtures through each
+handler's lambda_handler, with simulated AWS latency and throttling, and
+reports requests/s, p50/p95/p99 latency and peak RSS per scenario. Each
+scenario runs in a fresh interpreter, so peak RSS belongs to that action.
+
+    python benchmarks/kyc_benchmark.py --requests 200 --concurrency 16 --latency-ms 50
+    python benchmarks/kyc_benchmark.py --save-baseline
+    python benchmarks/kyc_benchmark.py --compare    # exits 1 on a regression
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import argparse
+import resource
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Tuple
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_FUNCTIONS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions')
+TEST_EVENTS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'test_events')
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baselines', 'kyc_benchmark.json')
+
+sys.path.insert(0, LAMBDA_FUNCTIONS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from stub_clients import build_images, build_stub_clients
+
+class BenchmarkContext:
+    """
+    Stand-in for the Lambda context object with a fixed timeout per invocation.
+    """
+
+    def __init__(self, function_name: str, timeout_seconds: float = 60.0):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int((self.deadline - time.monotonic()) * 1000), 0)
+
+def load_fixture(name: str) -> Dict[str, Any]:
+    with open(os.path.join(TEST_EVENTS_DIR, name)) as fixture:
+        return json.load(fixture)
+
+def document_event(index: int, images: List[str]) -> Dict[str, Any]:
+    return {
+        'session_id': f"bench-{index}",
+        'image_data': images[index % len(images)],
+        'document_type': 'passport'
+    }
+
+# Image -> the same capture out of focus, built once per image
+blurred_images: Dict[str, str] = {}
+
+def blur_image(image_data: str) -> str:
+    import io
+    from PIL import Image, ImageFilter
+
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(base64.b64decode(image_data))).filter(ImageFilter.GaussianBlur(6)).save(buffer, format='JPEG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+def blurred_document_event(index: int, images: List[str]) -> Dict[str, Any]:
+    # The quality prescreen rejects these before any AWS call
+    image_data = images[index % len(images)]
+    if image_data not in blurred_images:
+        blurred_images[image_data] = blur_image(image_data)
+    return dict(document_event(index, images), image_data=blurred_images[image_data])
+
+def document_pages_event(index: int, images: List[str]) -> Dict[str, Any]:
+    # Three pages take two analyze_id calls, run concurrently
+    return {
+        'session_id': f"bench-{index}",
+        'pages': [images[(index + page) % len(images)] for page in range(3)],
+        'document_type': 'drivers-license'
+    }
+
+def face_comparison_event(index: int, images: List[str]) -> Dict[str, Any]:
+    return {
+        'session_id': f"bench-{index}",
+        'id_face_s3_key': f"faces/bench-{index}/id_face.jpg",
+        'liveness_reference_s3_key': f"liveness-sessions/bench-{index}/reference.jpg",
+        's3_bucket': 'your-kyc-bucket',
+        'similarity_threshold': 95.0
+    }
+
+def liveness_results_event(index: int, images: List[str]) -> Dict[str, Any]:
+    return {'action': 'get_results', 'session_id': str(uuid.uuid4()), 's3_bucket': 'your-kyc-bucket'}
+
+def full_kyc_event(index: int, images: List[str]) -> Dict[str, Any]:
+    return {
+        'action': 'full_kyc',
+        'session_id': f"bench-{index}",
+        'liveness_session_id': str(uuid.uuid4()),
+        'image_data': images[index % len(images)],
+        'document_type': 'passport'
+    }
+
+def fixture_event(name: str) -> Callable[[int, List[str]], Dict[str, Any]]:
+    fixture = load_fixture(name)
+    return lambda index, images: dict(fixture)
+
+# Scenario -> (handler module, event builder taking (request index, document images))
+SCENARIOS: Dict[str, Tuple[str, Callable[[int, List[str]], Dict[str, Any]]]] = {
+    'document_processor.process': ('document_processor', document_event),
+    'document_processor.pages': ('document_processor', document_pages_event),
+    'document_processor.rejected': ('document_processor', blurred_document_event),
+    'document_processor.fixture': ('document_processor', fixture_event('document_processor_test.json')),
+    'face_comparison.compare': ('face_comparison', face_comparison_event),
+    'face_comparison.fixture': ('face_comparison', fixture_event('face_comparison_test.json')),
+    'liveness_session_manager.create': ('liveness_session_manager', fixture_event('liveness_session_test.json')),
+    'liveness_session_manager.get_results': ('liveness_session_manager', liveness_results_event),
+    'kyc_orchestrator.start_kyc': ('kyc_orchestrator', fixture_event('kyc_orchestrator_test.json')),
+    'kyc_orchestrator.full_kyc': ('kyc_orchestrator', full_kyc_event)
+}
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), help='Scenarios to run')
+    parser.add_argument('--requests', type=int, default=200, help='Invocations per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='Invocations in flight at once')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed invocations before measuring')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated latency of every AWS call')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Extra random latency of every AWS call')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of AWS calls throttled')
+    parser.add_argument('--distinct-images', type=int, default=16, help='Distinct document images to cycle through')
+    parser.add_argument('--cache', action='store_true', help='Leave the result cache and idempotency layer enabled')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true', help='Compare against the baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative drop in requests/s or rise in p95/p99 before a regression')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def peak_rss_mib() -> float:
+    """
+    Peak RSS of this process.
+
+    Prefers VmHWM: on Linux ru_maxrss survives exec, so a worker would report
+    its parent's peak whenever that was higher.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+def run_scenario(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run one scenario in this interpreter; called in the worker subprocess.
+    """
+    module_name, build_event = SCENARIOS[args.worker]
+    images = build_images(args.distinct_images)
+
+    # Stubs must be registered before the handlers build any client
+    import aws_clients
+    stubs = build_stub_clients(args.latency_ms, args.jitter_ms, default_body=base64.b64decode(images[0]),
+                               throttle_rate=args.throttle_rate)
+    for service_name, stub in stubs.items():
+        aws_clients.register_client(service_name, stub)
+
+    import importlib
+    handler_module = importlib.import_module(module_name)
+    function_name = module_name.replace('_', '-')
+
+    def invoke(index: int) -> Dict[str, Any]:
+        event = build_event(index, images)
+        started_at = time.perf_counter()
+        response = handler_module.lambda_handler(event, BenchmarkContext(function_name))
+        return {'status': response['statusCode'], 'latency_ms': (time.perf_counter() - started_at) * 1000}
+
+    for index in range(args.warmup):
+        invoke(args.requests + index)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        started_at = time.perf_counter()
+        results = list(executor.map(invoke, range(args.requests)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies = [result['latency_ms'] for result in results]
+    return {
+        'requests': len(results),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'peak_rss_mib': round(peak_rss_mib(), 1),
+        'status_codes': {str(code): count for code, count in sorted(Counter(r['status'] for r in results).items())},
+        'aws_calls': {name: dict(stub.call_counts) for name, stub in stubs.items() if stub.call_counts},
+        'throttled_calls': {name: dict(stub.throttle_counts) for name, stub in stubs.items() if stub.throttle_counts}
+    }
+
+def spawn_scenario(scenario: str, argv: List[str], concurrency: int) -> Dict[str, Any]:
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+               KYC_METRICS_SINK='none', KYC_DISPATCH_MODE='local')
+    # One Lambda environment serves one invocation at a time; with several in
+    # one process the shared executors are sized to match, as kyc_service does
+    for variable in ('DOCUMENT_BRANCH_WORKERS', 'DOCUMENT_PAGE_WORKERS', 'FACE_DOWNLOAD_WORKERS'):
+        env.setdefault(variable, str(4 * concurrency))
+    # Scenarios replay the same events, which would otherwise be answered from stored results
+    if '--cache' not in argv:
+        env['KYC_CACHE_ENABLED'] = 'false'
+        env['KYC_IDEMPOTENCY_STORE'] = 'none'
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, '--worker', scenario],
+                               env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        results: Scenario -> metrics from this run
+        baseline: Scenario -> metrics from the baseline file
+        tolerance: Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        One message per regressed metric
+    """
+    regressions = []
+    for scenario, result in results.items():
+        expected = baseline.get(scenario)
+        if expected is None:
+            continue
+        if result['requests_per_second'] < expected['requests_per_second'] * (1 - tolerance):
+            regressions.append(f"{scenario}: {result['requests_per_second']} requests/s "
+                               f"(baseline {expected['requests_per_second']})")
+        for metric in ('p95_ms', 'p99_ms'):
+            if result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{scenario}: {metric} {result[metric]} (baseline {expected[metric]})")
+    return regressions
+
+def main() -> None:
+    args = parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(args)))
+        return
+
+    unknown = [scenario for scenario in args.scenarios if scenario not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}; available: {', '.join(SCENARIOS)}")
+
+    # Load parameters are passed through to every worker unchanged
+    argv = [
+        '--requests', str(args.requests), '--concurrency', str(args.concurrency), '--warmup', str(args.warmup),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--throttle-rate', str(args.throttle_rate), '--distinct-images', str(args.distinct_images)
+    ] + (['--cache'] if args.cache else [])
+
+    results = {scenario: spawn_scenario(scenario, argv, args.concurrency) for scenario in args.scenarios}
+    report = {
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'throttle_rate': args.throttle_rate,
+            'cache': args.cache
+        },
+        'scenarios': results
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'scenario':<38}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MiB':>9}  status")
+        for scenario, result in results.items():
+            print(f"{scenario:<38}{result['requests_per_second']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                  f"{result['p99_ms']:>10}{result['peak_rss_mib']:>9}  {result['status_codes']}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+            baseline_file.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['config'] != report['config']:
+            print(f"Warning: baseline was recorded with {baseline['config']}")
+        regressions = find_regressions(results, baseline['scenarios'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Peak memory of document_processor against input image size.
+
+Each size runs in a fresh interpreter: the base64 event is read from disk,
+the handler runs once against the in-memory stub clients, and the growth
+of peak RSS over the interpreter's state just before the call is reported.
+Reads /proc/self/status, so it runs on Linux only.
+
+    python benchmarks/memory_benchmark.py --megapixels 1 4 12 24 --format JPEG PNG
+"""
+import os
+import io
+import sys
+import json
+import base64
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, Any
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_FUNCTIONS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions')
+
+# Runs inside the fresh interpreter; prints one JSON line
+MEASURE_SCRIPT = """
+import gc, json, sys
+sys.path[:0] = [{lambda_functions_dir!r}, {benchmarks_dir!r}]
+import aws_clients
+from stub_clients import build_stub_clients
+for service_name, stub in build_stub_clients().items():
+    aws_clients.register_client(service_name, stub)
+import document_processor
+document_processor.warm(document_processor.WARM_CLIENTS, document_processor.WARM_IMPORTS)
+with open({event_path!r}) as event_file:
+    event = json.load(event_file)
+gc.collect()
+
+def read_status_mib(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+
+# Reset the peak (VmHWM) to the current RSS, so it measures the handler alone
+with open('/proc/self/clear_refs', 'w') as clear_refs:
+    clear_refs.write('5')
+before_mib = read_status_mib('VmRSS')
+status_code, body = document_processor.process_event(event, None)
+peak_mib = read_status_mib('VmHWM')
+print(json.dumps({{
+    'status_code': status_code,
+    'baseline_rss_mib': before_mib,
+    'peak_rss_mib': peak_mib,
+    'handler_peak_mib': peak_mib - before_mib
+}}))
+"""
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', type=float, nargs='*', default=[1, 4, 12, 24], help='Input sizes')
+    parser.add_argument('--format', nargs='*', default=['JPEG', 'PNG'], help='Input encodings')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def build_event(megapixels: float, image_format: str) -> Dict[str, Any]:
+    """
+    Build a document event with a noisy image, so encoded sizes resemble real scans.
+    """
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # Noise tiled from a small block keeps generation fast but defeats compression
+    tile = Image.effect_noise((256, 256), 64).convert('RGB')
+    img = Image.new('RGB', (width, height))
+    for left in range(0, width, 256):
+        for top in range(0, height, 256):
+            img.paste(tile, (left, top))
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, quality=92) if image_format == 'JPEG' else img.save(buffer, format=image_format)
+    return {
+        'session_id': f"memory-{megapixels}-{image_format}",
+        'document_type': 'passport',
+        'image_data': base64.b64encode(buffer.getvalue()).decode()
+    }
+
+def measure(event: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as event_file:
+        json.dump(event, event_file)
+    try:
+        script = MEASURE_SCRIPT.format(lambda_functions_dir=LAMBDA_FUNCTIONS_DIR, benchmarks_dir=BENCHMARKS_DIR,
+                                       event_path=event_file.name)
+        env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+                   KYC_METRICS_SINK='none', KYC_CACHE_ENABLED='false')
+        completed = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+    finally:
+        os.unlink(event_file.name)
+
+def main() -> None:
+    args = parse_args()
+    results = []
+
+    for image_format in args.format:
+        for megapixels in args.megapixels:
+            event = build_event(megapixels, image_format)
+            base64_mib = len(event['image_data']) / (1024 * 1024)
+            result = measure(event)
+            results.append(dict(result, format=image_format, megapixels=megapixels, base64_mib=round(base64_mib, 2)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'format':<8}{'MP':>6}{'base64 MiB':>12}{'handler peak MiB':>18}{'peak RSS MiB':>14}  status")
+    for result in results:
+        print(f"{result['format']:<8}{result['megapixels']:>6g}{result['base64_mib']:>12.2f}"
+              f"{result['handler_peak_mib']:>18.1f}{result['peak_rss_mib']:>14.1f}  {result['status_code']}")
+
+if __name__ == '__main__':
+    main()
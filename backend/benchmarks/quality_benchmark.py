@@ -0,0 +1,101 @@
+"""
+Cost of the image-quality prescreen against image size.
+
+For each size a synthetic document capture is decoded once, then
+assess_quality is timed over several runs on the full-size image, so the
+cost per megapixel of the stage itself is visible. document_processor runs
+it on the prepared image, which is capped at IMAGE_MAX_DIMENSION, so in
+the handler the cost stops growing above that size. prepare_ms (decode,
+downscale and re-encode of the same upload) is shown for scale.
+
+    python benchmarks/quality_benchmark.py --megapixels 1 3 12 24 --runs 50
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Any, List
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions'), BENCHMARKS_DIR]
+os.environ.setdefault('KYC_METRICS_SINK', 'none')
+
+from image_preparation import prepare_image
+from image_quality import assess_quality
+from stub_clients import build_images
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', type=float, nargs='*', default=[1, 3, 12, 24], help='Input sizes')
+    parser.add_argument('--runs', type=int, default=50, help='Timed assessments per size')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def build_capture(megapixels: float) -> bytes:
+    """
+    Encode a synthetic document capture of the given size as JPEG.
+    """
+    import base64
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    # Drawn small and scaled up, so every size shows the same document
+    img = Image.open(io.BytesIO(base64.b64decode(build_images(1, (1200, 800))[0])))
+    img = img.resize((width, height), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+def measure(megapixels: float, runs: int) -> Dict[str, Any]:
+    from PIL import Image
+
+    capture = build_capture(megapixels)
+    image = Image.open(io.BytesIO(capture)).convert('RGB')
+
+    # The first assessment imports NumPy; it is not part of the per-image cost
+    report = assess_quality(image, image.size)
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        assess_quality(image, image.size)
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    started_at = time.perf_counter()
+    prepare_image(capture)
+    prepare_ms = (time.perf_counter() - started_at) * 1000
+
+    actual_megapixels = image.size[0] * image.size[1] / 1_000_000
+    p50_ms = percentile(timings, 0.5)
+    return {
+        'megapixels': round(actual_megapixels, 2),
+        'dimensions': list(image.size),
+        'p50_ms': round(p50_ms, 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'ms_per_megapixel': round(p50_ms / actual_megapixels, 3),
+        'prepare_ms': round(prepare_ms, 2),
+        'passed': report['passed']
+    }
+
+def main() -> None:
+    args = parse_args()
+    results = [measure(megapixels, args.runs) for megapixels in args.megapixels]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'MP':>6}{'dimensions':>13}{'p50 ms':>9}{'p95 ms':>9}{'ms/MP':>8}{'prepare ms':>12}  passed")
+    for result in results:
+        dimensions = 'x'.join(str(value) for value in result['dimensions'])
+        print(f"{result['megapixels']:>6g}{dimensions:>13}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+              f"{result['ms_per_megapixel']:>8.3f}{result['prepare_ms']:>12.2f}  {result['passed']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+final_verification latency with and without the resilience layer.
+
+Each mode runs in a fresh interpreter (KYC_RESILIENCE=false, then true)
+against stubbed AWS clients, through the orchestrator's final_verification
+action: two S3 downloads and a compare_faces call per request.
+
+- tail: --tail-rate of all calls stall for an extra --tail-ms, as the
+  occasional slow get_object or compare_faces does. Hedging answers those
+  requests from a duplicate call instead of waiting on the stalled one.
+- outage: Rekognition then stalls on every call for --outage-ms. Without
+  the layer each request waits it out; with it, calls time out at a
+  multiple of the learned p99 and the circuit breaker then fails requests
+  fast with a retryable 503.
+
+Reported per mode and phase: p50/p99 latency, status codes, and AWS calls
+per request (the cost of hedging).
+
+    python benchmarks/resilience_benchmark.py --requests 400 --concurrency 8 --tail-rate 0.02 --tail-ms 1000
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions'), BENCHMARKS_DIR]
+
+from stub_clients import build_images, build_stub_clients
+
+# Mode -> value of KYC_RESILIENCE in its interpreter
+MODES = {'baseline': 'false', 'resilient': 'true'}
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400, help='Measured requests in the tail phase')
+    parser.add_argument('--outage-requests', type=int, default=100, help='Measured requests in the outage phase')
+    parser.add_argument('--warmup', type=int, default=100, help='Untimed requests before measuring')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated latency of every AWS call')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Extra random latency of every AWS call')
+    parser.add_argument('--tail-rate', type=float, default=0.02, help='Fraction of AWS calls that stall')
+    parser.add_argument('--tail-ms', type=float, default=1000.0, help='Extra latency of a stalled call')
+    parser.add_argument('--outage-ms', type=float, default=2000.0, help='Latency of every Rekognition call during the outage')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--worker', choices=list(MODES), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def verification_event(index: int) -> Dict[str, Any]:
+    return {
+        'action': 'final_verification',
+        'session_id': f"bench-{index}",
+        'id_face_s3_key': f"faces/bench-{index}/id_face.jpg",
+        'liveness_reference_s3_key': f"liveness-sessions/bench-{index}/reference.jpg"
+    }
+
+def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run both phases in this interpreter; called in the worker subprocess.
+    """
+    images = build_images(1)
+
+    # Stubs must be registered before the handlers build any client
+    import aws_clients
+    stubs = build_stub_clients(args.latency_ms, args.jitter_ms, default_body=base64.b64decode(images[0]),
+                               tail_rate=args.tail_rate, tail_ms=args.tail_ms)
+    for service_name, stub in stubs.items():
+        aws_clients.register_client(service_name, stub)
+
+    import kyc_orchestrator
+    import resilience
+
+    def request(index: int) -> Any:
+        started_at = time.perf_counter()
+        status_code, _ = kyc_orchestrator.process_event(verification_event(index), None)
+        return (time.perf_counter() - started_at) * 1000, status_code
+
+    def run_phase(first_index: int, count: int) -> Dict[str, Any]:
+        calls_before = {name: sum(stub.call_counts.values()) for name, stub in stubs.items()}
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(request, range(first_index, first_index + count)))
+        latencies = [latency for latency, _ in results]
+        calls = sum(sum(stub.call_counts.values()) - calls_before[name] for name, stub in stubs.items())
+        return {
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(max(latencies), 2),
+            'status_codes': {str(code): n for code, n in sorted(Counter(code for _, code in results).items())},
+            'aws_calls_per_request': round(calls / count, 2)
+        }
+
+    # Teaches the layer each operation's latency before anything is measured
+    run_phase(0, args.warmup)
+    results = {'tail': run_phase(args.warmup, args.requests)}
+
+    stubs['rekognition'].tail_rate = 1.0
+    stubs['rekognition'].tail_ms = args.outage_ms
+    results['outage'] = run_phase(args.warmup + args.requests, args.outage_requests)
+
+    if resilience.resilience_layer is not None:
+        results['operations'] = resilience.resilience_layer.stats()
+    return results
+
+def spawn_mode(mode: str, argv: List[str], concurrency: int) -> Dict[str, Any]:
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+               KYC_METRICS_SINK='none', KYC_DISPATCH_MODE='local', KYC_CACHE_ENABLED='false',
+               KYC_IDEMPOTENCY_STORE='none', KYC_RESILIENCE=MODES[mode])
+    env.setdefault('FACE_DOWNLOAD_WORKERS', str(4 * concurrency))
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, '--worker', mode],
+                               env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Mode {mode} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    args = parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    argv = [arg for arg in sys.argv[1:] if arg != '--json']
+    results = {mode: spawn_mode(mode, argv, args.concurrency) for mode in MODES}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"final_verification, {args.concurrency} clients, {args.latency_ms:.0f} ms calls, "
+          f"{args.tail_rate:.0%} stalled by {args.tail_ms:.0f} ms, outage {args.outage_ms:.0f} ms")
+    print(f"{'mode':>10}{'phase':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'calls/req':>11}  status codes")
+    for mode, result in results.items():
+        for phase in ('tail', 'outage'):
+            row = result[phase]
+            print(f"{mode:>10}{phase:>8}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+                  f"{row['aws_calls_per_request']:>11.2f}  {json.dumps(row['status_codes'])}")
+
+if __name__ == '__main__':
+    main()
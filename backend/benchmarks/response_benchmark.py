@@ -0,0 +1,172 @@
+"""
+Serialized size and encode time of face comparison and liveness responses.
+
+Builds responses shaped like the Rekognition results the handlers pass on
+(faces with landmarks, pose and quality; liveness audit images) and, for
+each verbosity level, reports:
+
+- the encoded size,
+- the time to encode it once, as create_response does,
+- the time of the two-hop path through the orchestrator in remote dispatch
+  mode: the handler encodes, the orchestrator decodes and re-encodes, and
+  the client decodes.
+
+Encoders: "json" is json.dumps as create_response used it before,
+"codec-json" is json_codec on the standard library, "codec-orjson" is
+json_codec on orjson (when installed). Only the codec encoders handle the
+image bytes of a liveness session without S3 output.
+
+    python benchmarks/response_benchmark.py --faces 4 --audit-images 5 --iterations 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Dict, Any, Callable, Optional, Tuple
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARKS_DIR, '..', 'lambda_functions'), BENCHMARKS_DIR]
+
+os.environ.setdefault('KYC_METRICS_SINK', 'none')
+
+import json_codec
+from response_shaping import VERBOSITY_LEVELS, shape_face_comparison_response, shape_liveness_results
+
+LANDMARK_TYPES = ['eyeLeft', 'eyeRight', 'mouthLeft', 'mouthRight', 'nose']
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faces', type=int, default=4, help='Unmatched faces in the compared image')
+    parser.add_argument('--audit-images', type=int, default=5, help='Audit images of the liveness session')
+    parser.add_argument('--image-kib', type=int, default=40, help='Size of each image returned as bytes')
+    parser.add_argument('--iterations', type=int, default=2000, help='Encodes timed per case')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def build_face() -> Dict[str, Any]:
+    return {
+        'BoundingBox': {key: random.random() for key in ('Width', 'Height', 'Left', 'Top')},
+        'Confidence': 99.0 + random.random(),
+        'Landmarks': [{'Type': kind, 'X': random.random(), 'Y': random.random()} for kind in LANDMARK_TYPES],
+        'Pose': {'Roll': random.uniform(-10, 10), 'Yaw': random.uniform(-10, 10), 'Pitch': random.uniform(-10, 10)},
+        'Quality': {'Brightness': random.uniform(40, 90), 'Sharpness': random.uniform(40, 90)}
+    }
+
+def build_face_comparison(faces: int) -> Dict[str, Any]:
+    face_matches = [{'Similarity': 99.2, 'Face': build_face()}]
+    unmatched_faces = [build_face() for _ in range(faces)]
+    return {
+        'session_id': 'bench-session',
+        'face_comparison': {
+            'is_match': True,
+            'similarity_score': 99.2,
+            'face_matches': face_matches,
+            'unmatched_faces': unmatched_faces,
+            'source_image_face_count': 1,
+            'target_image_face_count': len(face_matches) + len(unmatched_faces)
+        },
+        'comparison_source': 'compare_faces',
+        'image_source': 'bytes',
+        'id_face_s3_key': 'faces/bench-session/id_face.jpg',
+        'candidate_rank': 1,
+        'verification_passed': True,
+        'status': 'COMPLETED'
+    }
+
+def build_image(name: str, image_bytes: Optional[bytes]) -> Dict[str, Any]:
+    image = {'BoundingBox': {key: random.random() for key in ('Width', 'Height', 'Left', 'Top')}}
+    if image_bytes is not None:
+        image['Bytes'] = image_bytes
+    else:
+        image['S3Object'] = {'Bucket': 'your-kyc-bucket', 'Name': f"liveness-sessions/bench-session/{name}.jpg"}
+    return image
+
+def build_liveness_results(audit_images: int, image_bytes: Optional[bytes]) -> Dict[str, Any]:
+    return {
+        'session_id': 'bench-session',
+        'status': 'SUCCEEDED',
+        'confidence': 98.7,
+        'reference_image': build_image('reference', image_bytes),
+        'audit_images': [build_image(f"audit-{index}", image_bytes) for index in range(audit_images)],
+        'challenge': {'Type': 'FaceMovementAndLightChallenge', 'Version': '1.0'}
+    }
+
+def build_encoders() -> Dict[str, Tuple[Callable[[Any], str], Callable[[str], Any]]]:
+    """
+    Encoder name -> (encode, decode).
+    """
+    def codec(use_orjson: bool) -> Tuple[Callable[[Any], str], Callable[[str], Any]]:
+        def encode(value: Any) -> str:
+            json_codec.USE_ORJSON = use_orjson
+            return json_codec.dumps(value)
+
+        def decode(data: str) -> Any:
+            json_codec.USE_ORJSON = use_orjson
+            return json_codec.loads(data)
+        return encode, decode
+
+    encoders = {'json': (json.dumps, json.loads), 'codec-json': codec(False)}
+    if json_codec.orjson is not None:
+        encoders['codec-orjson'] = codec(True)
+    return encoders
+
+def time_per_call_us(fn: Callable[[], Any], iterations: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started_at) / iterations * 1e6
+
+def measure(body: Dict[str, Any], encoder: Callable[[Any], str], decoder: Callable[[str], Any],
+            iterations: int) -> Optional[Dict[str, Any]]:
+    try:
+        encoded = encoder(body)
+    except TypeError:
+        return None
+
+    def two_hops() -> None:
+        # Handler response -> orchestrator -> client
+        handler_body = decoder(encoder(body))
+        decoder(encoder({'statusCode': 200, 'body': encoder(handler_body)}))
+
+    return {
+        'bytes': len(encoded.encode('utf-8')),
+        'encode_us': round(time_per_call_us(lambda: encoder(body), iterations), 1),
+        'two_hops_us': round(time_per_call_us(two_hops, max(iterations // 4, 1)), 1)
+    }
+
+def main() -> None:
+    args = parse_args()
+    random.seed(7)
+    image_bytes = os.urandom(args.image_kib * 1024)
+    cases = {
+        'face_comparison': (build_face_comparison(args.faces), shape_face_comparison_response),
+        'liveness': (build_liveness_results(args.audit_images, None), shape_liveness_results),
+        'liveness.bytes': (build_liveness_results(args.audit_images, image_bytes), shape_liveness_results)
+    }
+    encoders = build_encoders()
+
+    results: Dict[str, Any] = {}
+    for case, (body, shaper) in cases.items():
+        for verbosity in reversed(VERBOSITY_LEVELS):
+            shaped = shaper(body, verbosity)
+            results[f"{case}.{verbosity}"] = {
+                name: measure(shaped, encode, decode, args.iterations) for name, (encode, decode) in encoders.items()
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.faces + 1} faces, {args.audit_images} audit images, {args.image_kib} KiB images as bytes")
+    print(f"{'case':>24}{'encoder':>14}{'bytes':>10}{'encode us':>12}{'two hops us':>14}")
+    for case, by_encoder in results.items():
+        for name, row in by_encoder.items():
+            if row is None:
+                print(f"{case:>24}{name:>14}{'not encodable':>36}")
+                continue
+            print(f"{case:>24}{name:>14}{row['bytes']:>10}{row['encode_us']:>12.1f}{row['two_hops_us']:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Screening latency of the sanctions index against list size.
+
+For each size a synthetic watchlist (names built from a shared pool of
+given names and surnames, some with aliases and birth years) is written as
+a snapshot and memory-mapped. Two kinds of query are timed:
+
+- listed: a listed name with one typo, its tokens shuffled and sometimes a
+  middle name dropped. Recall is the share found above the threshold.
+- unlisted: a name of fresh tokens from the same syllables, so any hit is
+  a spurious fuzzy match rather than a namesake; the FP rate is their
+  hit rate.
+
+For scale, one pure-Python Jaro-Winkler pass over --naive-size names is
+timed and extrapolated to each list size.
+
+    python benchmarks/sanctions_benchmark.py --sizes 10000 100000 500000 --queries 400
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+os.environ.setdefault('KYC_METRICS_SINK', 'none')
+os.environ.setdefault('SANCTIONS_INDEX_PATH', '')
+
+from sanctions_index import SANCTIONS_MATCH_THRESHOLD, SanctionsIndex, build_snapshot, normalize_tokens
+
+SYLLABLES = ['al', 'an', 'ar', 'ba', 'de', 'di', 'el', 'fa', 'ga', 'ha', 'ib', 'ka', 'ko', 'la', 'li', 'ma',
+             'mo', 'na', 'ni', 'ol', 'or', 'pe', 'ra', 'ri', 'sa', 'se', 'ta', 'to', 'va', 'vi', 'ya', 'zu']
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000], help='List sizes (entries)')
+    parser.add_argument('--queries', type=int, default=400, help='Queries per size, half listed and half unlisted')
+    parser.add_argument('--naive-size', type=int, default=5000, help='Names in the pure-Python comparison pass')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def make_token(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+class NameGenerator:
+    """
+    Names drawn from fixed pools, so common given names and surnames recur across the list as in real ones.
+    """
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.given_names = [make_token(rng) for _ in range(3000)]
+        self.surnames = [make_token(rng) for _ in range(30000)]
+
+    def name(self) -> str:
+        # Skewed draws: low indexes are far more common
+        given = [self.given_names[int(len(self.given_names) * self.rng.random() ** 3)]
+                 for _ in range(self.rng.choice([1, 1, 2, 3]))]
+        return ' '.join(given + [self.surnames[int(len(self.surnames) * self.rng.random() ** 2)]])
+
+def misspell(name: str, rng: random.Random) -> str:
+    """
+    The name with one character substituted, deleted or transposed in its longest token.
+    """
+    tokens = name.split()
+    index = max(range(len(tokens)), key=lambda position: len(tokens[position]))
+    token = tokens[index]
+    position = rng.randrange(1, len(token) - 1)
+    edit = rng.choice(['substitute', 'delete', 'transpose'])
+    if edit == 'substitute':
+        token = token[:position] + rng.choice('aeiou') + token[position + 1:]
+    elif edit == 'delete':
+        token = token[:position] + token[position + 1:]
+    else:
+        token = token[:position - 1] + token[position] + token[position - 1] + token[position + 1:]
+    tokens[index] = token
+    return ' '.join(tokens)
+
+def build_entities(size: int, names: NameGenerator, rng: random.Random) -> List[Dict[str, Any]]:
+    entities = []
+    for number in range(size):
+        entity = {'entity_id': f"SYN-{number}", 'name': names.name(), 'source': rng.choice(['OFAC', 'UN', 'EU'])}
+        if rng.random() < 0.3:
+            entity['aliases'] = [misspell(entity['name'], rng) for _ in range(rng.randint(1, 2))]
+        if rng.random() < 0.6:
+            entity['birth_year'] = rng.randint(1940, 2000)
+        entities.append(entity)
+    return entities
+
+def listed_query(entity: Dict[str, Any], rng: random.Random) -> str:
+    tokens = misspell(entity['name'], rng).split()
+    if len(tokens) > 2 and rng.random() < 0.3:
+        del tokens[rng.randrange(1, len(tokens) - 1)]
+    rng.shuffle(tokens)
+    return ' '.join(tokens)
+
+def naive_jaro_winkler(a: str, b: str) -> float:
+    """
+    Textbook scalar Jaro-Winkler, as a per-name Python loop would run it.
+    """
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    b_used = [False] * len(b)
+    a_matched = []
+    for index, character in enumerate(a):
+        for other in range(max(0, index - window), min(len(b), index + window + 1)):
+            if not b_used[other] and b[other] == character:
+                b_used[other] = True
+                a_matched.append(character)
+                break
+    matches = len(a_matched)
+    if matches == 0:
+        return 0.0
+    b_matched = [character for character, used in zip(b, b_used) if used]
+    transpositions = sum(x != y for x, y in zip(a_matched, b_matched)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro) if jaro > 0.7 else jaro
+
+def measure_naive(names: NameGenerator, size: int, rng: random.Random) -> float:
+    """
+    Milliseconds per listed name for a pure-Python scan.
+    """
+    listed = [' '.join(normalize_tokens(names.name())) for _ in range(size)]
+    query = ' '.join(normalize_tokens(names.name()))
+    started_at = time.perf_counter()
+    for name in listed:
+        naive_jaro_winkler(query, name)
+    return (time.perf_counter() - started_at) * 1000 / size
+
+def measure(size: int, args: argparse.Namespace, naive_ms_per_name: float, work_dir: str) -> Dict[str, Any]:
+    rng = random.Random(args.seed + size)
+    names = NameGenerator(rng)
+    entities = build_entities(size, names, rng)
+
+    path = os.path.join(work_dir, f"index-{size}")
+    started_at = time.perf_counter()
+    manifest = build_snapshot(entities, path)
+    build_seconds = time.perf_counter() - started_at
+    snapshot_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+    started_at = time.perf_counter()
+    index = SanctionsIndex.load(path)
+    load_ms = (time.perf_counter() - started_at) * 1000
+
+    latencies = []
+    found = 0
+    unlisted_hits = 0
+    listed_count = args.queries // 2
+    for query_number in range(args.queries):
+        if query_number < listed_count:
+            entity = entities[rng.randrange(size)]
+            query = listed_query(entity, rng)
+        else:
+            entity = None
+            query = ' '.join(make_token(rng) for _ in range(rng.randint(2, 3)))
+
+        started_at = time.perf_counter()
+        matches = index.screen(query)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+
+        if entity is not None:
+            found += any(match['entity_id'] == entity['entity_id'] for match in matches)
+        else:
+            unlisted_hits += bool(matches)
+
+    return {
+        'size': size,
+        'names': manifest['row_count'],
+        'build_s': round(build_seconds, 2),
+        'snapshot_mib': round(snapshot_bytes / (1024 * 1024), 1),
+        'load_ms': round(load_ms, 2),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'recall': round(found / listed_count, 3),
+        'unlisted_hit_rate': round(unlisted_hits / (args.queries - listed_count), 3),
+        'naive_ms': round(naive_ms_per_name * manifest['row_count'], 1)
+    }
+
+def main() -> None:
+    args = parse_args()
+    naive_ms_per_name = measure_naive(NameGenerator(random.Random(args.seed)), args.naive_size, random.Random(args.seed))
+
+    work_dir = tempfile.mkdtemp(prefix='sanctions-benchmark-')
+    try:
+        results = [measure(size, args, naive_ms_per_name, work_dir) for size in args.sizes]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"threshold {SANCTIONS_MATCH_THRESHOLD}; naive is a pure-Python scan, extrapolated")
+    print(f"{'entries':>9}{'names':>9}{'build s':>9}{'MiB':>7}{'load ms':>9}{'p50 ms':>8}{'p95 ms':>8}"
+          f"{'p99 ms':>8}{'recall':>8}{'FP rate':>9}{'naive ms':>10}")
+    for result in results:
+        print(f"{result['size']:>9}{result['names']:>9}{result['build_s']:>9.2f}{result['snapshot_mib']:>7.1f}"
+              f"{result['load_ms']:>9.2f}{result['p50_ms']:>8.2f}{result['p95_ms']:>8.2f}{result['p99_ms']:>8.2f}"
+              f"{result['recall']:>8.3f}{result['unlisted_hit_rate']:>9.3f}{result['naive_ms']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Local load test for the KYC service with stubbed AWS clients.
+
+Drives start_kyc + full_kyc verifications through the ASGI app in-process,
+with simulated AWS latency, and reports throughput and latency percentiles.
+
+    python benchmarks/service_load_test.py --requests 500 --concurrency 200 --latency-ms 150
+"""
+import os
+import sys
+import time
+import base64
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_clients import build_images, build_stub_clients
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='Verifications to run')
+    parser.add_argument('--concurrency', type=int, default=100, help='Verifications in flight at once')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='Simulated latency of every AWS call')
+    parser.add_argument('--jitter-ms', type=float, default=50.0, help='Extra random latency of every AWS call')
+    parser.add_argument('--workers', type=int, default=64, help='KYC_SERVICE_WORKERS for the service')
+    parser.add_argument('--distinct-images', type=int, default=16, help='Distinct document images to cycle through')
+    parser.add_argument('--cache', action='store_true', help='Leave the result cache enabled')
+    return parser.parse_args()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_verification(client: Any, image_data: str) -> Dict[str, Any]:
+    started_at = time.perf_counter()
+    start = await client.post('/kyc/start_kyc', json={})
+    if start.status_code != 200:
+        return {'status': start.status_code, 'latency_ms': (time.perf_counter() - started_at) * 1000}
+
+    session = start.json()
+    response = await client.post('/kyc/full_kyc', json={
+        'session_id': session['session_id'],
+        'liveness_session_id': session['liveness_session_id'],
+        'image_data': image_data
+    })
+    return {'status': response.status_code, 'latency_ms': (time.perf_counter() - started_at) * 1000}
+
+async def run_load(args: argparse.Namespace, app: Any, images: List[str]) -> List[Dict[str, Any]]:
+    import httpx
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://kyc-service', timeout=None) as client:
+            async def bounded(index: int) -> Dict[str, Any]:
+                async with semaphore:
+                    return await run_verification(client, images[index % len(images)])
+
+            return await asyncio.gather(*(bounded(index) for index in range(args.requests)))
+
+def main() -> None:
+    args = parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['KYC_SERVICE_WORKERS'] = str(args.workers)
+    os.environ.setdefault('KYC_METRICS_SINK', 'none')
+    if not args.cache:
+        os.environ['KYC_CACHE_ENABLED'] = 'false'
+
+    images = build_images(args.distinct_images)
+
+    # Stubs must be registered before the handler modules bind their clients
+    import aws_clients
+    stubs = build_stub_clients(args.latency_ms, args.jitter_ms, default_body=base64.b64decode(images[0]))
+    for service_name, stub in stubs.items():
+        aws_clients.register_client(service_name, stub)
+
+    from kyc_service import app
+
+    started_at = time.perf_counter()
+    results = asyncio.run(run_load(args, app, images))
+    elapsed = time.perf_counter() - started_at
+
+    latencies = [result['latency_ms'] for result in results]
+    statuses = Counter(result['status'] for result in results)
+
+    print(f"verifications:      {len(results)} (concurrency {args.concurrency}, {args.workers} workers)")
+    print(f"aws latency:        {args.latency_ms:.0f} ms + up to {args.jitter_ms:.0f} ms jitter")
+    print(f"elapsed:            {elapsed:.2f} s")
+    print(f"throughput:         {len(results) / elapsed:.1f} verifications/s")
+    print(f"latency p50:        {percentile(latencies, 0.50):.1f} ms")
+    print(f"latency p95:        {percentile(latencies, 0.95):.1f} ms")
+    print(f"latency p99:        {percentile(latencies, 0.99):.1f} ms")
+    print(f"status codes:       {dict(statuses)}")
+    for service_name, stub in stubs.items():
+        print(f"{service_name + ' calls:':<20}{stub.call_counts}")
+
+if __name__ == '__main__':
+    main()
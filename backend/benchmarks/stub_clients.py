@@ -0,0 +1,190 @@
+import io
+import time
+import uuid
+import base64
+import random
+import threading
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from botocore.exceptions import ClientError
+
+class StubClient:
+    """
+    Thread-safe stand-in for a boto3 client with simulated network latency.
+
+    botocore's Stubber queues responses for one caller at a time; load tests
+    need every worker thread to get a canned response concurrently.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, throttle_rate: float = 0.0,
+                 tail_rate: float = 0.0, tail_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.failure_rate = failure_rate
+        self.call_counts: Dict[str, int] = {}
+        self.throttle_counts: Dict[str, int] = {}
+        self.meta = SimpleNamespace(region_name='us-east-1')
+        self._lock = threading.Lock()
+
+    def _call(self, operation: str) -> None:
+        with self._lock:
+            self.call_counts[operation] = self.call_counts.get(operation, 0) + 1
+        delay_ms = self.latency_ms + random.uniform(0, self.jitter_ms)
+        # A few calls stall, as a slow host or a retried connection does
+        if self.tail_rate > 0 and random.random() < self.tail_rate:
+            delay_ms += self.tail_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+        # Throttled calls still pay the round trip, as they do against AWS
+        if self.throttle_rate > 0 and random.random() < self.throttle_rate:
+            with self._lock:
+                self.throttle_counts[operation] = self.throttle_counts.get(operation, 0) + 1
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation)
+        if self.failure_rate > 0 and random.random() < self.failure_rate:
+            raise ClientError({'Error': {'Code': 'ServiceUnavailable', 'Message': 'Service unavailable'},
+                               'ResponseMetadata': {'HTTPStatusCode': 503}}, operation)
+
+class StubTextractClient(StubClient):
+    def analyze_id(self, DocumentPages: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Dict[str, Any]:
+        self._call('analyze_id')
+        # One identity document per page, as Textract returns for front and back
+        return {
+            'IdentityDocuments': [{
+                'DocumentIndex': index + 1,
+                'IdentityDocumentFields': [
+                    {'Type': {'Text': 'FIRST_NAME'}, 'ValueDetection': {'Text': 'JANE', 'Confidence': 99.0}},
+                    {'Type': {'Text': 'LAST_NAME'}, 'ValueDetection': {'Text': 'DOE', 'Confidence': 98.5}},
+                    {'Type': {'Text': 'DOCUMENT_NUMBER'}, 'ValueDetection': {'Text': 'X1234567', 'Confidence': 97.0 - index}}
+                ]
+            } for index in range(len(DocumentPages or [None]))]
+        }
+
+class StubRekognitionClient(StubClient):
+    def detect_faces(self, **kwargs) -> Dict[str, Any]:
+        self._call('detect_faces')
+        # A passport: the faint ghost image is listed before the portrait
+        return {
+            'FaceDetails': [{
+                'BoundingBox': {'Width': 0.08, 'Height': 0.12, 'Left': 0.7, 'Top': 0.5},
+                'Confidence': 97.2,
+                'Pose': {'Yaw': 3.1, 'Pitch': -2.0, 'Roll': 0.4},
+                'Quality': {'Brightness': 81.0, 'Sharpness': 20.0}
+            }, {
+                'BoundingBox': {'Width': 0.2, 'Height': 0.3, 'Left': 0.1, 'Top': 0.1},
+                'Confidence': 99.5,
+                'Pose': {'Yaw': -4.5, 'Pitch': 1.2, 'Roll': -0.8},
+                'Quality': {'Brightness': 55.0, 'Sharpness': 78.0}
+            }]
+        }
+
+    def compare_faces(self, **kwargs) -> Dict[str, Any]:
+        self._call('compare_faces')
+        return {
+            'FaceMatches': [{'Similarity': 99.1, 'Face': {'Confidence': 99.9}}],
+            'UnmatchedFaces': [],
+            'SourceImageFace': {'Confidence': 99.9}
+        }
+
+    def create_face_liveness_session(self, **kwargs) -> Dict[str, Any]:
+        self._call('create_face_liveness_session')
+        return {'SessionId': str(uuid.uuid4())}
+
+    def get_face_liveness_session_results(self, SessionId: str, **kwargs) -> Dict[str, Any]:
+        self._call('get_face_liveness_session_results')
+        return {
+            'SessionId': SessionId,
+            'Status': 'SUCCEEDED',
+            'Confidence': 98.7,
+            'ReferenceImage': {
+                'S3Object': {'Bucket': 'your-kyc-bucket', 'Name': f"liveness-sessions/{SessionId}/reference.jpg"}
+            }
+        }
+
+class StubS3Client(StubClient):
+    """
+    S3 stand-in keeping objects in memory, so written objects can be read back.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, throttle_rate: float = 0.0,
+                 default_body: bytes = b'', **kwargs):
+        super().__init__(latency_ms, jitter_ms, throttle_rate, **kwargs)
+        self.objects: Dict[str, bytes] = {}
+        self.default_body = default_body
+
+    def put_object(self, Bucket: str, Key: str, Body: Any, **kwargs) -> Dict[str, Any]:
+        self._call('put_object')
+        with self._lock:
+            if hasattr(Body, 'read'):
+                Body = Body.read()
+            self.objects[f"{Bucket}/{Key}"] = Body.encode() if isinstance(Body, str) else bytes(Body)
+        return {'ETag': '"stub"'}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        self._call('get_object')
+        with self._lock:
+            body = self.objects.get(f"{Bucket}/{Key}", self.default_body)
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+    def get_bucket_location(self, Bucket: str, **kwargs) -> Dict[str, Any]:
+        self._call('get_bucket_location')
+        # Reported as a different region so face_comparison exercises the download path
+        return {'LocationConstraint': 'stub-region'}
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Optional[Dict[str, Any]] = None,
+                               ExpiresIn: int = 3600, **kwargs) -> str:
+        params = Params or {}
+        return f"https://{params.get('Bucket')}.s3.amazonaws.com/{params.get('Key')}?X-Amz-Expires={ExpiresIn}"
+
+def build_stub_clients(latency_ms: float = 0.0, jitter_ms: float = 0.0, default_body: bytes = b'',
+                       throttle_rate: float = 0.0, tail_rate: float = 0.0, tail_ms: float = 0.0,
+                       failure_rate: float = 0.0) -> Dict[str, StubClient]:
+    """
+    Build one stub client per AWS service used by the handlers.
+
+    Args:
+        latency_ms: Simulated round-trip time of every call
+        jitter_ms: Extra uniformly distributed delay added to every call
+        default_body: Body returned by get_object for keys that were never written
+        throttle_rate: Fraction of calls rejected with ThrottlingException
+        tail_rate: Fraction of calls delayed by an extra tail_ms
+        tail_ms: Extra delay of the slow calls
+        failure_rate: Fraction of calls failing with ServiceUnavailable (503)
+
+    Returns:
+        Service name -> stub client, ready for aws_clients.register_client
+    """
+    faults = {'tail_rate': tail_rate, 'tail_ms': tail_ms, 'failure_rate': failure_rate}
+    return {
+        'textract': StubTextractClient(latency_ms, jitter_ms, throttle_rate, **faults),
+        'rekognition': StubRekognitionClient(latency_ms, jitter_ms, throttle_rate, **faults),
+        's3': StubS3Client(latency_ms, jitter_ms, throttle_rate, default_body, **faults)
+    }
+
+def build_images(count: int, size: tuple = (1200, 800)) -> List[str]:
+    """
+    Build distinct base64-encoded JPEG document images, so content-hash caches see different inputs.
+
+    Each is a card with a portrait and lines of text on a darker background,
+    so it passes the quality prescreen like a usable capture.
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    images = []
+    for index in range(count):
+        img = Image.new('RGB', size, (70, 60, 50))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([width * 0.1, height * 0.1, width * 0.9, height * 0.9], fill=(225, 220, (205 + index) % 256))
+        draw.rectangle([width * 0.15, height * 0.25, width * 0.4, height * 0.8], fill=(150, 120, 100))
+        for line in range(10):
+            draw.text((width * 0.45, height * (0.25 + line * 0.05)), f"ID {index:06d} LINE {line} SURNAME GIVEN NAMES",
+                      fill=(20, 20, 30))
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85)
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+    return images
@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+
+from instrumentation import instrument_client, metrics
+from rate_limiter import rate_limiter
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# HTTP connections kept per client; botocore's default of 10 serialises
+# concurrent calls once more than 10 threads share a client
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50'))
+
+# Retry mode for every client; "adaptive" adds client-side rate limiting on throttles
+RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'standard')
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '3'))
+
+# Client-side parameter validation costs CPU on every call; AWS validates again server-side
+PARAMETER_VALIDATION = os.environ.get('AWS_PARAMETER_VALIDATION', 'true').lower() == 'true'
+
+# Per-service Config overrides. S3 reads here are small images, so a stalled
+# connection is cut off and retried instead of waiting out botocore's 60 s default.
+SERVICE_CONFIGS = {
+    's3': {
+        'connect_timeout': float(os.environ.get('AWS_S3_CONNECT_TIMEOUT', '2')),
+        'read_timeout': float(os.environ.get('AWS_S3_READ_TIMEOUT', '10')),
+        'tcp_keepalive': True
+    }
+}
+
+# Error codes of an S3 read of a key that does not exist. Without
+# s3:ListBucket on the bucket, S3 answers 403 AccessDenied instead of 404
+MISSING_OBJECT_ERROR_CODES = {'NoSuchKey', 'NotFound', '404', 'AccessDenied', '403'}
+
+# Service name -> client, shared by every handler in the process
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+def build_client_config(service_name: Optional[str] = None) -> Any:
+    # Imported here: botocore.config pulls in most of botocore, which requests
+    # answered from validation errors or caches never need
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        retries={'mode': RETRY_MODE, 'max_attempts': MAX_ATTEMPTS},
+        parameter_validation=PARAMETER_VALIDATION,
+        **SERVICE_CONFIGS.get(service_name, {})
+    )
+
+def build_client(service_name: str) -> Any:
+    import boto3
+
+    started_at = time.perf_counter()
+    # Rate limiting registers first so call timings exclude the wait for a token
+    client = rate_limiter.attach(boto3.client(service_name, config=build_client_config(service_name)))
+    metrics.record('client_init_ms', (time.perf_counter() - started_at) * 1000)
+    return instrument_client(client)
+
+def get_client(service_name: str) -> Any:
+    """
+    Get the shared boto3 client for an AWS service.
+
+    boto3 clients are thread-safe, so one pooled client per service serves
+    every handler and worker thread in the process instead of each module
+    opening its own connections. Configured APIs are rate-limited through
+    the shared token buckets in rate_limiter.
+
+    Args:
+        service_name: boto3 service name, e.g. "textract"
+
+    Returns:
+        Instrumented boto3 client
+    """
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+
+    with _lock:
+        if service_name not in _clients:
+            _clients[service_name] = build_client(service_name)
+        return _clients[service_name]
+
+class LazyClient:
+    """
+    Module-level stand-in for a shared client, built on first attribute access.
+
+    Handler modules bind these at import time, so importing a handler costs
+    nothing for AWS clients (or for boto3 itself) until a request needs them.
+    """
+
+    def __init__(self, service_name: str):
+        self._service_name = service_name
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_client(self._service_name), name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._service_name!r})"
+
+def lazy_client(service_name: str) -> LazyClient:
+    """
+    Get a lazily built handle on the shared client for an AWS service.
+
+    Args:
+        service_name: boto3 service name, e.g. "textract"
+
+    Returns:
+        LazyClient forwarding every attribute to get_client(service_name)
+    """
+    return LazyClient(service_name)
+
+def is_missing_object(error: Exception) -> bool:
+    """
+    Check whether an S3 get_object or head_object error means the key is not there.
+
+    Args:
+        error: Error raised by the call
+
+    Returns:
+        True for 404/NoSuchKey, and for the 403 S3 returns instead without s3:ListBucket
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return False
+    error_code = str(response.get('Error', {}).get('Code', ''))
+    status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return error_code in MISSING_OBJECT_ERROR_CODES or status_code in (403, 404)
+
+def warm_clients(service_names: List[str]) -> Dict[str, float]:
+    """
+    Build the shared clients for the given services ahead of the first request.
+
+    Args:
+        service_names: boto3 service names
+
+    Returns:
+        Service name -> milliseconds spent building it (0 when it already existed)
+    """
+    timings = {}
+    for service_name in service_names:
+        started_at = time.perf_counter()
+        get_client(service_name)
+        timings[service_name] = round((time.perf_counter() - started_at) * 1000, 2)
+    return timings
+
+def register_client(service_name: str, client: Any) -> None:
+    """
+    Replace the shared client for a service, e.g. with a stub for load tests.
+
+    Takes effect for every LazyClient, including those bound before the call.
+
+    Args:
+        service_name: boto3 service name
+        client: Object exposing the client methods the handlers call
+    """
+    with _lock:
+        _clients[service_name] = client
@@ -0,0 +1,355 @@
+import json
+import os
+import uuid
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+from cors_helper import create_response
+from document_processor import (
+    extract_document_fields,
+    detect_and_crop_face,
+    s3_client
+)
+from image_preparation import decode_base64, prepare_image
+from result_cache import hash_image
+from throttling import AdaptiveBackoff
+from instrumentation import ContextThreadPoolExecutor, instrument_handler
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Default and upper bound for concurrent items per invocation
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '8'))
+MAX_CONCURRENCY_LIMIT = 64
+
+# No new item is started once the invocation has less time left than
+# TIME_SAFETY_FRACTION of the time it started with (at most
+# TIME_SAFETY_MARGIN_MS), so items in flight finish and the manifest is
+# completed before the Lambda timeout, however short the timeout is
+TIME_SAFETY_FRACTION = float(os.environ.get('BATCH_TIME_SAFETY_FRACTION', '0.2'))
+TIME_SAFETY_MARGIN_MS = int(os.environ.get('BATCH_TIME_SAFETY_MARGIN_MS', '30000'))
+
+# S3 multipart parts must be at least 5 MiB, except the last one
+MANIFEST_PART_SIZE = 5 * 1024 * 1024
+
+class ManifestWriter:
+    """
+    Streams JSON Lines records to S3 through a multipart upload.
+
+    Records are buffered until a full part is available, so memory use stays at
+    roughly one part no matter how many items the batch contains.
+    """
+
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+        self.buffer = bytearray()
+        self.parts = []
+        self.upload_id = None
+        self.record_count = 0
+        self.completed = False
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.buffer.extend(json.dumps(record).encode('utf-8') + b'\n')
+        self.record_count += 1
+        if len(self.buffer) >= MANIFEST_PART_SIZE:
+            self._flush_part()
+
+    def _flush_part(self) -> None:
+        if self.upload_id is None:
+            response = s3_client.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType='application/x-ndjson'
+            )
+            self.upload_id = response['UploadId']
+
+        part_number = len(self.parts) + 1
+        response = s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=self.buffer
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        # botocore accepts the bytearray itself, so parts are sent without a copy;
+        # it is replaced rather than cleared in case a retry still holds it
+        self.buffer = bytearray()
+
+    def close(self) -> None:
+        # Small manifests never start a multipart upload
+        if self.upload_id is None:
+            s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=self.buffer,
+                ContentType='application/x-ndjson'
+            )
+            self.completed = True
+            return
+
+        if self.buffer:
+            self._flush_part()
+        s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        self.completed = True
+
+    def abort(self) -> None:
+        # Nothing to do once closed: the manifest is complete
+        if self.upload_id is None or self.completed:
+            return
+        try:
+            s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            # The bucket's lifecycle rule removes parts left behind
+            logger.error(f"Error aborting manifest upload {self.key}: {str(e)}")
+
+def load_item_image(item: Dict[str, Any], s3_bucket: str) -> bytes:
+    """
+    Load the raw image bytes for a batch item.
+
+    Args:
+        item: Batch item with either "image_data" (base64) or "s3_key"
+        s3_bucket: Bucket used for items referenced by S3 key
+
+    Returns:
+        Raw image bytes
+    """
+    if item.get('image_data'):
+        return decode_base64(item['image_data'])
+    if item.get('s3_key'):
+        response = s3_client.get_object(Bucket=item.get('s3_bucket', s3_bucket), Key=item['s3_key'])
+        return response['Body'].read()
+    raise ValueError('Batch item requires image_data or s3_key')
+
+def process_batch_item(item: Dict[str, Any], item_session_id: str, s3_bucket: str,
+                       textract_backoff: AdaptiveBackoff, rekognition_backoff: AdaptiveBackoff) -> Dict[str, Any]:
+    """
+    Process a single batch item, retrying throttled AWS calls.
+
+    Args:
+        item: Batch item with either "image_data" or "s3_key"
+        item_session_id: Session identifier used for the cropped face key
+        s3_bucket: Bucket used for items referenced by S3 key
+        textract_backoff: Backoff shared by all Textract calls in the batch
+        rekognition_backoff: Backoff shared by all Rekognition calls in the batch
+
+    Returns:
+        Manifest record for the item
+    """
+    record = {
+        'item_id': item.get('item_id', item_session_id),
+        'session_id': item_session_id,
+        's3_key': item.get('s3_key')
+    }
+
+    try:
+        image_bytes = load_item_image(item, s3_bucket)
+        image_hash = hash_image(image_bytes)
+        prepared_image = prepare_image(image_bytes)
+        del image_bytes
+
+        record['extracted_fields'] = textract_backoff.call(
+            extract_document_fields, prepared_image.image_bytes, image_hash
+        )
+        face_result = rekognition_backoff.call(
+            detect_and_crop_face, prepared_image.image_bytes, item_session_id, prepared_image.image, image_hash
+        )
+        record['face_detected'] = face_result['face_s3_key'] is not None
+        record['face_s3_key'] = face_result['face_s3_key']
+        record['face_candidates'] = face_result['face_candidates']
+        record['status'] = 'PROCESSED'
+
+    except Exception as e:
+        logger.error(f"Error processing batch item {record['item_id']}: {str(e)}")
+        record['status'] = 'FAILED'
+        record['error'] = str(e)
+
+    return record
+
+def get_remaining_ms(context: Any) -> Optional[int]:
+    # Without a Lambda context there is no deadline
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return context.get_remaining_time_in_millis()
+
+def get_safety_margin_ms(context: Any) -> Optional[float]:
+    """
+    Time to keep back for the items in flight and the manifest, from the time the invocation has left.
+
+    Args:
+        context: Lambda context, read once at the start of the batch
+
+    Returns:
+        Margin in milliseconds, or None without a deadline
+    """
+    remaining_ms = get_remaining_ms(context)
+    if remaining_ms is None:
+        return None
+    return min(remaining_ms * TIME_SAFETY_FRACTION, TIME_SAFETY_MARGIN_MS)
+
+def run_batch(batch_id: str, items: List[Dict[str, Any]], s3_bucket: str, manifest: ManifestWriter,
+              max_concurrency: int, cursor: int = 0, context: Any = None) -> Tuple[int, int, Optional[int]]:
+    """
+    Process items with at most max_concurrency in flight, streaming results to the manifest.
+
+    Stops starting items once the invocation is within its safety margin
+    (get_safety_margin_ms) of its timeout; items already started are
+    finished and written. The first item always starts, so every
+    invocation of a resumed batch makes progress.
+
+    Args:
+        batch_id: Batch identifier, used to derive per-item session IDs
+        items: Batch items
+        s3_bucket: Bucket used for items referenced by S3 key
+        manifest: Manifest writer receiving one record per item
+        max_concurrency: Maximum number of items processed at once
+        cursor: Index of the first item to process
+        context: Lambda context, for the remaining time
+
+    Returns:
+        Tuple of (processed_count, failed_count, next_cursor); next_cursor is
+        the index of the first item not processed, or None when all were
+    """
+    textract_backoff = AdaptiveBackoff()
+    rekognition_backoff = AdaptiveBackoff()
+    processed_count = 0
+    failed_count = 0
+    next_cursor = None
+    safety_margin_ms = get_safety_margin_ms(context)
+
+    with ContextThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='batch-item') as executor:
+        pending = set()
+        for index in range(cursor, len(items)):
+            if index > cursor and safety_margin_ms is not None and get_remaining_ms(context) < safety_margin_ms:
+                next_cursor = index
+                logger.warning(f"Batch {batch_id} stopping at item {index} of {len(items)}: out of time")
+                break
+
+            item = items[index]
+            item_session_id = item.get('session_id', f"{batch_id}-{index}")
+            pending.add(executor.submit(
+                process_batch_item, item, item_session_id, s3_bucket, textract_backoff, rekognition_backoff
+            ))
+
+            # Keep only max_concurrency items queued so finished results are written out promptly
+            if len(pending) >= max_concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    manifest.write(record)
+                    if record['status'] == 'PROCESSED':
+                        processed_count += 1
+                    else:
+                        failed_count += 1
+
+        for future in pending:
+            record = future.result()
+            manifest.write(record)
+            if record['status'] == 'PROCESSED':
+                processed_count += 1
+            else:
+                failed_count += 1
+
+    logger.info(
+        f"Batch {batch_id} finished: {processed_count} processed, {failed_count} failed, "
+        f"{textract_backoff.throttle_count + rekognition_backoff.throttle_count} throttled calls"
+    )
+    return processed_count, failed_count, next_cursor
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a batch of document images and return the status code and response body.
+
+    Expected event structure:
+    {
+        "batch_id": "unique-batch-id" (optional),
+        "items": [
+            {"item_id": "item-1", "s3_key": "uploads/item-1.jpg"},
+            {"item_id": "item-2", "image_data": "base64-encoded-image"}
+        ],
+        "s3_bucket": "your-kyc-bucket",
+        "manifest_key": "batch-manifests/batch-id.jsonl" (optional),
+        "max_concurrency": 8 (optional),
+        "cursor": 0 (optional, "next_cursor" of a previous partial response)
+    }
+
+    When the invocation runs short of time, the manifest holds the items
+    processed so far and the response has status "BATCH_PARTIAL" and a
+    "next_cursor"; invoke again with the same items and that cursor. A resumed
+    invocation writes its manifest under the key suffixed with "-{cursor}".
+
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    try:
+        # Parse input
+        batch_id = event.get('batch_id', str(uuid.uuid4()))
+        items = event.get('items')
+        s3_bucket = event.get('s3_bucket', 'your-kyc-bucket')
+        cursor = int(event.get('cursor') or 0)
+        manifest_key = event.get('manifest_key') or f"batch-manifests/{batch_id}.jsonl"
+        if cursor > 0:
+            # Each invocation of a resumed batch writes its own manifest, so none overwrites another
+            manifest_root, manifest_extension = os.path.splitext(manifest_key)
+            manifest_key = f"{manifest_root}-{cursor}{manifest_extension}"
+        max_concurrency = int(event.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+
+        if not items or not isinstance(items, list):
+            return 400, {
+                'error': 'Missing required parameter: items'
+            }
+
+        if not 0 <= cursor < len(items):
+            return 400, {
+                'error': f"Invalid cursor: must be between 0 and {len(items) - 1}"
+            }
+
+        max_concurrency = max(1, min(max_concurrency, MAX_CONCURRENCY_LIMIT))
+
+        manifest = ManifestWriter(s3_bucket, manifest_key)
+        try:
+            processed_count, failed_count, next_cursor = run_batch(
+                batch_id, items, s3_bucket, manifest, max_concurrency, cursor, context
+            )
+            manifest.close()
+        finally:
+            # No-op once closed; otherwise discards the parts of an unfinished manifest
+            manifest.abort()
+
+        response_data = {
+            'batch_id': batch_id,
+            'item_count': len(items),
+            'processed_count': processed_count,
+            'failed_count': failed_count,
+            'manifest_s3_key': manifest_key,
+            'status': 'BATCH_PROCESSED'
+        }
+        if next_cursor is not None:
+            response_data['status'] = 'BATCH_PARTIAL'
+            response_data['next_cursor'] = next_cursor
+            response_data['remaining_count'] = len(items) - next_cursor
+
+        return 200, response_data
+
+    except Exception as e:
+        logger.error(f"Error in batch document processor: {str(e)}")
+        return 500, {
+            'error': 'Internal server error',
+            'message': str(e)
+        }
+
+@instrument_handler('batch-document-processor')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for batch document processing.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -1,4 +1,15 @@
-import json
+import os
+import logging
+import json_codec
+from instrumentation import metrics, span
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Largest serialized body returned; a synchronous invoke fails above 6 MB,
+# and the response object around the body adds escaping and headers
+RESPONSE_LIMIT_BYTES = int(os.environ.get('KYC_RESPONSE_LIMIT_BYTES', str(5 * 1024 * 1024)))
 
 def get_cors_headers():
     """
@@ -17,6 +28,9 @@ def create_response(status_code: int, body: dict, cors_enabled: bool = True):
     """
     Creates a standardized Lambda response with optional CORS headers.
     
+    A body larger than RESPONSE_LIMIT_BYTES is replaced by a 500 error, as
+    Lambda would otherwise fail the invocation without a response.
+    
     Args:
         status_code: HTTP status code
         body: Response body dictionary
@@ -25,9 +39,21 @@ def create_response(status_code: int, body: dict, cors_enabled: bool = True):
     Returns:
         dict: Lambda response with statusCode, headers, and body
     """
+    with span('serialize_response'):
+        serialized_body = json_codec.dumps(body)
+    
+    if len(serialized_body) > RESPONSE_LIMIT_BYTES:
+        logger.error(f"Error creating response: body of {len(serialized_body)} bytes exceeds {RESPONSE_LIMIT_BYTES} bytes")
+        metrics.record('response_too_large', 1, 'Count')
+        status_code = 500
+        serialized_body = json_codec.dumps({
+            'error': 'Response too large',
+            'message': f"Response body of {len(serialized_body)} bytes exceeds {RESPONSE_LIMIT_BYTES} bytes"
+        })
+    
     response = {
         'statusCode': status_code,
-        'body': json.dumps(body)
+        'body': serialized_body
     }
     
     if cors_enabled:
@@ -0,0 +1,275 @@
+import json
+import os
+import time
+import random
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import job_queue
+import kyc_orchestrator
+from job_queue import (
+    SUCCEEDED,
+    FAILED,
+    RUNNING,
+    RETRYING,
+    DEAD_LETTERED,
+    FINAL_JOB_STATES,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_SECONDS,
+    JOB_RETRY_MAX_SECONDS,
+    job_store,
+    load_payload,
+    message_from_record
+)
+from cors_helper import create_response
+from throttling import AdaptiveBackoff
+from instrumentation import instrument_handler, metrics
+from warmup import is_warm_event, warm
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Clients a warmer event prepares ahead of the first job
+WARM_CLIENTS = ['sqs', 'lambda']
+
+# Threads of the local worker pool, and how long each waits on an empty queue
+JOB_WORKERS = int(os.environ.get('KYC_JOB_WORKERS', '4'))
+JOB_POLL_SECONDS = float(os.environ.get('KYC_JOB_POLL_SECONDS', '1'))
+
+# Upper bound of the pause the workers of a process share while jobs keep failing
+JOB_BACKOFF_MAX_SECONDS = float(os.environ.get('KYC_JOB_BACKOFF_MAX_SECONDS', '10'))
+
+# Outcome of a message whose job already reached a final state (SQS delivers at least once)
+DUPLICATE = 'DUPLICATE'
+
+def run_document_job(payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a queued document through the same path as a synchronous process_document.
+
+    Args:
+        payload: The process_document fields of the submitting request
+
+    Returns:
+        Tuple of (status_code, document_result)
+    """
+    session_id = payload['session_id']
+    status_code, document_result, _ = kyc_orchestrator.run_process_document(
+        session_id,
+        payload.get('image_data'),
+        payload.get('document_type', 'passport'),
+        kyc_orchestrator.load_session(session_id),
+        payload.get('s3_key'),
+        payload.get('s3_bucket', 'your-kyc-bucket'),
+        payload.get('pages')
+    )
+    return status_code, document_result
+
+# Job kind -> runner returning (status_code, result); additional kinds can be registered here
+JOB_RUNNERS = {
+    'process_document': run_document_job
+}
+
+# Delay shared by every job this process runs; it grows while jobs fail with
+# retryable errors, so workers slow down together when Textract or
+# Rekognition push back
+job_backoff = AdaptiveBackoff(base_delay=min(0.2, JOB_BACKOFF_MAX_SECONDS), max_delay=JOB_BACKOFF_MAX_SECONDS)
+
+def is_retryable(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+def retry_delay(attempt: int) -> float:
+    """
+    Seconds before a failed attempt is retried: exponential in the attempt number, with jitter.
+    """
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), JOB_RETRY_MAX_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+def handle_message(message: Dict[str, Any], queue: Any, backoff: AdaptiveBackoff = job_backoff) -> str:
+    """
+    Run the job of one queue message and record its outcome.
+
+    Successes and non-retryable failures (4xx) are final. Retryable
+    failures (5xx, 429 or an exception) hide the message for the retry
+    delay so it is received again, until the JOB_MAX_ATTEMPTS-th attempt
+    sends it to the dead-letter queue. A message that cannot be parsed is
+    dead-lettered at once, as retrying it can never succeed.
+
+    Args:
+        message: Message from the queue or from message_from_record
+        queue: Queue the message came from
+        backoff: Delay shared by the workers of this process
+
+    Returns:
+        SUCCEEDED, FAILED, DEAD_LETTERED or DUPLICATE when the message can be
+        deleted, RETRYING when it must stay in the queue
+    """
+    try:
+        body = json.loads(message['body'])
+        job_id = body['job_id']
+        runner = JOB_RUNNERS[body['kind']]
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"Error reading job message {message['message_id']}: {str(e)}")
+        queue.dead_letter(message, f"Unreadable job message: {str(e)}")
+        metrics.record('job_dead_lettered', 1, 'Count')
+        return DEAD_LETTERED
+
+    record = job_store.get(job_id) or {}
+    if record.get('state') in FINAL_JOB_STATES:
+        return DUPLICATE
+
+    attempt = message['receive_count']
+    if attempt == 1 and record.get('submitted_at'):
+        metrics.record('job_queue_wait_ms', (time.time() - record['submitted_at']) * 1000)
+    job_store.update(job_id, state=RUNNING, attempts=attempt)
+
+    started_at = time.perf_counter()
+    try:
+        status_code, result = runner(load_payload(body))
+        error = None if status_code == 200 else (result or {}).get('message') or (result or {}).get('error')
+    except Exception as e:
+        logger.error(f"Error running job {job_id}: {str(e)}")
+        status_code, result, error = 500, None, str(e)
+    metrics.record('job_run_ms', (time.perf_counter() - started_at) * 1000)
+
+    if status_code == 200:
+        backoff.on_success()
+        job_store.update(job_id, state=SUCCEEDED, status_code=status_code, result=result, error=None)
+        metrics.record('job_succeeded', 1, 'Count')
+        return SUCCEEDED
+
+    if not is_retryable(status_code):
+        job_store.update(job_id, state=FAILED, status_code=status_code, result=result, error=error)
+        metrics.record('job_failed', 1, 'Count')
+        return FAILED
+
+    backoff.on_throttle()
+    if attempt >= JOB_MAX_ATTEMPTS:
+        logger.warning(f"Dead-lettering job {job_id} after {attempt} attempts: {error}")
+        queue.dead_letter(message, error or f"Status {status_code}")
+        job_store.update(job_id, state=DEAD_LETTERED, status_code=status_code, result=result, error=error)
+        metrics.record('job_dead_lettered', 1, 'Count')
+        return DEAD_LETTERED
+
+    delay = retry_delay(attempt)
+    queue.retry_later(message['receipt_handle'], delay)
+    job_store.update(job_id, state=RETRYING, status_code=status_code, error=error,
+                     retry_at=int(time.time() + delay))
+    metrics.record('job_retried', 1, 'Count')
+    return RETRYING
+
+class WorkerPool:
+    """
+    Threads draining a job queue in-process, with at most `workers` jobs running at once.
+
+    Drains the memory queue beside the orchestrator; pointed at an
+    SqsJobQueue it also serves as a long-running worker outside Lambda.
+    """
+
+    def __init__(self, queue: Any, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS,
+                 backoff: AdaptiveBackoff = job_backoff):
+        self.queue = queue
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.backoff = backoff
+        self.counters = {SUCCEEDED: 0, FAILED: 0, RETRYING: 0, DEAD_LETTERED: 0, DUPLICATE: 0}
+        self.threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> 'WorkerPool':
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            # Waiting before taking a job, not after, keeps it in the queue for a less loaded worker
+            self.backoff.wait()
+            try:
+                for message in self.queue.receive(1, self.poll_seconds):
+                    outcome = handle_message(message, self.queue, self.backoff)
+                    if outcome != RETRYING:
+                        self.queue.delete(message['receipt_handle'])
+                    with self._lock:
+                        self.counters[outcome] += 1
+            except Exception as e:
+                logger.error(f"Error in job worker: {str(e)}")
+                self._stopping.wait(self.poll_seconds)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters, workers=len(self.threads))
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+def start_local_pool() -> WorkerPool:
+    """
+    Start the worker pool for the module-level queue once per process.
+    """
+    global _local_pool
+    if _local_pool is None:
+        with _local_pool_lock:
+            if _local_pool is None:
+                _local_pool = WorkerPool(job_queue.job_queue).start()
+    return _local_pool
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process an SQS event source batch and return the status code and response body.
+
+    Records whose job must be retried are reported in "batchItemFailures"
+    (the event source mapping needs ReportBatchItemFailures), so only they
+    stay in the queue; their visibility is already set to the retry delay.
+
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    if is_warm_event(event):
+        return 200, warm(WARM_CLIENTS, [])
+
+    if 'Records' not in event:
+        return 400, {
+            'error': 'Expected an SQS event with Records'
+        }
+
+    queue = job_queue.job_queue or job_queue.SqsJobQueue()
+    failures = []
+    outcomes: Dict[str, int] = {}
+    for record in event['Records']:
+        job_backoff.wait()
+        try:
+            outcome = handle_message(message_from_record(record), queue)
+        except Exception as e:
+            # Left in the queue, the message is received again after its visibility timeout
+            logger.error(f"Error handling message {record.get('messageId')}: {str(e)}")
+            outcome = RETRYING
+        if outcome == RETRYING:
+            failures.append({'itemIdentifier': record['messageId']})
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    return 200, {
+        'batchItemFailures': failures,
+        'outcomes': outcomes
+    }
+
+@instrument_handler('document-job-worker')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for the document job worker.
+    """
+    status_code, response_body = process_event(event, context)
+    # The event source mapping reads batchItemFailures from the top level of the result
+    if 'Records' in event:
+        return response_body
+    return create_response(status_code, response_body)
@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, List, Tuple
+
+from image_preparation import (
+    MAX_IMAGE_DIMENSION,
+    MAX_PAYLOAD_BYTES,
+    PreparedImage,
+    encode_jpeg
+)
+from instrumentation import metrics
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Textract analyze_id accepts at most two pages (front and back) per call
+ANALYZE_ID_MAX_PAGES = 2
+
+# Pages accepted per document, counting every page of an uploaded PDF
+MAX_DOCUMENT_PAGES = int(os.environ.get('DOCUMENT_MAX_PAGES', '4'))
+
+# Resolution PDF pages are rendered at, before capping at IMAGE_MAX_DIMENSION
+PDF_RENDER_DPI = int(os.environ.get('DOCUMENT_PDF_DPI', '200'))
+
+PDF_MAGIC = b'%PDF-'
+
+# PDFium is not thread-safe; service mode runs handlers on several threads
+_pdfium_lock = threading.Lock()
+
+class TooManyPagesError(ValueError):
+    """
+    Raised when a document has more pages than MAX_DOCUMENT_PAGES.
+    """
+
+def is_pdf(data: bytes) -> bool:
+    return data[:len(PDF_MAGIC)] == PDF_MAGIC
+
+def render_pdf_pages(pdf_bytes: bytes, max_pages: int = MAX_DOCUMENT_PAGES,
+                     max_dimension: int = MAX_IMAGE_DIMENSION, dpi: int = PDF_RENDER_DPI) -> List[PreparedImage]:
+    """
+    Rasterize the pages of a PDF for Textract and Rekognition.
+
+    Each page is rendered straight at its target size, so no page is ever
+    held at a higher resolution than is sent to AWS. For rendered pages the
+    original_* fields of PreparedImage describe the rendered page.
+
+    Args:
+        pdf_bytes: PDF file contents
+        max_pages: Largest page count accepted
+        max_dimension: Longest edge, in pixels, of a rendered page
+        dpi: Rendering resolution for pages small enough not to hit max_dimension
+
+    Returns:
+        One PreparedImage per page
+
+    Raises:
+        TooManyPagesError: If the PDF has more than max_pages pages
+    """
+    # Imported here so image-only deployments never load PDFium
+    import pypdfium2 as pdfium
+
+    pages = []
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            if len(pdf) > max_pages:
+                raise TooManyPagesError(f"PDF has {len(pdf)} pages; at most {max_pages} are accepted")
+
+            for page_index in range(len(pdf)):
+                render_start = time.perf_counter()
+                page = pdf[page_index]
+                width_pt, height_pt = page.get_size()
+                scale = min(dpi / 72.0, max_dimension / max(width_pt, height_pt))
+                img = page.render(scale=scale).to_pil().convert('RGB')
+                page.close()
+                render_ms = (time.perf_counter() - render_start) * 1000
+                metrics.record('render_page_ms', render_ms)
+
+                encode_start = time.perf_counter()
+                page_bytes = encode_jpeg(img, MAX_PAYLOAD_BYTES)
+                encode_ms = (time.perf_counter() - encode_start) * 1000
+                metrics.record('encode_ms', encode_ms)
+
+                pages.append(PreparedImage(img, page_bytes, len(page_bytes), img.size, render_ms, encode_ms))
+        finally:
+            pdf.close()
+
+    logger.info(f"Rendered {len(pages)} PDF pages")
+    return pages
+
+def batch_pages(items: List[Any], batch_size: int = ANALYZE_ID_MAX_PAGES) -> List[List[Any]]:
+    """
+    Split pages into the fewest analyze_id calls, keeping page order.
+    """
+    return [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+def merge_identity_documents(documents: List[Dict[str, Dict[str, Any]]]) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """
+    Merge fields read from several identity documents or pages.
+
+    A field present on more than one page (e.g. the document number printed
+    on the front and in the barcode on the back) takes the value Textract
+    was most confident about.
+
+    Args:
+        documents: One dict per identity document of field type -> {'value', 'confidence'}
+
+    Returns:
+        Tuple of (field type -> value, field type -> confidence of that value)
+    """
+    fields: Dict[str, str] = {}
+    confidences: Dict[str, float] = {}
+
+    for document in documents:
+        for field_type, detection in document.items():
+            if not detection.get('value'):
+                continue
+            confidence = detection.get('confidence', 0.0)
+            if field_type not in fields or confidence > confidences[field_type]:
+                fields[field_type] = detection['value']
+                confidences[field_type] = confidence
+
+    return fields, confidences
@@ -1,40 +1,75 @@
-import json
-import boto3
-import base64
+import os
+import time
 import io
-from PIL import Image
-from typing import Dict, Any, Optional
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from image_preparation import ImageTooLargeError, PreparedImage, decode_base64, prepare_image
+from image_quality import ImageQualityError, prescreen
+from face_selection import (
+    DETECT_FACE_ATTRIBUTES,
+    CROP_SCALE,
+    crop_box,
+    encode_face_crop,
+    face_crop_key,
+    rank_faces
+)
+from document_pages import (
+    MAX_DOCUMENT_PAGES,
+    TooManyPagesError,
+    batch_pages,
+    is_pdf,
+    merge_identity_documents,
+    render_pdf_pages
+)
+from result_cache import CACHE_ENABLED, result_cache, hash_image
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 import logging
 
-# CORS Helper Functions (inline)
-def get_cors_headers():
-    return {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
+if TYPE_CHECKING:
+    from PIL import Image
 
-def create_response(status_code: int, body: dict, cors_enabled: bool = True):
-    response = {
-        'statusCode': status_code,
-        'body': json.dumps(body)
-    }
-    
-    if cors_enabled:
-        response['headers'] = get_cors_headers()
-    
-    return response
+from cors_helper import create_response
+from resilience import DEPENDENCY_UNAVAILABLE, DependencyUnavailableError, build_dependency_failure, resilient_client
+from instrumentation import ContextThreadPoolExecutor, instrument_handler, span
+from warmup import is_warm_event, warm
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-textract_client = boto3.client('textract')
-rekognition_client = boto3.client('rekognition')
-s3_client = boto3.client('s3')
+# Initialize AWS clients (built on first use, with adaptive timeouts, hedging and circuit breakers)
+textract_client = resilient_client('textract')
+rekognition_client = resilient_client('rekognition')
+s3_client = resilient_client('s3')
+
+# Clients and deferred imports a warmer event prepares
+WARM_CLIENTS = ['textract', 'rekognition', 's3']
+WARM_IMPORTS = ['PIL.Image', 'PIL.ImageOps', 'PIL.JpegImagePlugin', 'numpy']
+
+# Run the Textract and Rekognition branches concurrently unless disabled
+PARALLEL_BRANCHES = os.environ.get('DOCUMENT_PARALLEL_BRANCHES', 'true').lower() == 'true'
+
+# Largest decoded upload accepted inline, checked from the base64 length before decoding
+MAX_UPLOAD_BYTES = int(os.environ.get('DOCUMENT_MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
 
-def crop_and_save_face_to_s3(image_bytes: bytes, bbox: Dict[str, float], session_id: str, scale: float = 1.2) -> str:
+# Milliseconds kept back from the invocation deadline when budgeting branches
+BRANCH_TIMEOUT_MARGIN_MS = int(os.environ.get('BRANCH_TIMEOUT_MARGIN_MS', '2000'))
+
+# Shared across warm invocations so worker threads are not recreated per request
+branch_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.environ.get('DOCUMENT_BRANCH_WORKERS', '4')),
+    thread_name_prefix='document-branch'
+)
+
+# Per-page AWS calls of multi-page documents; separate from branch_executor,
+# whose tasks wait on these and would otherwise be able to starve them
+page_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.environ.get('DOCUMENT_PAGE_WORKERS', '4')),
+    thread_name_prefix='document-page'
+)
+
+def crop_and_save_face_to_s3(image_bytes: Optional[bytes], bbox: Dict[str, float], session_id: str,
+                             scale: float = CROP_SCALE, image: Optional['Image.Image'] = None,
+                             rank: int = 0) -> Optional[str]:
     """
     Crops a face from an image using a scaled bounding box and saves to S3.
     
@@ -43,55 +78,38 @@ def crop_and_save_face_to_s3(image_bytes: bytes, bbox: Dict[str, float], session
         bbox: Bounding box from Rekognition {'Width', 'Height', 'Top', 'Left'}
         session_id: Unique session identifier
         scale: Factor to scale the bounding box by (e.g., 1.2 for 20% padding)
+        image: Already decoded image; image_bytes is only decoded when omitted
+        rank: Position of the face among the session's ranked candidates
     
     Returns:
-        S3 key of the saved cropped face image
+        S3 key of the saved cropped face image, or None if the box is empty at this resolution
     """
     try:
-        # Open image from bytes
-        img = Image.open(io.BytesIO(image_bytes))
-        img_w, img_h = img.size
-
-        # Original bounding box (normalized)
-        box_w = bbox['Width']
-        box_h = bbox['Height']
-        box_l = bbox['Left']
-        box_t = bbox['Top']
-
-        # Calculate the new, scaled dimensions (normalized)
-        new_w = box_w * scale
-        new_h = box_h * scale
-
-        # Calculate the adjustment needed to keep the box centered
-        width_increase = new_w - box_w
-        height_increase = new_h - box_h
-        
-        new_l = box_l - (width_increase / 2)
-        new_t = box_t - (height_increase / 2)
-
-        # Convert normalized coordinates to pixel coordinates for PIL
-        # Also, ensure coordinates don't go out of the image bounds
-        x1 = max(0, int(new_l * img_w))
-        y1 = max(0, int(new_t * img_h))
-        x2 = min(img_w, int((new_l + new_w) * img_w))
-        y2 = min(img_h, int((new_t + new_h) * img_h))
-
-        # Crop the image
-        cropped_img = img.crop((x1, y1, x2, y2))
-        
-        # Convert to bytes
-        img_buffer = io.BytesIO()
-        cropped_img.save(img_buffer, format='JPEG')
-        img_buffer.seek(0)
+        # Reuse the decoded image when the caller has one
+        if image is not None:
+            img = image
+        else:
+            from PIL import Image
+            img = Image.open(io.BytesIO(image_bytes))
+        
+        box = crop_box(img.size, bbox, scale)
+        if box is None:
+            logger.warning(f"Face bounding box {bbox} is empty in a {img.size[0]}x{img.size[1]} image")
+            return None
+        
+        # Crop and encode; only the encoded face is kept
+        with span('crop'):
+            img_buffer = encode_face_crop(img, box)
         
         # Upload to S3
         bucket_name = 'your-kyc-bucket'  # Replace with your S3 bucket
-        s3_key = f"faces/{session_id}/id_face.jpg"
+        s3_key = face_crop_key(session_id, rank)
         
+        # The buffer itself is streamed, so no copy of the encoded face is made
         s3_client.put_object(
             Bucket=bucket_name,
             Key=s3_key,
-            Body=img_buffer.getvalue(),
+            Body=img_buffer,
             ContentType='image/jpeg'
         )
         
@@ -102,33 +120,154 @@ def crop_and_save_face_to_s3(image_bytes: bytes, bbox: Dict[str, float], session
         logger.error(f"Error cropping and saving face: {str(e)}")
         raise
 
-def extract_document_fields(image_bytes: bytes) -> Dict[str, str]:
+def crop_face_candidates(candidates: List[Dict[str, Any]], session_id: str,
+                         page_images: List['Image.Image']) -> Dict[str, Any]:
+    """
+    Crop and persist every ranked face candidate from the already decoded images.
+    
+    Candidates whose box is empty at the image's resolution are dropped
+    before ranks are assigned, so the saved keys stay contiguous.
+    
+    Args:
+        candidates: Ranked candidates from rank_faces
+        session_id: Unique session identifier
+        page_images: Decoded image of each page the candidates refer to
+    
+    Returns:
+        S3 key of the best face (None if none could be cropped), its 1-based page and the saved candidates
+    """
+    croppable = [
+        candidate for candidate in candidates
+        if crop_box(page_images[candidate['page']].size, candidate['bounding_box']) is not None
+    ]
+    if not croppable:
+        return {'face_s3_key': None, 'face_page': None, 'face_candidates': []}
+    
+    def save_candidate(rank: int) -> str:
+        candidate = croppable[rank]
+        return crop_and_save_face_to_s3(None, candidate['bounding_box'], session_id,
+                                        image=page_images[candidate['page']], rank=rank)
+    
+    with span('crop_faces'):
+        s3_keys = map_pages(save_candidate, list(range(len(croppable))))
+    
+    face_candidates = [{
+        's3_key': s3_key,
+        'page': candidate['page'] + 1,
+        'score': candidate['score'],
+        'confidence': candidate['confidence'],
+        'score_components': candidate['score_components']
+    } for s3_key, candidate in zip(s3_keys, croppable)]
+    
+    logger.info(f"Saved {len(face_candidates)} ranked face crops for session {session_id}")
+    return {
+        'face_s3_key': face_candidates[0]['s3_key'],
+        'face_page': face_candidates[0]['page'],
+        'face_candidates': face_candidates
+    }
+
+def build_image_source(image_bytes: Optional[bytes], s3_object: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Build the image argument for Textract and Rekognition.
+    
+    Args:
+        image_bytes: Raw image bytes, used when no S3 object is given
+        s3_object: {'Bucket', 'Name'} reference to an image already in S3
+    
+    Returns:
+        {'S3Object': ...} when s3_object is given, otherwise {'Bytes': ...}
+    """
+    if s3_object is not None:
+        return {'S3Object': s3_object}
+    return {'Bytes': image_bytes}
+
+def load_image_from_s3(s3_object: Dict[str, str]) -> 'Image.Image':
+    """
+    Download and decode an image referenced by S3 object, for cropping the faces Rekognition found in it.
+    
+    Rekognition read the stored object, so its boxes refer to the stored
+    pixel orientation; the EXIF orientation is not applied here, or the
+    crop would come from the wrong region of a rotated upload.
+    
+    Args:
+        s3_object: {'Bucket', 'Name'} reference
+    
+    Returns:
+        Decoded image in its stored orientation
+    """
+    response = s3_client.get_object(Bucket=s3_object['Bucket'], Key=s3_object['Name'])
+    return prepare_image(response['Body'].read(), upright=False).image
+
+def parse_identity_documents(textract_response: Dict[str, Any]) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Read the fields of every identity document in an analyze_id response.
+    
+    Args:
+        textract_response: analyze_id response
+    
+    Returns:
+        One dict per identity document of field type -> {'value', 'confidence'}
+    """
+    documents = []
+    for identity_document in textract_response.get('IdentityDocuments', []):
+        document = {}
+        for field in identity_document.get('IdentityDocumentFields', []):
+            value_detection = field.get('ValueDetection', {})
+            if value_detection.get('Text'):
+                document[field['Type']['Text']] = {
+                    'value': value_detection['Text'],
+                    'confidence': value_detection.get('Confidence', 0.0)
+                }
+        documents.append(document)
+    return documents
+
+def analyze_id_documents(image_sources: List[Dict[str, Any]]) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Call Textract analyze_id once for up to ANALYZE_ID_MAX_PAGES pages.
+    
+    Args:
+        image_sources: Image arguments from build_image_source
+    
+    Returns:
+        Fields of each identity document returned
+    """
+    textract_response = textract_client.analyze_id(
+        DocumentPages=image_sources
+    )
+    return parse_identity_documents(textract_response)
+
+def analyze_id_fields(image_source: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Call Textract analyze_id and flatten the identity document fields.
+    
+    Args:
+        image_source: Image argument from build_image_source
+    
+    Returns:
+        Dictionary of extracted fields
+    """
+    extracted_fields, _ = merge_identity_documents(analyze_id_documents([image_source]))
+    return extracted_fields
+
+def extract_document_fields(image_bytes: Optional[bytes], image_hash: Optional[str] = None,
+                            s3_object: Optional[Dict[str, str]] = None) -> Dict[str, str]:
     """
     Extract document fields using AWS Textract.
     
     Args:
-        image_bytes: Raw image bytes of the document
+        image_bytes: Raw image bytes of the document (None when s3_object is given)
+        image_hash: Content hash of the upload; repeated images are served from the result cache
+        s3_object: {'Bucket', 'Name'} reference passed to Textract instead of the bytes
     
     Returns:
         Dictionary of extracted fields
     """
     try:
-        # Call Textract analyze_id
-        textract_response = textract_client.analyze_id(
-            DocumentPages=[{'Bytes': image_bytes}]
+        image_source = build_image_source(image_bytes, s3_object)
+        extracted_fields = result_cache.get_or_compute(
+            'analyze_id', image_hash, lambda: analyze_id_fields(image_source)
         )
         
-        # Extract document fields
-        document_fields = textract_response['IdentityDocuments'][0]['IdentityDocumentFields']
-        
-        # Extract important fields
-        extracted_fields = {}
-        for field in document_fields:
-            if field.get('ValueDetection', {}).get('Text'):
-                field_type = field['Type']['Text']
-                field_value = field['ValueDetection']['Text']
-                extracted_fields[field_type] = field_value
-        
         logger.info(f"Successfully extracted {len(extracted_fields)} fields from document")
         return extracted_fields
         
@@ -136,95 +275,564 @@ def extract_document_fields(image_bytes: bytes) -> Dict[str, str]:
         logger.error(f"Error extracting document fields: {str(e)}")
         raise
 
-def detect_and_crop_face(image_bytes: bytes, session_id: str) -> Optional[str]:
+def detect_face_details(image_source: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Detect faces in the image and crop the primary face.
+    Call Rekognition detect_faces and return the face details.
     
     Args:
-        image_bytes: Raw image bytes
+        image_source: Image argument from build_image_source
+    
+    Returns:
+        List of FaceDetails
+    """
+    rekognition_response = rekognition_client.detect_faces(
+        Image=image_source,
+        Attributes=DETECT_FACE_ATTRIBUTES
+    )
+    return rekognition_response['FaceDetails']
+
+def detect_and_crop_face(image_bytes: Optional[bytes], session_id: str, image: Optional['Image.Image'] = None,
+                         image_hash: Optional[str] = None, s3_object: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Detect faces in the image, rank them and crop the best candidates.
+    
+    Args:
+        image_bytes: Raw image bytes (None when s3_object is given)
         session_id: Unique session identifier
+        image: Decoded form of image_bytes, shared with the cropping step
+        image_hash: Content hash of the upload; repeated images are served from the result cache
+        s3_object: {'Bucket', 'Name'} reference passed to Rekognition instead of the bytes
     
     Returns:
-        S3 key of the cropped face image, or None if no face detected
+        S3 key of the best face crop (None if no face detected) and the ranked candidates
     """
     try:
         # Call Rekognition detect_faces
-        rekognition_response = rekognition_client.detect_faces(
-            Image={'Bytes': image_bytes},
-            Attributes=['ALL']
+        image_source = build_image_source(image_bytes, s3_object)
+        face_details = result_cache.get_or_compute(
+            'detect_faces', image_hash, lambda: detect_face_details(image_source)
         )
         
-        # Filter faces with high confidence
-        high_confidence_faces = [
-            face for face in rekognition_response['FaceDetails'] 
-            if face['Confidence'] > 95
-        ]
-        
-        if not high_confidence_faces:
+        candidates = rank_faces([face_details])
+        if not candidates:
             logger.warning("No high-confidence faces detected")
-            return None
+            return {'face_s3_key': None, 'face_page': None, 'face_candidates': []}
         
-        # Use the first high-confidence face
-        primary_face = high_confidence_faces[0]
-        bbox = primary_face['BoundingBox']
+        # Images referenced by S3 key are only downloaded when there is a face to crop
+        if image is None and image_bytes is None:
+            image = load_image_from_s3(s3_object)
+        elif image is None:
+            from PIL import Image
+            image = Image.open(io.BytesIO(image_bytes))
         
-        # Crop and save the face
-        s3_key = crop_and_save_face_to_s3(image_bytes, bbox, session_id)
-        return s3_key
+        return crop_face_candidates(candidates, session_id, [image])
         
     except Exception as e:
         logger.error(f"Error detecting and cropping face: {str(e)}")
         raise
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def map_pages(fn: Any, items: List[Any]) -> List[Any]:
     """
-    Main Lambda handler for document processing.
+    Apply fn to each item, concurrently on page_executor when there is more than one.
+    """
+    if len(items) == 1:
+        return [fn(items[0])]
+    return [future.result() for future in [page_executor.submit(fn, item) for item in items]]
+
+def extract_page_fields(pages: List[PreparedImage], page_hashes: List[str]) -> Dict[str, Any]:
+    """
+    Extract and merge the fields of a multi-page document.
+    
+    Pages are sent in the fewest analyze_id calls Textract allows
+    (ANALYZE_ID_MAX_PAGES per call), and the calls run concurrently.
+    
+    Args:
+        pages: Prepared pages in document order
+        page_hashes: Content hash of each page, used as the result cache key
+    
+    Returns:
+        Merged fields, the confidence of each, and call counts
+    """
+    def analyze_batch(page_indexes: List[int]) -> List[Dict[str, Dict[str, Any]]]:
+        batch_hash = hash_image(':'.join(page_hashes[index] for index in page_indexes).encode('utf-8'))
+        return result_cache.get_or_compute('analyze_id_pages', batch_hash, lambda: analyze_id_documents(
+            [build_image_source(pages[index].image_bytes) for index in page_indexes]
+        ))
+    
+    try:
+        batches = batch_pages(list(range(len(pages))))
+        documents = [document for batch in map_pages(analyze_batch, batches) for document in batch]
+        extracted_fields, field_confidence = merge_identity_documents(documents)
+        
+        logger.info(f"Extracted {len(extracted_fields)} fields from {len(pages)} pages in {len(batches)} analyze_id calls")
+        return {
+            'extracted_fields': extracted_fields,
+            'field_confidence': field_confidence,
+            'identity_documents': len(documents),
+            'analyze_id_calls': len(batches)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error extracting document fields from pages: {str(e)}")
+        raise
+
+def detect_and_crop_page_face(pages: List[PreparedImage], session_id: str,
+                              page_hashes: List[str]) -> Dict[str, Any]:
+    """
+    Detect faces on every page concurrently, rank them together and crop the best candidates.
+    
+    Args:
+        pages: Prepared pages in document order
+        session_id: Unique session identifier
+        page_hashes: Content hash of each page, used as the result cache key
+    
+    Returns:
+        S3 key of the best face crop (None if no page has one), its 1-based page and the ranked candidates
+    """
+    def detect_page(index: int) -> List[Dict[str, Any]]:
+        return result_cache.get_or_compute('detect_faces', page_hashes[index], lambda: detect_face_details(
+            build_image_source(pages[index].image_bytes)
+        ))
+    
+    try:
+        candidates = rank_faces(map_pages(detect_page, list(range(len(pages)))))
+        if not candidates:
+            logger.warning(f"No high-confidence faces detected on {len(pages)} pages")
+            return {'face_s3_key': None, 'face_page': None, 'face_candidates': []}
+        
+        return crop_face_candidates(candidates, session_id, [page.image for page in pages])
+        
+    except Exception as e:
+        logger.error(f"Error detecting and cropping face from pages: {str(e)}")
+        raise
+
+def get_branch_timeout(context: Any) -> Optional[float]:
+    """
+    Work out how long the processing branches may run before the invocation times out.
+    
+    Args:
+        context: Lambda context object (may be None for in-process calls)
+    
+    Returns:
+        Timeout in seconds, or None when no deadline is known
+    """
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    
+    remaining_ms = context.get_remaining_time_in_millis() - BRANCH_TIMEOUT_MARGIN_MS
+    return max(remaining_ms, 0) / 1000.0
+
+def run_document_branches(image_bytes: Optional[bytes], session_id: str, context: Any = None,
+                          image: Optional['Image.Image'] = None, image_hash: Optional[str] = None,
+                          s3_object: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run field extraction and face detection on the same image.
+    
+    The branches are independent, so they run concurrently on the shared executor
+    when PARALLEL_BRANCHES is enabled. A failure or timeout in one branch does not
+    discard the result of the other.
+    
+    Args:
+        image_bytes: Raw image bytes of the document
+        session_id: Unique session identifier
+        context: Lambda context used to derive the timeout budget
+        image: Decoded form of image_bytes, shared with the cropping step
+        image_hash: Content hash of the upload, used as the result cache key
+        s3_object: {'Bucket', 'Name'} reference used instead of image_bytes
+    
+    Returns:
+        Tuple of (results keyed by branch name, error messages keyed by branch name)
+    """
+    branches = {
+        'extract_document_fields': (extract_document_fields, (image_bytes, image_hash, s3_object)),
+        'detect_and_crop_face': (detect_and_crop_face, (image_bytes, session_id, image, image_hash, s3_object))
+    }
+    return run_branches(branches, context)
+
+def run_branches(branches: Dict[str, Tuple[Any, tuple]], context: Any = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run independent processing branches within the invocation's time budget.
+    
+    Args:
+        branches: Branch name -> (function, arguments)
+        context: Lambda context used to derive the timeout budget
+    
+    Returns:
+        Tuple of (results keyed by branch name, error messages keyed by branch name)
+    """
+    results = {}
+    branch_errors = {}
+    
+    if not PARALLEL_BRANCHES:
+        for branch_name, (branch_fn, branch_args) in branches.items():
+            try:
+                results[branch_name] = branch_fn(*branch_args)
+            except Exception as e:
+                branch_errors[branch_name] = str(e)
+        return results, branch_errors
+    
+    timeout = get_branch_timeout(context)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    
+    futures = {
+        branch_name: branch_executor.submit(branch_fn, *branch_args)
+        for branch_name, (branch_fn, branch_args) in branches.items()
+    }
+    
+    for branch_name, future in futures.items():
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            results[branch_name] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error(f"Branch {branch_name} timed out after {timeout:.2f}s")
+            branch_errors[branch_name] = 'Timed out'
+        except Exception as e:
+            branch_errors[branch_name] = str(e)
+    
+    return results, branch_errors
+
+def build_branch_failure(session_id: str, branch_results: Dict[str, Any],
+                         branch_errors: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Build the error response for failed or timed-out processing branches.
+
+    A branch that timed out or failed fast on a degraded dependency makes
+    the failure retryable (504 or 503); any other error is a 500.
+    """
+    timed_out = [name for name, error in branch_errors.items() if error == 'Timed out']
+    unavailable = [name for name, error in branch_errors.items() if error.startswith(DEPENDENCY_UNAVAILABLE)]
+    status_code = 504 if timed_out else 503 if unavailable else 500
+    return status_code, {
+        'error': 'Document processing failed',
+        'retryable': status_code != 500,
+        'branch_errors': branch_errors,
+        'session_id': session_id,
+        'extracted_fields': branch_results.get('extract_document_fields', {}),
+        'face_s3_key': (branch_results.get('detect_and_crop_face') or {}).get('face_s3_key')
+    }
+
+def prepare_document_pages(uploads: List[bytes],
+                           upload_hashes: List[str]) -> Tuple[List[PreparedImage], List[str], List[Optional[Dict[str, Any]]]]:
+    """
+    Prepare the pages of a document from page images and PDFs.
+    
+    Photographed pages go through the quality prescreen as they are prepared,
+    so a bad capture is rejected before any page reaches AWS. Rendered PDF
+    pages are not photographs and skip it.
+    
+    Args:
+        uploads: Decoded uploads in page order; a PDF contributes all of its pages
+        upload_hashes: Content hash of each upload
+    
+    Returns:
+        Tuple of (prepared pages, content hash of each page, quality report of each page or None)
+    
+    Raises:
+        TooManyPagesError: If the document has more than MAX_DOCUMENT_PAGES pages
+        ImageQualityError: If a photographed page fails the prescreen
+    """
+    pages = []
+    page_hashes = []
+    page_quality = []
+    for upload, upload_hash in zip(uploads, upload_hashes):
+        if is_pdf(upload):
+            pdf_pages = render_pdf_pages(upload, max_pages=MAX_DOCUMENT_PAGES - len(pages))
+            pages.extend(pdf_pages)
+            page_hashes.extend(f"{upload_hash}:{index}" for index in range(len(pdf_pages)))
+            page_quality.extend([None] * len(pdf_pages))
+        elif len(pages) < MAX_DOCUMENT_PAGES:
+            page = prepare_image(upload)
+            page_quality.append(prescreen(page.image, page.original_dimensions, page=len(pages) + 1))
+            pages.append(page)
+            page_hashes.append(upload_hash)
+        else:
+            raise TooManyPagesError(f"Document has more than {MAX_DOCUMENT_PAGES} pages")
+    return pages, page_hashes, page_quality
+
+def process_document_pages(session_id: str, document_type: str, pages: List[PreparedImage],
+                           page_hashes: List[str], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a multi-page document, such as the front and back of a driver's license or a PDF.
+    
+    Args:
+        session_id: Unique session identifier
+        document_type: Document type
+        pages: Prepared pages in document order
+        page_hashes: Content hash of each page
+        context: Lambda context used to derive the timeout budget
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    branch_results, branch_errors = run_branches({
+        'extract_document_fields': (extract_page_fields, (pages, page_hashes)),
+        'detect_and_crop_face': (detect_and_crop_page_face, (pages, session_id, page_hashes))
+    }, context)
+    
+    fields_result = branch_results.get('extract_document_fields', {})
+    face_result = branch_results.get('detect_and_crop_face', {})
+    
+    if branch_errors:
+        return build_branch_failure(session_id, {
+            'extract_document_fields': fields_result.get('extracted_fields', {}),
+            'detect_and_crop_face': face_result
+        }, branch_errors)
+    
+    return 200, {
+        'session_id': session_id,
+        'document_type': document_type,
+        'extracted_fields': fields_result['extracted_fields'],
+        'field_confidence': fields_result['field_confidence'],
+        'page_count': len(pages),
+        'identity_documents': fields_result['identity_documents'],
+        'analyze_id_calls': fields_result['analyze_id_calls'],
+        'face_detected': face_result['face_s3_key'] is not None,
+        'face_s3_key': face_result['face_s3_key'],
+        'face_page': face_result['face_page'],
+        'face_candidates': face_result['face_candidates'],
+        'page_preparation': [page.stats for page in pages],
+        'status': 'PROCESSED'
+    }
+
+def process_uploaded_pages(session_id: str, document_type: str, uploads: List[bytes],
+                           context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process decoded inline uploads as the pages of one document.
+    
+    Args:
+        session_id: Unique session identifier
+        document_type: Document type
+        uploads: Decoded page images and PDFs in page order; released once the pages are prepared
+        context: Lambda context used to derive the timeout budget
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    upload_hashes = [hash_image(upload) for upload in uploads]
+    
+    # A resubmission of the same pages for the same session is answered without decoding them
+    document_key = hash_image(f"{session_id}:{document_type}:{':'.join(upload_hashes)}".encode())
+    cached_response = result_cache.get('document_result', document_key) if CACHE_ENABLED else None
+    if cached_response is not None:
+        return 200, dict(cached_response, result_source='cache')
+    
+    pages, page_hashes, page_quality = prepare_document_pages(uploads, upload_hashes)
+    del uploads
+    
+    status_code, response_data = process_document_pages(session_id, document_type, pages, page_hashes, context)
+    if any(report is not None for report in page_quality):
+        response_data['page_quality'] = page_quality
+    if status_code == 200 and CACHE_ENABLED:
+        result_cache.set('document_result', document_key, response_data)
+    return status_code, response_data
+
+def process_s3_document(session_id: str, s3_bucket: str, s3_key: str, document_type: str,
+                        context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a document uploaded directly to S3.
+    
+    Textract and Rekognition read the object themselves, so the image only
+    enters Lambda memory when a detected face has to be cropped.
+    
+    Args:
+        session_id: Unique session identifier
+        s3_bucket: Bucket holding the upload
+        s3_key: Key of the upload
+        document_type: Document type
+        context: Lambda context used to derive the timeout budget
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    s3_object = {'Bucket': s3_bucket, 'Name': s3_key}
+    
+    # Upload keys are unique per presigned URL, so the key identifies the content
+    image_hash = hash_image(f"s3://{s3_bucket}/{s3_key}".encode('utf-8'))
+    
+    # analyze_id does not read PDFs, so their pages are rendered here
+    if s3_key.lower().endswith('.pdf'):
+        response = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
+        pages, page_hashes, _ = prepare_document_pages([response['Body'].read()], [image_hash])
+        status_code, response_body = process_document_pages(session_id, document_type, pages, page_hashes, context)
+        if status_code == 200:
+            response_body['document_s3_key'] = s3_key
+        return status_code, response_body
+    
+    branch_results, branch_errors = run_document_branches(
+        None, session_id, context, image_hash=image_hash, s3_object=s3_object
+    )
+    
+    if branch_errors:
+        return build_branch_failure(session_id, branch_results, branch_errors)
+    
+    face_result = branch_results['detect_and_crop_face']
+    return 200, {
+        'session_id': session_id,
+        'document_type': document_type,
+        'extracted_fields': branch_results.get('extract_document_fields', {}),
+        'face_detected': face_result['face_s3_key'] is not None,
+        'face_s3_key': face_result['face_s3_key'],
+        'face_candidates': face_result['face_candidates'],
+        'document_s3_key': s3_key,
+        'status': 'PROCESSED'
+    }
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a document event and return the status code and response body.
+    
+    Shared by lambda_handler and in-process callers so the body stays a native dict.
     
     Expected event structure:
     {
         "session_id": "unique-session-id",
         "image_data": "base64-encoded-image",
+        "s3_key": "uploads/session-id/upload-id.jpg" (instead of image_data),
+        "s3_bucket": "your-kyc-bucket" (with s3_key),
+        "pages": ["base64-encoded-front", "base64-encoded-back"] (instead of image_data),
         "document_type": "passport" | "drivers-license" | "national-id"
     }
+    
+    image_data, a pages entry or the object at s3_key may also be a PDF.
+    
+    Returns:
+        Tuple of (status_code, response_body)
     """
     try:
+        if is_warm_event(event):
+            return 200, warm(WARM_CLIENTS, WARM_IMPORTS)
+        
         # Parse input
         session_id = event.get('session_id')
         image_data = event.get('image_data')
+        page_data = event.get('pages')
+        s3_key = event.get('s3_key')
         document_type = event.get('document_type', 'passport')
         
-                if not session_id or not image_data:
-            return create_response(400, {
-                'error': 'Missing required parameters: session_id and image_data'
-            })
+        if not session_id or not (image_data or page_data or s3_key):
+            return 400, {
+                'error': 'Missing required parameters: session_id and image_data, pages or s3_key'
+            }
+        
+        if page_data is not None and (not isinstance(page_data, list) or len(page_data) > MAX_DOCUMENT_PAGES):
+            return 400, {
+                'error': f"pages must be a list of at most {MAX_DOCUMENT_PAGES} base64-encoded images"
+            }
+        
+        if s3_key:
+            return process_s3_document(session_id, event.get('s3_bucket', 'your-kyc-bucket'), s3_key, document_type, context)
+        
+        if sum(len(data) for data in page_data or [image_data]) * 3 // 4 > MAX_UPLOAD_BYTES:
+            return 413, {
+                'error': 'Image too large',
+                'message': f"Decoded image exceeds {MAX_UPLOAD_BYTES} bytes; upload it with create_upload_url instead",
+                'session_id': session_id
+            }
+        
+        if page_data:
+            with span('base64_decode'):
+                uploads = [decode_base64(data) for data in page_data]
+            return process_uploaded_pages(session_id, document_type, uploads, context)
         
         # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
+        with span('base64_decode'):
+            image_bytes = decode_base64(image_data)
+        
+        if is_pdf(image_bytes):
+            return process_uploaded_pages(session_id, document_type, [image_bytes], context)
+        
+        # Hash the upload so retried submissions reuse earlier Textract/Rekognition results
+        image_hash = hash_image(image_bytes)
+        
+        # A resubmission of the same image for the same session is answered without decoding it
+        document_key = hash_image(f"{session_id}:{document_type}:{image_hash}".encode())
+        cached_response = result_cache.get('document_result', document_key) if CACHE_ENABLED else None
+        if cached_response is not None:
+            return 200, dict(cached_response, result_source='cache')
+        
+        # Decode once, downscale and re-encode to fit the AWS payload limits
+        prepared_image = prepare_image(image_bytes)
+        del image_bytes
+        preparation_stats = prepared_image.stats
+        logger.info(f"Prepared document image: {preparation_stats}")
         
-        # Extract document fields
-        document_fields = extract_document_fields(image_bytes)
+        # Reject unusable captures before paying for Textract and Rekognition
+        quality_report = prescreen(prepared_image.image, prepared_image.original_dimensions)
         
-        # Detect and crop face
-        face_s3_key = detect_and_crop_face(image_bytes, session_id)
+        # Extract document fields and detect/crop the face
+        branch_results, branch_errors = run_document_branches(
+            prepared_image.image_bytes, session_id, context,
+            image=prepared_image.image, image_hash=image_hash
+        )
+        # Both branches are done with the decoded image and the payload
+        del prepared_image
+        logger.info(f"Result cache stats: {result_cache.stats()}")
+        
+        if branch_errors:
+            return build_branch_failure(session_id, branch_results, branch_errors)
+        
+        document_fields = branch_results.get('extract_document_fields', {})
+        face_result = branch_results['detect_and_crop_face']
         
         # Prepare response
         response_data = {
             'session_id': session_id,
             'document_type': document_type,
             'extracted_fields': document_fields,
-            'face_detected': face_s3_key is not None,
-            'face_s3_key': face_s3_key,
+            'face_detected': face_result['face_s3_key'] is not None,
+            'face_s3_key': face_result['face_s3_key'],
+            'face_candidates': face_result['face_candidates'],
+            'image_preparation': preparation_stats,
             'status': 'PROCESSED'
         }
+        if quality_report is not None:
+            response_data['image_quality'] = quality_report
         
         # Store results in DynamoDB or S3 for later retrieval
         # This would be implemented based on your data storage strategy
         
-        return create_response(200, response_data)
+        if CACHE_ENABLED:
+            result_cache.set('document_result', document_key, response_data)
+        
+        return 200, response_data
         
+    except TooManyPagesError as e:
+        return 400, {
+            'error': 'Too many pages',
+            'message': str(e),
+            'session_id': event.get('session_id')
+        }
+    except ImageQualityError as e:
+        return 422, {
+            'error': 'Image quality too low',
+            'message': str(e),
+            'reject_reasons': e.report['reject_reasons'],
+            'image_quality': e.report['metrics'],
+            'page': e.page,
+            'retake': True,
+            'session_id': event.get('session_id')
+        }
+    except ImageTooLargeError as e:
+        return 413, {
+            'error': 'Image too large',
+            'message': str(e),
+            'session_id': event.get('session_id')
+        }
+    except DependencyUnavailableError as e:
+        logger.error(f"Error in document processor: {str(e)}")
+        return e.status_code, build_dependency_failure(e, event.get('session_id'))
     except Exception as e:
         logger.error(f"Error in document processor: {str(e)}")
-        return create_response(500, {
+        return 500, {
             'error': 'Internal server error',
             'message': str(e)
-        })
+        }
+
+@instrument_handler('document-processor')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for document processing.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -1,35 +1,42 @@
-import json
-import boto3
-import base64
-from typing import Dict, Any, Optional
+import os
+from concurrent.futures import wait
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
 import logging
 
-# CORS Helper Functions (inline)
-def get_cors_headers():
-    return {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
-
-def create_response(status_code: int, body: dict, cors_enabled: bool = True):
-    response = {
-        'statusCode': status_code,
-        'body': json.dumps(body)
-    }
-    
-    if cors_enabled:
-        response['headers'] = get_cors_headers()
-    
-    return response
+from cors_helper import create_response
+from resilience import DependencyUnavailableError, build_dependency_failure, resilient_client
+from response_shaping import InvalidVerbosityError, fit_response, get_verbosity, shape_face_comparison_response
+from result_cache import result_cache, hash_image
+import face_index
+from instrumentation import ContextThreadPoolExecutor, instrument_handler
+from warmup import is_warm_event, warm
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-rekognition_client = boto3.client('rekognition')
-s3_client = boto3.client('s3')
+# Initialize AWS clients (built on first use, with adaptive timeouts, hedging and circuit breakers)
+rekognition_client = resilient_client('rekognition')
+s3_client = resilient_client('s3')
+
+# Clients a warmer event prepares
+WARM_CLIENTS = ['rekognition', 's3']
+
+# Pass S3Object references to compare_faces instead of downloading the images:
+# "auto" (when the bucket is in the Rekognition region), "true" or "false"
+COMPARE_S3_OBJECTS = os.environ.get('FACE_COMPARE_S3_OBJECTS', 'auto').lower()
+
+# Milliseconds kept back from the invocation deadline when budgeting downloads
+DOWNLOAD_TIMEOUT_MARGIN_MS = int(os.environ.get('DOWNLOAD_TIMEOUT_MARGIN_MS', '3000'))
+
+# Shared across warm invocations; both images of a comparison download at once
+download_executor = ContextThreadPoolExecutor(
+    max_workers=int(os.environ.get('FACE_DOWNLOAD_WORKERS', '4')),
+    thread_name_prefix='face-download'
+)
+
+# Bucket -> region, or None when the lookup failed
+bucket_regions: Dict[str, Optional[str]] = {}
 
 def get_image_from_s3(bucket: str, key: str) -> bytes:
     """
@@ -49,13 +56,17 @@ def get_image_from_s3(bucket: str, key: str) -> bytes:
         logger.error(f"Error downloading image from S3: {str(e)}")
         raise
 
-def compare_faces(source_image_bytes: bytes, target_image_bytes: bytes, similarity_threshold: float = 95.0) -> Dict[str, Any]:
+def to_rekognition_image(image: Union[bytes, Dict[str, Any]]) -> Dict[str, Any]:
+    return image if isinstance(image, dict) else {'Bytes': image}
+
+def compare_faces(source_image: Union[bytes, Dict[str, Any]], target_image: Union[bytes, Dict[str, Any]],
+                  similarity_threshold: float = 95.0) -> Dict[str, Any]:
     """
     Compare two face images using AWS Rekognition.
     
     Args:
-        source_image_bytes: Source image bytes (ID face)
-        target_image_bytes: Target image bytes (Liveness reference)
+        source_image: Source image bytes or Rekognition Image dict (ID face)
+        target_image: Target image bytes or Rekognition Image dict (Liveness reference)
         similarity_threshold: Minimum similarity threshold (0-100)
     
     Returns:
@@ -63,8 +74,8 @@ def compare_faces(source_image_bytes: bytes, target_image_bytes: bytes, similari
     """
     try:
         response = rekognition_client.compare_faces(
-            SourceImage={'Bytes': source_image_bytes},
-            TargetImage={'Bytes': target_image_bytes},
+            SourceImage=to_rekognition_image(source_image),
+            TargetImage=to_rekognition_image(target_image),
             SimilarityThreshold=similarity_threshold
         )
         
@@ -92,60 +103,278 @@ def compare_faces(source_image_bytes: bytes, target_image_bytes: bytes, similari
         logger.error(f"Error comparing faces: {str(e)}")
         raise
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def passes_threshold(comparison_result: Dict[str, Any], similarity_threshold: float) -> bool:
+    return comparison_result['is_match'] and comparison_result['similarity_score'] >= similarity_threshold
+
+def compare_face_candidates(comparisons: List[Callable[[], Dict[str, Any]]],
+                            similarity_threshold: float) -> Tuple[Dict[str, Any], int]:
     """
-    Main Lambda handler for face comparison.
+    Compare the ranked ID face candidates in order until one passes.
+    
+    document_processor persists a crop of every plausible face, so when the
+    best-ranked crop is the wrong face (e.g. the ghost image on a passport)
+    the next one is compared without detecting faces again.
+    
+    Args:
+        comparisons: One call per candidate, best-ranked first, returning a compare_faces result
+        similarity_threshold: Minimum similarity a comparison needs to pass
+    
+    Returns:
+        Tuple of (passing or most similar comparison result, index of its candidate)
+    """
+    best_result, best_index = None, 0
+    for index, compare in enumerate(comparisons):
+        try:
+            comparison_result = compare()
+        except Exception as e:
+            # Rekognition rejects a source crop in which it finds no face; try the next one
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code != 'InvalidParameterException' or (index == len(comparisons) - 1 and best_result is None):
+                raise
+            logger.warning(f"Error comparing face candidate {index + 1}, trying the next: {str(e)}")
+            continue
+        
+        if best_result is None or comparison_result['similarity_score'] > best_result['similarity_score']:
+            best_result, best_index = comparison_result, index
+        if passes_threshold(comparison_result, similarity_threshold):
+            break
+    
+    return best_result, best_index
+
+def get_download_timeout(context: Any) -> Optional[float]:
+    """
+    Work out how long the image downloads may take before the invocation times out.
+    
+    Args:
+        context: Lambda context object (may be None for in-process calls)
+    
+    Returns:
+        Timeout in seconds, or None when no deadline is known
+    """
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    
+    remaining_ms = context.get_remaining_time_in_millis() - DOWNLOAD_TIMEOUT_MARGIN_MS
+    return max(remaining_ms, 0) / 1000.0
+
+def download_images(bucket: str, keys: List[str], timeout: Optional[float] = None) -> List[bytes]:
+    """
+    Download several images from S3 concurrently.
+    
+    Args:
+        bucket: S3 bucket name
+        keys: S3 object keys
+        timeout: Seconds to wait for all downloads, or None to wait indefinitely
+    
+    Returns:
+        Image bytes in the order of keys
+    
+    Raises:
+        TimeoutError: If the downloads do not finish within timeout
+    """
+    futures = [download_executor.submit(get_image_from_s3, bucket, key) for key in keys]
+    _, not_done = wait(futures, timeout=timeout)
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        raise TimeoutError(f"Timed out downloading {len(not_done)} of {len(keys)} images")
+    return [future.result() for future in futures]
+
+def get_bucket_region(bucket: str) -> Optional[str]:
+    """
+    Look up and cache the region of a bucket.
+    
+    Args:
+        bucket: S3 bucket name
+    
+    Returns:
+        Region name, or None if it could not be determined
+    """
+    if bucket not in bucket_regions:
+        try:
+            location = s3_client.get_bucket_location(Bucket=bucket).get('LocationConstraint')
+            # Buckets in us-east-1 report no location; "EU" is the legacy name of eu-west-1
+            bucket_regions[bucket] = {None: 'us-east-1', 'EU': 'eu-west-1'}.get(location, location)
+        except Exception as e:
+            logger.warning(f"Error looking up region of bucket {bucket}: {str(e)}")
+            bucket_regions[bucket] = None
+    return bucket_regions[bucket]
+
+def use_s3_object_references(bucket: str) -> bool:
+    """
+    Decide whether Rekognition can read the images from S3 itself.
+    
+    Rekognition only accepts S3Object images from buckets in its own region.
+    
+    Args:
+        bucket: S3 bucket holding both images
+    
+    Returns:
+        True if compare_faces should receive S3Object references
+    """
+    if COMPARE_S3_OBJECTS == 'true':
+        return True
+    if COMPARE_S3_OBJECTS != 'auto':
+        return False
+    bucket_region = get_bucket_region(bucket)
+    return bucket_region is not None and bucket_region == rekognition_client.meta.region_name
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a face comparison event and return the status code and response body.
+    
+    Shared by lambda_handler and in-process callers so the body stays a native dict.
     
     Expected event structure:
     {
         "session_id": "unique-session-id",
         "id_face_s3_key": "faces/session-id/id_face.jpg",
+        "id_face_candidate_s3_keys": ["faces/session-id/id_face_2.jpg"] (optional fallbacks, best first),
         "liveness_reference_s3_key": "liveness-sessions/session-id/reference.jpg",
         "s3_bucket": "your-kyc-bucket",
-        "similarity_threshold": 95.0
+        "similarity_threshold": 95.0,
+        "verbosity": "verdict" | "summary" | "full" (optional, default KYC_RESPONSE_VERBOSITY)
     }
+    
+    Returns:
+        Tuple of (status_code, response_body)
     """
     try:
+        if is_warm_event(event):
+            return 200, warm(WARM_CLIENTS)
+        
         # Parse input
         session_id = event.get('session_id')
         id_face_s3_key = event.get('id_face_s3_key')
+        candidate_s3_keys = event.get('id_face_candidate_s3_keys') or []
         liveness_reference_s3_key = event.get('liveness_reference_s3_key')
         s3_bucket = event.get('s3_bucket', 'your-kyc-bucket')
         similarity_threshold = event.get('similarity_threshold', 95.0)
+        verbosity = get_verbosity(event)
         
         # Validate required parameters
         if not all([session_id, id_face_s3_key, liveness_reference_s3_key]):
-            return create_response(400, {
+            return 400, {
                 'error': 'Missing required parameters: session_id, id_face_s3_key, liveness_reference_s3_key'
-            })
+            }
+        
+        id_face_s3_keys = [id_face_s3_key] + [key for key in candidate_s3_keys if key != id_face_s3_key]
         
-        # Download images from S3
-        logger.info(f"Downloading ID face from S3: {id_face_s3_key}")
-        id_face_bytes = get_image_from_s3(s3_bucket, id_face_s3_key)
+        # The face index labels enrollments by image hash, so it needs the image bytes
+        if face_index.face_index is None and use_s3_object_references(s3_bucket):
+            liveness_reference = {'S3Object': {'Bucket': s3_bucket, 'Name': liveness_reference_s3_key}}
+            comparison_result, candidate_index = compare_face_candidates([
+                lambda key=key: compare_faces({'S3Object': {'Bucket': s3_bucket, 'Name': key}}, liveness_reference,
+                                              similarity_threshold)
+                for key in id_face_s3_keys
+            ], similarity_threshold)
+            return 200, fit_response({
+                'session_id': session_id,
+                'face_comparison': comparison_result,
+                'comparison_source': 'compare_faces',
+                'image_source': 's3_object',
+                'id_face_s3_key': id_face_s3_keys[candidate_index],
+                'candidate_rank': candidate_index + 1,
+                'verification_passed': passes_threshold(comparison_result, similarity_threshold),
+                'status': 'COMPLETED'
+            }, shape_face_comparison_response, verbosity)
         
-        logger.info(f"Downloading liveness reference from S3: {liveness_reference_s3_key}")
-        liveness_reference_bytes = get_image_from_s3(s3_bucket, liveness_reference_s3_key)
+        # Download every candidate and the reference at once; the crops are small
+        logger.info(f"Downloading ID faces {id_face_s3_keys} and liveness reference {liveness_reference_s3_key} from S3")
+        try:
+            *candidate_bytes, liveness_reference_bytes = download_images(
+                s3_bucket,
+                id_face_s3_keys + [liveness_reference_s3_key],
+                get_download_timeout(context)
+            )
+        except TimeoutError as e:
+            logger.error(f"Error downloading images: {str(e)}")
+            return 504, {
+                'error': 'Image download timed out',
+                'message': str(e),
+                'retryable': True,
+                'session_id': session_id
+            }
         
-        # Compare faces
-        comparison_result = compare_faces(
-            id_face_bytes, 
-            liveness_reference_bytes, 
+        candidate_hashes = [hash_image(image_bytes) for image_bytes in candidate_bytes]
+        id_face_hash = candidate_hashes[0]
+        
+        # One index search finds both this session's earlier enrollment and other identities.
+        # The index only flags duplicates and avoids re-enrolling; the verdict always comes from compare_faces
+        index_lookup = None
+        if face_index.face_index is not None:
+            try:
+                index_lookup = face_index.lookup_face(session_id, id_face_hash, liveness_reference_bytes)
+            except Exception as e:
+                logger.warning(f"Error searching face index: {str(e)}")
+        
+        # Compare faces; a repeated verification of the same session and images reuses the result
+        liveness_reference_hash = hash_image(liveness_reference_bytes)
+        
+        def compare_candidate(index: int) -> Dict[str, Any]:
+            comparison_key = hash_image('|'.join([
+                session_id,
+                candidate_hashes[index],
+                liveness_reference_hash,
+                str(similarity_threshold)
+            ]).encode())
+            return result_cache.get_or_compute(
+                'compare_faces',
+                comparison_key,
+                lambda: compare_faces(candidate_bytes[index], liveness_reference_bytes, similarity_threshold)
+            )
+        
+        comparison_result, candidate_index = compare_face_candidates(
+            [lambda index=index: compare_candidate(index) for index in range(len(candidate_bytes))],
             similarity_threshold
         )
         
+        verification_passed = passes_threshold(comparison_result, similarity_threshold)
+        
         # Prepare response
         response_data = {
             'session_id': session_id,
             'face_comparison': comparison_result,
-            'verification_passed': comparison_result['is_match'] and comparison_result['similarity_score'] >= similarity_threshold,
+            'comparison_source': 'compare_faces',
+            'image_source': 'bytes',
+            'id_face_s3_key': id_face_s3_keys[candidate_index],
+            'candidate_rank': candidate_index + 1,
+            'verification_passed': verification_passed,
             'status': 'COMPLETED'
         }
         
-        return create_response(200, response_data)
+        if index_lookup is not None:
+            response_data['duplicate_identities'] = index_lookup['duplicates']
+            response_data['duplicate_detected'] = bool(index_lookup['duplicates'])
+            # The lookup searched for the first candidate's enrollment only
+            already_enrolled = index_lookup['enrolled_match'] is not None and candidate_index == 0
+            if verification_passed and not already_enrolled:
+                try:
+                    face_index.enroll_face(session_id, candidate_hashes[candidate_index], liveness_reference_bytes)
+                except Exception as e:
+                    logger.warning(f"Error enrolling face for session {session_id}: {str(e)}")
         
+        return 200, fit_response(response_data, shape_face_comparison_response, verbosity)
+        
+    except InvalidVerbosityError as e:
+        return 400, {
+            'error': str(e),
+            'session_id': event.get('session_id')
+        }
+    except DependencyUnavailableError as e:
+        logger.error(f"Error in face comparison: {str(e)}")
+        return e.status_code, build_dependency_failure(e, event.get('session_id'))
     except Exception as e:
         logger.error(f"Error in face comparison: {str(e)}")
-        return create_response(500, {
+        return 500, {
             'error': 'Internal server error',
             'message': str(e)
-        })
+        }
+
+@instrument_handler('face-comparison')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for face comparison.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -0,0 +1,316 @@
+import io
+import os
+import importlib
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Callable
+
+from aws_clients import lazy_client
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Index backend: "none", "rekognition" (collection) or "numpy" (in-process matrix)
+FACE_INDEX_BACKEND = os.environ.get('FACE_INDEX_BACKEND', 'none')
+FACE_COLLECTION_ID = os.environ.get('FACE_COLLECTION_ID', 'kyc-verified-faces')
+
+# Embedding model of the numpy backend as "module:function" (image bytes -> vector);
+# required, since the built-in thumbnail_embedding is not a biometric embedding
+FACE_INDEX_EMBEDDER = os.environ.get('FACE_INDEX_EMBEDDER', '')
+
+# Similarity (0-100) at which two faces are treated as the same person
+FACE_INDEX_MATCH_THRESHOLD = float(os.environ.get('FACE_INDEX_MATCH_THRESHOLD', '95.0'))
+FACE_INDEX_MAX_RESULTS = int(os.environ.get('FACE_INDEX_MAX_RESULTS', '10'))
+
+# Initial row capacity of the NumPy matrix; it doubles when full
+NUMPY_INITIAL_CAPACITY = 1024
+
+# Imported by the numpy backend on first use, so other configurations never pay for it
+np = None
+
+def load_numpy() -> Any:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+def build_label(session_id: str, id_face_hash: str) -> str:
+    """
+    Label stored with an enrolled face.
+
+    The ID face hash is part of the label, so a session that later uploads a
+    different document no longer matches its own enrollment.
+
+    Args:
+        session_id: KYC session identifier
+        id_face_hash: Content hash of the ID face the session was verified against
+
+    Returns:
+        Label in the character set Rekognition accepts for ExternalImageId
+    """
+    return f"{session_id}:{id_face_hash[:16]}"
+
+def parse_label(label: str) -> Dict[str, str]:
+    session_id, _, id_face_hash = label.rpartition(':')
+    return {'session_id': session_id, 'id_face_hash': id_face_hash}
+
+def thumbnail_embedding(image_bytes: bytes, size: int = 16) -> Any:
+    """
+    Cheap deterministic face vector from a grayscale thumbnail.
+
+    Only suitable for tests and benchmarks, which pass it to NumpyFaceIndex
+    explicitly; it is not a biometric embedding and is never used by default.
+
+    Args:
+        image_bytes: Face image bytes
+        size: Thumbnail edge in pixels; the vector has size * size dimensions
+
+    Returns:
+        Unit-length float32 vector
+    """
+    from PIL import Image
+
+    load_numpy()
+    img = Image.open(io.BytesIO(image_bytes)).convert('L').resize((size, size))
+    vector = np.asarray(img, dtype=np.float32).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class RekognitionFaceIndex:
+    """
+    Verified faces stored in a Rekognition collection, labelled through ExternalImageId.
+
+    The collection must exist (aws rekognition create-collection).
+    """
+
+    def __init__(self, collection_id: str = FACE_COLLECTION_ID):
+        self.collection_id = collection_id
+        self.rekognition_client = lazy_client('rekognition')
+
+    def enroll(self, label: str, image_bytes: bytes) -> Optional[str]:
+        response = self.rekognition_client.index_faces(
+            CollectionId=self.collection_id,
+            Image={'Bytes': image_bytes},
+            ExternalImageId=label,
+            MaxFaces=1,
+            QualityFilter='AUTO'
+        )
+        records = response.get('FaceRecords', [])
+        return records[0]['Face']['FaceId'] if records else None
+
+    def search(self, image_bytes: bytes, threshold: float = FACE_INDEX_MATCH_THRESHOLD,
+               max_results: int = FACE_INDEX_MAX_RESULTS) -> List[Dict[str, Any]]:
+        try:
+            response = self.rekognition_client.search_faces_by_image(
+                CollectionId=self.collection_id,
+                Image={'Bytes': image_bytes},
+                FaceMatchThreshold=threshold,
+                MaxFaces=max_results
+            )
+        except self.rekognition_client.exceptions.InvalidParameterException:
+            # Raised when the image contains no face
+            return []
+
+        return [
+            {
+                'label': match['Face'].get('ExternalImageId', ''),
+                'face_id': match['Face']['FaceId'],
+                'similarity': match['Similarity']
+            }
+            for match in response.get('FaceMatches', [])
+        ]
+
+class NumpyFaceIndex:
+    """
+    Face vectors held in an in-process NumPy matrix, searched by cosine similarity.
+
+    Rows are unit vectors, so one matrix-vector product scores the query
+    against every enrolled face. Intended for tests, benchmarks and
+    single-process deployments with their own embedding model.
+    """
+
+    def __init__(self, embedder: Callable[[bytes], Any], dimensions: Optional[int] = None):
+        load_numpy()
+        self.embedder = embedder
+        self.dimensions = dimensions
+        self.vectors = None
+        self.labels: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add_vector(self, label: str, vector: Any) -> str:
+        """
+        Add a face vector, growing the matrix geometrically so appends stay amortized O(1).
+
+        Args:
+            label: Label from build_label
+            vector: Face vector; normalized before storage
+
+        Returns:
+            Row id of the stored vector
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._lock:
+            if self.vectors is None:
+                self.dimensions = self.dimensions or vector.shape[0]
+                self.vectors = np.zeros((NUMPY_INITIAL_CAPACITY, self.dimensions), dtype=np.float32)
+            elif len(self.labels) == self.vectors.shape[0]:
+                grown = np.zeros((self.vectors.shape[0] * 2, self.dimensions), dtype=np.float32)
+                grown[:len(self.labels)] = self.vectors
+                self.vectors = grown
+
+            row = len(self.labels)
+            self.vectors[row] = vector
+            self.labels.append(label)
+            return str(row)
+
+    def enroll(self, label: str, image_bytes: bytes) -> Optional[str]:
+        return self.add_vector(label, self.embedder(image_bytes))
+
+    def search_vector(self, vector: Any, threshold: float = FACE_INDEX_MATCH_THRESHOLD,
+                      max_results: int = FACE_INDEX_MAX_RESULTS) -> List[Dict[str, Any]]:
+        """
+        Find the enrolled faces most similar to a vector.
+
+        Args:
+            vector: Query face vector
+            threshold: Minimum similarity, 0-100 (cosine similarity * 100)
+            max_results: Largest number of matches returned
+
+        Returns:
+            Matches ordered by descending similarity
+        """
+        with self._lock:
+            count = len(self.labels)
+            if count == 0:
+                return []
+            vectors = self.vectors[:count]
+            labels = self.labels[:count]
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = vectors @ query * 100.0
+        # argpartition finds the top candidates in O(n) before the small sort
+        if count > max_results:
+            candidates = np.argpartition(scores, -max_results)[-max_results:]
+        else:
+            candidates = np.arange(count)
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+
+        return [
+            {
+                'label': labels[row],
+                'face_id': str(row),
+                'similarity': round(float(scores[row]), 2)
+            }
+            for row in candidates if scores[row] >= threshold
+        ]
+
+    def search(self, image_bytes: bytes, threshold: float = FACE_INDEX_MATCH_THRESHOLD,
+               max_results: int = FACE_INDEX_MAX_RESULTS) -> List[Dict[str, Any]]:
+        return self.search_vector(self.embedder(image_bytes), threshold, max_results)
+
+def load_embedder(path: str = FACE_INDEX_EMBEDDER) -> Callable[[bytes], Any]:
+    """
+    Import the embedding model configured for the numpy backend.
+
+    Args:
+        path: "module:function", the function mapping face image bytes to a vector
+
+    Returns:
+        The embedding function
+
+    Raises:
+        RuntimeError: If no embedder is configured
+    """
+    if not path:
+        raise RuntimeError('FACE_INDEX_BACKEND=numpy requires FACE_INDEX_EMBEDDER (module:function)')
+    module_name, _, function_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+def build_numpy_face_index() -> NumpyFaceIndex:
+    return NumpyFaceIndex(embedder=load_embedder())
+
+# Backend name -> factory; additional backends can be registered here
+FACE_INDEXES = {
+    'rekognition': RekognitionFaceIndex,
+    'numpy': build_numpy_face_index
+}
+
+def build_face_index() -> Optional[Any]:
+    """
+    Build the face index from the environment configuration.
+
+    Returns:
+        Configured index, or None when indexing is disabled
+
+    Raises:
+        RuntimeError: If the numpy backend has no FACE_INDEX_EMBEDDER
+    """
+    index_factory = FACE_INDEXES.get(FACE_INDEX_BACKEND)
+    return index_factory() if index_factory is not None else None
+
+# Module-level index shared across warm invocations
+face_index = build_face_index()
+
+def lookup_face(session_id: str, id_face_hash: str, image_bytes: bytes,
+                threshold: float = FACE_INDEX_MATCH_THRESHOLD) -> Dict[str, Any]:
+    """
+    Search the index once for both the session's own enrollment and other identities.
+
+    Args:
+        session_id: KYC session identifier
+        id_face_hash: Content hash of the ID face being verified
+        image_bytes: Liveness reference image
+        threshold: Minimum similarity, 0-100
+
+    Returns:
+        Dict with "enrolled_match" (the session's own match for this ID face,
+        or None) and "duplicates" (matches enrolled under other sessions)
+    """
+    own_label = build_label(session_id, id_face_hash)
+    enrolled_match = None
+    duplicates = []
+
+    for match in face_index.search(image_bytes, threshold):
+        if match['label'] == own_label:
+            enrolled_match = enrolled_match or match
+        elif parse_label(match['label'])['session_id'] != session_id:
+            duplicates.append({
+                'session_id': parse_label(match['label'])['session_id'],
+                'face_id': match['face_id'],
+                'similarity': match['similarity']
+            })
+
+    return {
+        'enrolled_match': enrolled_match,
+        'duplicates': duplicates
+    }
+
+def enroll_face(session_id: str, id_face_hash: str, image_bytes: bytes) -> Optional[str]:
+    """
+    Enroll a verified session's liveness reference face.
+
+    Args:
+        session_id: KYC session identifier
+        id_face_hash: Content hash of the ID face it was verified against
+        image_bytes: Liveness reference image
+
+    Returns:
+        FaceId or row id of the enrolled face
+    """
+    face_id = face_index.enroll(build_label(session_id, id_face_hash), image_bytes)
+    logger.info(f"Enrolled face for session {session_id}: {face_id}")
+    return face_id
@@ -0,0 +1,151 @@
+import os
+import io
+import logging
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# DEFAULT already returns BoundingBox, Confidence, Pose and Quality, which is
+# everything the ranking uses; ALL adds age, emotions etc. at extra latency
+DETECT_FACE_ATTRIBUTES = ['DEFAULT']
+
+# Faces detected with lower confidence are not candidates
+MIN_FACE_CONFIDENCE = float(os.environ.get('FACE_MIN_CONFIDENCE', '95'))
+
+# Ranked crops persisted per document, the best first
+MAX_FACE_CANDIDATES = int(os.environ.get('FACE_MAX_CANDIDATES', '3'))
+
+# Weight of each component in a face's score; components are in [0, 1]
+FACE_SCORE_WEIGHTS = {
+    'size': 0.4,
+    'sharpness': 0.25,
+    'pose': 0.15,
+    'brightness': 0.1,
+    'confidence': 0.1
+}
+
+# Head rotation, in degrees, at which the pose component reaches 0
+MAX_POSE_DEGREES = 45.0
+
+# Padding added around the detected bounding box when cropping
+CROP_SCALE = 1.2
+
+def score_face(face: Dict[str, Any], largest_area: float) -> Dict[str, float]:
+    """
+    Score how suitable a detected face is for comparison.
+
+    Size is relative to the largest face detected, so the faded ghost image
+    printed next to a passport photo ranks below the photo itself.
+
+    Args:
+        face: FaceDetail from Rekognition detect_faces
+        largest_area: Normalized bounding box area of the largest candidate
+
+    Returns:
+        Each component in [0, 1] and their weighted sum under 'score'
+    """
+    bbox = face['BoundingBox']
+    quality = face.get('Quality') or {}
+    pose = face.get('Pose') or {}
+
+    # Faces without Quality or Pose (e.g. cached from older responses) score neutrally
+    head_rotation = max(abs(pose.get(angle, 0.0)) for angle in ('Yaw', 'Pitch', 'Roll'))
+    components = {
+        'size': bbox['Width'] * bbox['Height'] / largest_area if largest_area else 0.0,
+        'sharpness': quality.get('Sharpness', 50.0) / 100.0,
+        'pose': max(0.0, 1.0 - head_rotation / MAX_POSE_DEGREES),
+        'brightness': 1.0 - abs(quality.get('Brightness', 50.0) - 50.0) / 50.0,
+        'confidence': (face['Confidence'] - MIN_FACE_CONFIDENCE) / (100.0 - MIN_FACE_CONFIDENCE)
+    }
+    components['score'] = sum(FACE_SCORE_WEIGHTS[name] * value for name, value in components.items())
+    return {name: round(value, 4) for name, value in components.items()}
+
+def rank_faces(pages_face_details: List[List[Dict[str, Any]]],
+               max_candidates: int = MAX_FACE_CANDIDATES) -> List[Dict[str, Any]]:
+    """
+    Rank the faces detected on one or more pages, best candidate first.
+
+    Args:
+        pages_face_details: FaceDetails of each page, in page order
+        max_candidates: Most candidates returned
+
+    Returns:
+        Candidates with 'page' (0-based), 'bounding_box', 'confidence' and the 'score' components
+    """
+    faces = [
+        (page_index, face)
+        for page_index, face_details in enumerate(pages_face_details)
+        for face in face_details
+        if face['Confidence'] > MIN_FACE_CONFIDENCE
+    ]
+    if not faces:
+        return []
+
+    largest_area = max(face['BoundingBox']['Width'] * face['BoundingBox']['Height'] for _, face in faces)
+    candidates = []
+    for page_index, face in faces:
+        scores = score_face(face, largest_area)
+        candidates.append({
+            'page': page_index,
+            'bounding_box': face['BoundingBox'],
+            'confidence': face['Confidence'],
+            'score': scores.pop('score'),
+            'score_components': scores
+        })
+
+    candidates.sort(key=lambda candidate: candidate['score'], reverse=True)
+    return candidates[:max_candidates]
+
+def crop_box(image_size: Tuple[int, int], bbox: Dict[str, float],
+             scale: float = CROP_SCALE) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Convert a normalized bounding box to a padded pixel box within the image.
+
+    Args:
+        image_size: (width, height) of the image
+        bbox: Bounding box from Rekognition {'Width', 'Height', 'Top', 'Left'}
+        scale: Factor to scale the bounding box by (e.g., 1.2 for 20% padding)
+
+    Returns:
+        (left, top, right, bottom) in pixels, or None if the box is empty at this resolution
+    """
+    img_w, img_h = image_size
+
+    # Grow the box around its centre
+    new_w = bbox['Width'] * scale
+    new_h = bbox['Height'] * scale
+    new_l = bbox['Left'] - (new_w - bbox['Width']) / 2
+    new_t = bbox['Top'] - (new_h - bbox['Height']) / 2
+
+    # Convert to pixels, keeping the box inside the image
+    x1 = max(0, int(new_l * img_w))
+    y1 = max(0, int(new_t * img_h))
+    x2 = min(img_w, int((new_l + new_w) * img_w))
+    y2 = min(img_h, int((new_t + new_h) * img_h))
+
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+def encode_face_crop(image: 'Image.Image', box: Tuple[int, int, int, int]) -> io.BytesIO:
+    """
+    Crop a face and encode it as JPEG; the crop is released as soon as it is encoded.
+    """
+    cropped_img = image.crop(box)
+    img_buffer = io.BytesIO()
+    cropped_img.save(img_buffer, format='JPEG')
+    img_buffer.seek(0)
+    return img_buffer
+
+def face_crop_key(session_id: str, rank: int) -> str:
+    """
+    S3 key of a ranked face crop; the best candidate keeps the original id_face.jpg key.
+    """
+    if rank == 0:
+        return f"faces/{session_id}/id_face.jpg"
+    return f"faces/{session_id}/id_face_{rank + 1}.jpg"
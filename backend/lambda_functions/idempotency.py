@@ -0,0 +1,271 @@
+import json
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from instrumentation import metrics
+from shared_redis import get_redis
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Idempotency store: "none", "memory" (per execution environment) or "redis" (shared)
+IDEMPOTENCY_STORE = os.environ.get('KYC_IDEMPOTENCY_STORE', 'memory')
+
+# Lifetime of a stored response
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('KYC_IDEMPOTENCY_TTL_SECONDS', '86400'))
+
+# Lifetime of an in-progress claim, so a crashed request does not block retries for good
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('KYC_IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+# How long a duplicate waits for the original request before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('KYC_IDEMPOTENCY_WAIT_SECONDS', '10'))
+
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('KYC_IDEMPOTENCY_MAX_ENTRIES', '1024'))
+IDEMPOTENCY_REDIS_PREFIX = os.environ.get('KYC_IDEMPOTENCY_REDIS_PREFIX', 'kyc:idempotency')
+
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+class RequestInProgressError(RuntimeError):
+    """
+    Raised when a duplicate request is still running elsewhere after the wait budget.
+    """
+
+class IdempotencyKeyReusedError(ValueError):
+    """
+    Raised when a client-supplied idempotency key arrives with a different payload.
+    """
+
+class MemoryIdempotencyStore:
+    """
+    Idempotency records held in module state, so they survive warm invocations.
+
+    Only requests reaching the same execution environment are de-duplicated;
+    use the redis store to share records between instances.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS,
+                 max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.max_entries = max_entries
+        self.records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.records.get(key)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if expires_at < time.time():
+            del self.records[key]
+            return None
+        return record
+
+    def _set(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> None:
+        self.records.pop(key, None)
+        self.records[key] = (record, time.time() + ttl_seconds)
+        while len(self.records) > self.max_entries:
+            self.records.popitem(last=False)
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._get(key)
+            if record is not None:
+                return record
+            self._set(key, {'state': IN_PROGRESS, 'fingerprint': fingerprint}, self.lock_seconds)
+            return None
+
+    def complete(self, key: str, fingerprint: str, status_code: int, body: Dict[str, Any]) -> None:
+        record = {'state': COMPLETED, 'fingerprint': fingerprint, 'status_code': status_code, 'body': body}
+        with self._lock:
+            self._set(key, record, self.ttl_seconds)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self.records.pop(key, None)
+
+class RedisIdempotencyStore:
+    """
+    Idempotency records in the shared Redis, so duplicates reaching any instance are recognised.
+
+    A claim is a SET NX with the lock lifetime; completing the request
+    overwrites it with the response and the full TTL.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS,
+                 redis_client: Any = None):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.redis_client = redis_client if redis_client is not None else get_redis()
+
+    def claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        name = f"{IDEMPOTENCY_REDIS_PREFIX}:{key}"
+        claim_record = json.dumps({'state': IN_PROGRESS, 'fingerprint': fingerprint})
+        # The record can expire between a failed SET NX and the GET; claim again then
+        for _ in range(2):
+            if self.redis_client.set(name, claim_record, ex=self.lock_seconds, nx=True):
+                return None
+            value = self.redis_client.get(name)
+            if value is not None:
+                return json.loads(value)
+        return None
+
+    def complete(self, key: str, fingerprint: str, status_code: int, body: Dict[str, Any]) -> None:
+        record = {'state': COMPLETED, 'fingerprint': fingerprint, 'status_code': status_code, 'body': body}
+        self.redis_client.set(f"{IDEMPOTENCY_REDIS_PREFIX}:{key}", json.dumps(record), ex=self.ttl_seconds)
+
+    def release(self, key: str) -> None:
+        self.redis_client.delete(f"{IDEMPOTENCY_REDIS_PREFIX}:{key}")
+
+# Store name -> factory; additional backends can be registered here
+IDEMPOTENCY_STORES = {
+    'memory': MemoryIdempotencyStore,
+    'redis': RedisIdempotencyStore
+}
+
+class IdempotencyLayer:
+    """
+    Runs each distinct request once and answers its duplicates with the same response.
+
+    Duplicates arriving while the first request runs in this process wait on
+    it directly. Duplicates of a request running in another instance poll the
+    store until it completes. Completed responses are replayed from the store
+    until they expire.
+    """
+
+    def __init__(self, store: Any, wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS):
+        self.store = store
+        self.wait_seconds = wait_seconds
+        # Key -> (fingerprint, future) of the request running in this process
+        self.in_flight: Dict[str, Tuple[str, Future]] = {}
+        self.counters = {'executed': 0, 'replayed': 0, 'coalesced': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+        metrics.record(f"idempotency_{counter}", 1, 'Count')
+
+    def run(self, key: str, fingerprint: str, handler: Callable[[], Tuple[int, Dict[str, Any]]],
+            is_final: Callable[[Dict[str, Any]], bool]) -> Tuple[int, Dict[str, Any], str]:
+        """
+        Run handler once per key.
+
+        Args:
+            key: Idempotency key of the request
+            fingerprint: Hash of the request payload, to detect a key reused for another request
+            handler: Runs the request and returns (status_code, response_body)
+            is_final: Whether a successful response may be replayed (e.g. not while liveness is pending)
+
+        Returns:
+            Tuple of (status_code, response_body, outcome), outcome being
+            "executed", "replayed" or "coalesced"
+
+        Raises:
+            RequestInProgressError: If the original request is still running after wait_seconds
+            IdempotencyKeyReusedError: If the key was first used with a different payload
+        """
+        with self._lock:
+            entry = self.in_flight.get(key)
+            is_leader = entry is None
+            if is_leader:
+                entry = self.in_flight[key] = (fingerprint, Future())
+        leader_fingerprint, future = entry
+
+        if not is_leader:
+            # Another request under the same key must not get this one's response
+            if leader_fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError('Idempotency key was already used for a different request')
+            try:
+                status_code, body, _ = future.result(timeout=self.wait_seconds)
+            except FutureTimeoutError:
+                raise RequestInProgressError('An identical request is still in progress')
+            self._count('coalesced')
+            return status_code, body, 'coalesced'
+
+        try:
+            result = self._run_once(key, fingerprint, handler, is_final)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight.pop(key, None)
+
+    def _run_once(self, key: str, fingerprint: str, handler: Callable[[], Tuple[int, Dict[str, Any]]],
+                  is_final: Callable[[Dict[str, Any]], bool]) -> Tuple[int, Dict[str, Any], str]:
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.05
+        while True:
+            try:
+                record = self.store.claim(key, fingerprint)
+            except Exception as e:
+                # De-duplication is an optimisation; the request still runs without it
+                self._count('errors')
+                logger.warning(f"Error claiming idempotency key {key[:12]}: {str(e)}")
+                status_code, body = handler()
+                return status_code, body, 'executed'
+
+            if record is not None and record.get('fingerprint') != fingerprint:
+                raise IdempotencyKeyReusedError('Idempotency key was already used for a different request')
+            if record is None:
+                break
+            if record['state'] == COMPLETED:
+                self._count('replayed')
+                return record['status_code'], record['body'], 'replayed'
+            if time.monotonic() + delay > deadline:
+                raise RequestInProgressError('An identical request is still in progress')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        self._count('executed')
+        try:
+            status_code, body = handler()
+        except Exception:
+            self._release(key)
+            raise
+
+        if status_code == 200 and is_final(body):
+            try:
+                self.store.complete(key, fingerprint, status_code, body)
+                return status_code, body, 'executed'
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"Error storing response for idempotency key {key[:12]}: {str(e)}")
+
+        # Failed and non-final requests free the key so a retry runs again
+        self._release(key)
+        return status_code, body, 'executed'
+
+    def _release(self, key: str) -> None:
+        try:
+            self.store.release(key)
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Error releasing idempotency key {key[:12]}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self.in_flight))
+
+def build_idempotency_layer() -> Optional[IdempotencyLayer]:
+    """
+    Build the idempotency layer from the environment configuration.
+
+    Returns:
+        IdempotencyLayer over the configured store, or None when disabled
+    """
+    store_factory = IDEMPOTENCY_STORES.get(IDEMPOTENCY_STORE)
+    return IdempotencyLayer(store_factory()) if store_factory is not None else None
+
+# Module-level layer shared across warm invocations
+idempotency_layer = build_idempotency_layer()
@@ -0,0 +1,195 @@
+import io
+import os
+import time
+import logging
+import binascii
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Any, Tuple
+
+from instrumentation import metrics
+
+# PIL is imported on first use; requests rejected or served from cache never load it
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Rekognition and Textract reject inline Bytes payloads above 5 MB
+MAX_PAYLOAD_BYTES = int(os.environ.get('IMAGE_MAX_PAYLOAD_BYTES', str(5 * 1024 * 1024)))
+
+# Longest edge kept for analysis; ID text and faces stay legible well below phone resolution
+MAX_IMAGE_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '2048'))
+
+# Largest image decoded at full resolution; JPEGs are measured after draft-mode reduction.
+# An RGB image needs 3 bytes per pixel, so this bounds the decoder's peak memory.
+MAX_IMAGE_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', '50000000'))
+
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '90'))
+MIN_JPEG_QUALITY = 50
+
+# JPEG drafts decode at 1/2, 1/4 or 1/8 scale, and only pick a scale whose
+# result is at least the requested size. Accepting a longest edge down to 3/4
+# of max_dimension lets e.g. a 4000 px scan decode at half scale.
+DRAFT_DIMENSION_RATIO = 0.75
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+class ImageTooLargeError(ValueError):
+    """
+    Raised when an image has more pixels than MAX_IMAGE_PIXELS.
+    """
+
+def decode_base64(image_data: str) -> bytes:
+    """
+    Decode a base64 image upload.
+
+    base64.b64decode first encodes the string to an ASCII copy of the whole
+    payload; binascii reads the string's buffer directly, so decoding needs
+    only the input and the output. Invalid characters are discarded, as
+    b64decode does.
+
+    Args:
+        image_data: Base64-encoded image
+
+    Returns:
+        Decoded image bytes
+    """
+    return binascii.a2b_base64(image_data)
+
+@dataclass
+class PreparedImage:
+    """
+    A document image decoded once and shared by every processing stage.
+
+    Attributes:
+        image: Decoded, upright RGB image used for cropping
+        image_bytes: Encoded bytes sent to Textract and Rekognition
+        original_bytes: Size of the uploaded image in bytes
+        original_dimensions: (width, height) of the uploaded image
+        decode_ms: Time spent decoding (and downscaling) the upload
+        encode_ms: Time spent re-encoding, 0 when the upload was reused as-is
+    """
+    image: 'Image.Image'
+    image_bytes: bytes
+    original_bytes: int
+    original_dimensions: Tuple[int, int]
+    decode_ms: float
+    encode_ms: float = 0.0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summary of the preparation stage for logging and responses.
+        """
+        return {
+            'original_bytes': self.original_bytes,
+            'prepared_bytes': len(self.image_bytes),
+            'bytes_saved': self.original_bytes - len(self.image_bytes),
+            'original_dimensions': list(self.original_dimensions),
+            'prepared_dimensions': list(self.image.size),
+            'decode_ms': round(self.decode_ms, 2),
+            'encode_ms': round(self.encode_ms, 2)
+        }
+
+def encode_jpeg(image: 'Image.Image', max_payload_bytes: int, quality: int = JPEG_QUALITY) -> bytes:
+    """
+    Encode an image as JPEG, lowering quality until it fits the payload limit.
+
+    Args:
+        image: Decoded image to encode
+        max_payload_bytes: Largest acceptable encoded size
+        quality: Starting JPEG quality
+
+    Returns:
+        JPEG bytes
+    """
+    while True:
+        img_buffer = io.BytesIO()
+        image.save(img_buffer, format='JPEG', quality=quality, optimize=True)
+        encoded = img_buffer.getvalue()
+        if len(encoded) <= max_payload_bytes or quality <= MIN_JPEG_QUALITY:
+            return encoded
+        quality -= 10
+
+def prepare_image(image_bytes: bytes, max_dimension: int = MAX_IMAGE_DIMENSION,
+                  max_payload_bytes: int = MAX_PAYLOAD_BYTES, upright: bool = True) -> PreparedImage:
+    """
+    Decode an uploaded image once and produce the payload sent to AWS.
+
+    JPEGs larger than max_dimension are decoded in draft mode, which lets the
+    decoder skip straight to a reduced scale instead of inflating every pixel.
+    Images still above MAX_IMAGE_PIXELS after that are rejected undecoded.
+    The upload is only re-encoded when it was resized, rotated, is not a
+    JPEG/PNG, or exceeds max_payload_bytes; otherwise the original bytes are reused.
+
+    Args:
+        image_bytes: Raw uploaded image bytes
+        max_dimension: Longest edge, in pixels, of the prepared image
+        max_payload_bytes: Largest payload accepted by Textract/Rekognition
+        upright: Apply the EXIF orientation; False keeps the stored pixel
+            orientation, which the boxes Rekognition returns for an S3Object refer to
+
+    Returns:
+        PreparedImage holding the decoded image and the AWS payload
+
+    Raises:
+        ImageTooLargeError: If the image exceeds MAX_IMAGE_PIXELS
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        decode_start = time.perf_counter()
+
+        img = Image.open(io.BytesIO(image_bytes))
+        source_format = img.format
+        original_dimensions = img.size
+
+        if source_format == 'JPEG' and max(img.size) > max_dimension:
+            # The draft scale is limited by the tighter axis, so the requested size keeps the aspect ratio
+            draft_scale = max_dimension * DRAFT_DIMENSION_RATIO / max(img.size)
+            img.draft('RGB', (int(img.size[0] * draft_scale), int(img.size[1] * draft_scale)))
+
+        # Checked before any pixel is decoded
+        if img.size[0] * img.size[1] > MAX_IMAGE_PIXELS:
+            raise ImageTooLargeError(
+                f"Image of {img.size[0]}x{img.size[1]} pixels exceeds the limit of {MAX_IMAGE_PIXELS} pixels"
+            )
+
+        # Bake EXIF orientation into the pixels so detection and cropping agree
+        rotated = upright and img.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1
+        if rotated:
+            img = ImageOps.exif_transpose(img)
+
+        resized = max(img.size) > max_dimension or img.size != original_dimensions
+        if max(img.size) > max_dimension:
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.load()
+
+        decode_ms = (time.perf_counter() - decode_start) * 1000
+        metrics.record('decode_ms', decode_ms)
+
+        needs_reencode = (
+            resized
+            or rotated
+            or source_format not in ('JPEG', 'PNG')
+            or len(image_bytes) > max_payload_bytes
+        )
+
+        if not needs_reencode:
+            return PreparedImage(img, image_bytes, len(image_bytes), original_dimensions, decode_ms)
+
+        encode_start = time.perf_counter()
+        prepared_bytes = encode_jpeg(img, max_payload_bytes)
+        encode_ms = (time.perf_counter() - encode_start) * 1000
+        metrics.record('encode_ms', encode_ms)
+
+        return PreparedImage(img, prepared_bytes, len(image_bytes), original_dimensions, decode_ms, encode_ms)
+
+    except Exception as e:
+        logger.error(f"Error preparing image: {str(e)}")
+        raise
@@ -0,0 +1,344 @@
+import json
+import math
+import os
+import time
+import threading
+import functools
+import logging
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional
+from botocore import xform_name
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Metrics configuration
+METRICS_NAMESPACE = os.environ.get('KYC_METRICS_NAMESPACE', 'KYC')
+METRICS_SINK = os.environ.get('KYC_METRICS_SINK', 'stdout')
+
+# Recent samples kept per metric for the p50/p99 summary
+SUMMARY_WINDOW = int(os.environ.get('KYC_METRICS_SUMMARY_WINDOW', '512'))
+
+# EMF rejects metric value arrays longer than this
+EMF_MAX_VALUES = 100
+
+class StdoutSink:
+    """
+    Prints EMF documents; Lambda ships stdout to CloudWatch Logs, which extracts the metrics.
+    """
+
+    def emit(self, document: Dict[str, Any]) -> None:
+        print(json.dumps(document))
+
+class MemorySink:
+    """
+    Keeps EMF documents in memory for tests and benchmarks.
+    """
+
+    def __init__(self):
+        self.documents = []
+
+    def emit(self, document: Dict[str, Any]) -> None:
+        self.documents.append(document)
+
+    def metric_values(self, name: str) -> List[float]:
+        values = []
+        for document in self.documents:
+            value = document.get(name)
+            if isinstance(value, list):
+                values.extend(value)
+            elif value is not None:
+                values.append(value)
+        return values
+
+class NullSink:
+    def emit(self, document: Dict[str, Any]) -> None:
+        pass
+
+# Sink name -> factory; additional sinks can be registered here
+SINKS = {
+    'stdout': StdoutSink,
+    'memory': MemorySink,
+    'none': NullSink
+}
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of samples.
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+class MetricsBuffer:
+    """
+    Samples recorded by one invocation, or by work running outside any invocation.
+    """
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.values = defaultdict(list)
+        self.units = {}
+        self.closed = False
+
+class MetricsCollector:
+    """
+    Collects timings and sizes per invocation and flushes them as
+    CloudWatch Embedded Metric Format documents.
+
+    The current invocation's buffer lives in a ContextVar, so concurrent
+    invocations (service worker threads, batch items, local dispatch) never
+    flush each other's samples. Samples recorded outside any invocation go
+    to a process-wide background buffer. A rolling window of recent samples
+    per metric is kept across warm invocations for the p50/p99 summary.
+    """
+
+    def __init__(self, sink: Any):
+        self.sink = sink
+        self.cold_start = True
+        self.background = MetricsBuffer(os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'kyc'))
+        self.current = contextvars.ContextVar('kyc_metrics_buffer', default=None)
+        self.history = defaultdict(lambda: deque(maxlen=SUMMARY_WINDOW))
+        self._lock = threading.Lock()
+
+    def active_buffer(self) -> MetricsBuffer:
+        buffer = self.current.get()
+        # Work that outlives its invocation (e.g. an abandoned hedge) lands in the background
+        if buffer is None or buffer.closed:
+            return self.background
+        return buffer
+
+    @contextmanager
+    def invocation(self, function_name: str):
+        """
+        Give the enclosed block its own metrics buffer.
+
+        Args:
+            function_name: Value of the Function dimension for early flushes
+        """
+        buffer = MetricsBuffer(function_name)
+        token = self.current.set(buffer)
+        try:
+            yield buffer
+        finally:
+            with self._lock:
+                buffer.closed = True
+            self.current.reset(token)
+
+    def record(self, name: str, value: float, unit: str = 'Milliseconds') -> None:
+        full = None
+        with self._lock:
+            buffer = self.active_buffer()
+            samples = buffer.values[name]
+            samples.append(value)
+            buffer.units[name] = unit
+            self.history[name].append(value)
+            # Emit a full array straight away, so no buffer outgrows one EMF array
+            if len(samples) >= EMF_MAX_VALUES:
+                full = {name: buffer.values.pop(name)}
+                function_name = buffer.function_name
+
+        if full is not None:
+            self.emit(self.build_documents(function_name, full, {name: unit}))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        p50/p99 of the recent samples of every metric.
+        """
+        with self._lock:
+            history = {name: list(samples) for name, samples in self.history.items()}
+        return {
+            name: {
+                'p50': round(percentile(samples, 0.50), 2),
+                'p99': round(percentile(samples, 0.99), 2),
+                'count': len(samples)
+            }
+            for name, samples in history.items() if samples
+        }
+
+    def build_documents(self, function_name: str, values: Dict[str, List[float]], units: Dict[str, str],
+                        properties: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Lay samples out as EMF documents of at most EMF_MAX_VALUES values per metric.
+
+        Args:
+            function_name: Value of the Function dimension
+            values: Metric name -> samples
+            units: Metric name -> unit
+            properties: Extra fields logged with every document
+
+        Returns:
+            One document, plus one more per further EMF_MAX_VALUES samples of the longest metric
+        """
+        chunk_count = max([math.ceil(len(samples) / EMF_MAX_VALUES) for samples in values.values()] + [1])
+        documents = []
+        for chunk in range(chunk_count):
+            chunk_values = {
+                name: samples[chunk * EMF_MAX_VALUES:(chunk + 1) * EMF_MAX_VALUES]
+                for name, samples in values.items()
+            }
+            chunk_values = {name: samples for name, samples in chunk_values.items() if samples}
+
+            document = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [['Function']],
+                        'Metrics': [{'Name': name, 'Unit': units[name]} for name in chunk_values]
+                    }]
+                },
+                'Function': function_name
+            }
+            for name, samples in chunk_values.items():
+                document[name] = samples[0] if len(samples) == 1 else samples
+            document.update(properties or {})
+            documents.append(document)
+        return documents
+
+    def emit(self, documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            try:
+                self.sink.emit(document)
+            except Exception as e:
+                logger.warning(f"Error emitting metrics: {str(e)}")
+
+    def flush(self, function_name: str, properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Emit the current invocation's metrics and reset them.
+
+        Outside an invocation this flushes the background buffer instead.
+
+        Args:
+            function_name: Value of the Function dimension
+            properties: Extra fields logged with the document
+
+        Returns:
+            The first emitted EMF document, which carries cold_start and the summary
+        """
+        with self._lock:
+            buffer = self.active_buffer()
+            values = dict(buffer.values)
+            units = dict(buffer.units)
+            buffer.values.clear()
+            cold_start = self.cold_start
+            self.cold_start = False
+
+        documents = self.build_documents(function_name, values, units, properties)
+        documents[0]['cold_start'] = cold_start
+        documents[0]['summary'] = self.summary()
+        self.emit(documents)
+        return documents[0]
+
+# Module-level collector shared by every handler in the execution environment
+metrics = MetricsCollector(SINKS.get(METRICS_SINK, StdoutSink)())
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that runs each task in a copy of the submitter's context.
+
+    Samples recorded by pool threads then land in the submitting invocation's
+    metrics buffer rather than the background buffer.
+    """
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Any:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block of code and record it as "{name}_ms".
+
+    Args:
+        name: Stage name, e.g. "decode" or "analyze_id"
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.record(f"{name}_ms", (time.perf_counter() - started_at) * 1000)
+
+def record_size(name: str, size: int) -> None:
+    """
+    Record a payload size as "{name}_bytes".
+    """
+    metrics.record(f"{name}_bytes", size, 'Bytes')
+
+def payload_size(payload: Any) -> Optional[int]:
+    if isinstance(payload, (bytes, bytearray, str)):
+        return len(payload)
+    return None
+
+def _before_call(model: Any, params: Dict[str, Any], context: Dict[str, Any], **kwargs) -> None:
+    context['kyc_started_at'] = time.perf_counter()
+    size = payload_size(params.get('body'))
+    if size is not None:
+        record_size(f"{xform_name(model.name)}_request", size)
+
+def _after_call(model: Any, context: Dict[str, Any], http_response: Any = None, **kwargs) -> None:
+    operation = xform_name(model.name)
+    started_at = context.pop('kyc_started_at', None)
+    if started_at is not None:
+        metrics.record(f"{operation}_ms", (time.perf_counter() - started_at) * 1000)
+
+    content_length = getattr(http_response, 'headers', {}).get('content-length')
+    if content_length is not None:
+        record_size(f"{operation}_response", int(content_length))
+
+def _after_call_error(model: Any, context: Dict[str, Any], **kwargs) -> None:
+    operation = xform_name(model.name)
+    started_at = context.pop('kyc_started_at', None)
+    if started_at is not None:
+        metrics.record(f"{operation}_ms", (time.perf_counter() - started_at) * 1000)
+    metrics.record(f"{operation}_errors", 1, 'Count')
+
+def instrument_client(client: Any) -> Any:
+    """
+    Time every API call made through a boto3 client.
+
+    Hooks the botocore before-call/after-call events, so call sites stay
+    unchanged. Records "{operation}_ms" and request/response sizes.
+
+    Args:
+        client: boto3 client
+
+    Returns:
+        The same client, for use at construction time
+    """
+    events = client.meta.events
+    events.register('before-call.*.*', _before_call, unique_id='kyc-instrumentation-before')
+    events.register('after-call.*.*', _after_call, unique_id='kyc-instrumentation-after')
+    events.register('after-call-error.*.*', _after_call_error, unique_id='kyc-instrumentation-error')
+    return client
+
+def instrument_handler(function_name: str) -> Callable:
+    """
+    Decorate a Lambda handler to time it, record its response size, and flush metrics.
+
+    Args:
+        function_name: Value of the Function dimension
+    """
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Any:
+            with metrics.invocation(function_name):
+                with span('handler'):
+                    response = handler(event, context)
+
+                properties = {}
+                if isinstance(response, dict):
+                    size = payload_size(response.get('body'))
+                    if size is not None:
+                        record_size('response', size)
+                    properties['status_code'] = response.get('statusCode')
+                    if isinstance(event, dict) and event.get('action'):
+                        properties['action'] = event['action']
+
+                metrics.flush(function_name, properties)
+            return response
+        return wrapper
+    return decorator
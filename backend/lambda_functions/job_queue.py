@@ -0,0 +1,433 @@
+import json
+import os
+import time
+import heapq
+import uuid
+import itertools
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+
+from aws_clients import lazy_client
+from instrumentation import metrics
+from shared_redis import LocalRedis, get_redis
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients (built on first use)
+sqs_client = lazy_client('sqs')
+s3_client = lazy_client('s3')
+
+# Job queue backend: "none" (no asynchronous submission), "memory" (in-process,
+# drained by a local worker pool) or "sqs" (KYC_JOB_QUEUE_URL, drained by document_job_worker)
+JOB_QUEUE = os.environ.get('KYC_JOB_QUEUE', 'none')
+JOB_QUEUE_URL = os.environ.get('KYC_JOB_QUEUE_URL', '')
+JOB_DLQ_URL = os.environ.get('KYC_JOB_DLQ_URL', '')
+
+# Attempts before a retryable failure is dead-lettered by the worker. Set the
+# SQS redrive maxReceiveCount above this, so SQS only moves messages no
+# worker finished (a crash or timeout mid-job).
+JOB_MAX_ATTEMPTS = int(os.environ.get('KYC_JOB_MAX_ATTEMPTS', '4'))
+
+# How long a received message stays hidden from other workers, and the retry schedule
+JOB_VISIBILITY_SECONDS = int(os.environ.get('KYC_JOB_VISIBILITY_SECONDS', '300'))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('KYC_JOB_RETRY_BASE_SECONDS', '2'))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get('KYC_JOB_RETRY_MAX_SECONDS', '120'))
+
+# Messages waiting or in flight at which new submissions get 503; 0 disables the check
+JOB_MAX_DEPTH = int(os.environ.get('KYC_JOB_MAX_DEPTH', '1000'))
+
+# SQS depth is read from the approximate queue attributes at most this often
+JOB_DEPTH_CACHE_SECONDS = 5.0
+
+# Payloads larger than this (SQS caps messages at 256 KiB) are written to S3
+# under JOB_PAYLOAD_PREFIX and the message carries the object reference
+JOB_MAX_INLINE_BYTES = int(os.environ.get('KYC_JOB_MAX_INLINE_BYTES', str(200 * 1024)))
+JOB_PAYLOAD_PREFIX = os.environ.get('KYC_JOB_PAYLOAD_PREFIX', 'job-payloads')
+
+# Job records live in the shared Redis; only the memory queue, whose workers
+# run in the orchestrator's process, may keep them in an in-process LocalRedis
+JOB_TTL_SECONDS = int(os.environ.get('KYC_JOB_TTL_SECONDS', '86400'))
+JOB_REDIS_PREFIX = os.environ.get('KYC_JOB_REDIS_PREFIX', 'kyc:job')
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+RETRYING = 'RETRYING'
+SUCCEEDED = 'SUCCEEDED'
+FAILED = 'FAILED'
+DEAD_LETTERED = 'DEAD_LETTERED'
+
+# States after which a job no longer changes; FAILED and DEAD_LETTERED jobs can be resubmitted
+FINAL_JOB_STATES = (SUCCEEDED, FAILED, DEAD_LETTERED)
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when a submission arrives while the queue holds KYC_JOB_MAX_DEPTH messages.
+    """
+
+class MemoryJobQueue:
+    """
+    In-process stand-in for an SQS queue with a redrive policy, for tests, benchmarks and local runs.
+
+    Messages have the same lifecycle as in SQS: a received message is hidden
+    for the visibility timeout and reappears unless deleted, every receive
+    gets a new receipt handle, and a message received more than
+    max_receives times is moved to dead_letters instead of being delivered.
+    """
+
+    def __init__(self, visibility_seconds: int = JOB_VISIBILITY_SECONDS, max_receives: int = JOB_MAX_ATTEMPTS + 1):
+        self.visibility_seconds = visibility_seconds
+        self.max_receives = max_receives
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.dead_letters: List[Dict[str, Any]] = []
+        # (visible_at, sequence, message_id); entries whose visible_at no longer
+        # matches the message are stale and skipped
+        self.schedule: List[Any] = []
+        self.sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _schedule(self, message_id: str, visible_at: float) -> None:
+        self.messages[message_id]['visible_at'] = visible_at
+        heapq.heappush(self.schedule, (visible_at, next(self.sequence), message_id))
+        self._condition.notify_all()
+
+    def send(self, body: Dict[str, Any]) -> str:
+        message_id = str(uuid.uuid4())
+        with self._condition:
+            self.messages[message_id] = {'body': json.dumps(body), 'receive_count': 0, 'receipt_handle': None}
+            self._schedule(message_id, time.monotonic())
+        return message_id
+
+    def _pop_visible(self, now: float) -> Optional[Dict[str, Any]]:
+        while self.schedule and self.schedule[0][0] <= now:
+            visible_at, _, message_id = heapq.heappop(self.schedule)
+            message = self.messages.get(message_id)
+            if message is None or message['visible_at'] != visible_at:
+                continue
+
+            message['receive_count'] += 1
+            if message['receive_count'] > self.max_receives:
+                del self.messages[message_id]
+                self.dead_letters.append({
+                    'message_id': message_id,
+                    'body': message['body'],
+                    'receive_count': message['receive_count'] - 1,
+                    'reason': 'Maximum receives exceeded'
+                })
+                metrics.record('job_dead_lettered', 1, 'Count')
+                continue
+
+            message['receipt_handle'] = f"{message_id}:{message['receive_count']}"
+            self._schedule(message_id, now + self.visibility_seconds)
+            return {
+                'message_id': message_id,
+                'receipt_handle': message['receipt_handle'],
+                'body': message['body'],
+                'receive_count': message['receive_count']
+            }
+        return None
+
+    def receive(self, max_messages: int = 1, wait_seconds: float = 0) -> List[Dict[str, Any]]:
+        """
+        Receive up to max_messages, waiting up to wait_seconds for the first one (long polling).
+        """
+        deadline = time.monotonic() + wait_seconds
+        received = []
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while len(received) < max_messages:
+                    message = self._pop_visible(now)
+                    if message is None:
+                        break
+                    received.append(message)
+                if received or now >= deadline:
+                    return received
+                next_visible = self.schedule[0][0] if self.schedule else deadline
+                self._condition.wait(max(0.0, min(deadline, next_visible) - now))
+
+    def _current(self, receipt_handle: str) -> Optional[str]:
+        # A handle from an earlier receive no longer refers to the message
+        message_id = receipt_handle.rsplit(':', 1)[0]
+        message = self.messages.get(message_id)
+        if message is None or message['receipt_handle'] != receipt_handle:
+            return None
+        return message_id
+
+    def delete(self, receipt_handle: str) -> None:
+        with self._condition:
+            message_id = self._current(receipt_handle)
+            if message_id is not None:
+                del self.messages[message_id]
+
+    def retry_later(self, receipt_handle: str, delay_seconds: float) -> None:
+        with self._condition:
+            message_id = self._current(receipt_handle)
+            if message_id is not None:
+                self._schedule(message_id, time.monotonic() + delay_seconds)
+
+    def dead_letter(self, message: Dict[str, Any], reason: str) -> None:
+        with self._condition:
+            self.dead_letters.append(dict(message, reason=reason))
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self.messages)
+
+class SqsJobQueue:
+    """
+    Jobs queued in SQS; document_job_worker drains the queue through a Lambda event source mapping.
+
+    Configure the queue with a redrive policy to KYC_JOB_DLQ_URL, and a
+    visibility timeout of at least the worker function's timeout.
+    """
+
+    def __init__(self, queue_url: str = JOB_QUEUE_URL, dlq_url: str = JOB_DLQ_URL):
+        self.queue_url = queue_url
+        self.dlq_url = dlq_url
+        self.cached_depth = (0, 0.0)
+        self._lock = threading.Lock()
+
+    def send(self, body: Dict[str, Any]) -> str:
+        response = sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(body))
+        return response['MessageId']
+
+    def receive(self, max_messages: int = 1, wait_seconds: float = 0) -> List[Dict[str, Any]]:
+        response = sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            WaitTimeSeconds=int(wait_seconds),
+            AttributeNames=['ApproximateReceiveCount']
+        )
+        return [
+            {
+                'message_id': message['MessageId'],
+                'receipt_handle': message['ReceiptHandle'],
+                'body': message['Body'],
+                'receive_count': int(message['Attributes']['ApproximateReceiveCount'])
+            }
+            for message in response.get('Messages', [])
+        ]
+
+    def delete(self, receipt_handle: str) -> None:
+        sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+
+    def retry_later(self, receipt_handle: str, delay_seconds: float) -> None:
+        # The message reappears once its visibility timeout runs out
+        sqs_client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=int(delay_seconds)
+        )
+
+    def dead_letter(self, message: Dict[str, Any], reason: str) -> None:
+        if not self.dlq_url:
+            logger.error(f"No dead-letter queue configured, dropping message {message['message_id']}: {reason}")
+            return
+        sqs_client.send_message(
+            QueueUrl=self.dlq_url,
+            MessageBody=message['body'],
+            MessageAttributes={
+                'reason': {'DataType': 'String', 'StringValue': reason[:1024] or 'unknown'},
+                'receive_count': {'DataType': 'Number', 'StringValue': str(message['receive_count'])}
+            }
+        )
+
+    def depth(self) -> int:
+        depth, read_at = self.cached_depth
+        if time.monotonic() - read_at < JOB_DEPTH_CACHE_SECONDS:
+            return depth
+        with self._lock:
+            response = sqs_client.get_queue_attributes(
+                QueueUrl=self.queue_url,
+                AttributeNames=[
+                    'ApproximateNumberOfMessages',
+                    'ApproximateNumberOfMessagesNotVisible',
+                    'ApproximateNumberOfMessagesDelayed'
+                ]
+            )
+            depth = sum(int(value) for value in response['Attributes'].values())
+            self.cached_depth = (depth, time.monotonic())
+        return depth
+
+# Queue name -> factory; additional backends can be registered here
+JOB_QUEUES = {
+    'memory': MemoryJobQueue,
+    'sqs': SqsJobQueue
+}
+
+def message_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an SQS record of a Lambda event into the message shape the queues return.
+    """
+    return {
+        'message_id': record['messageId'],
+        'receipt_handle': record['receiptHandle'],
+        'body': record['body'],
+        'receive_count': int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+    }
+
+class JobStore:
+    """
+    Job records in the shared Redis, so the worker and the status action see the same state.
+
+    With the sqs queue the worker runs in another Lambda function, so a
+    per-process LocalRedis would leave every job QUEUED to the status action;
+    the store refuses to start without a shared Redis then.
+
+    Raises:
+        RuntimeError: If the queue is sqs and no shared Redis is configured
+    """
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, redis_client: Any = None, queue: str = JOB_QUEUE):
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client if redis_client is not None else get_redis()
+        if queue == 'sqs' and isinstance(self.redis_client, LocalRedis):
+            raise RuntimeError(
+                'KYC_JOB_QUEUE=sqs requires a shared Redis: set KYC_REDIS_URL and install the redis package'
+            )
+
+    def create(self, job_id: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Store a new job record unless one exists.
+
+        Returns:
+            None if the record was stored, otherwise the existing record
+        """
+        name = f"{JOB_REDIS_PREFIX}:{job_id}"
+        # The record can expire between a failed SET NX and the GET; create again then
+        for _ in range(2):
+            if self.redis_client.set(name, json.dumps(record), ex=self.ttl_seconds, nx=True):
+                return None
+            value = self.redis_client.get(name)
+            if value is not None:
+                return json.loads(value)
+        return None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        value = self.redis_client.get(f"{JOB_REDIS_PREFIX}:{job_id}")
+        return json.loads(value) if value is not None else None
+
+    def put(self, job_id: str, record: Dict[str, Any]) -> None:
+        self.redis_client.set(f"{JOB_REDIS_PREFIX}:{job_id}", json.dumps(record), ex=self.ttl_seconds)
+
+    def update(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        # Only the worker holding the job's message writes to it, so read-modify-write is safe
+        record = dict(self.get(job_id) or {'job_id': job_id}, updated_at=int(time.time()), **fields)
+        self.put(job_id, record)
+        return record
+
+def build_job_queue() -> Optional[Any]:
+    """
+    Build the job queue from the environment configuration.
+
+    Returns:
+        Queue backend, or None when asynchronous submission is disabled
+    """
+    queue_factory = JOB_QUEUES.get(JOB_QUEUE)
+    return queue_factory() if queue_factory is not None else None
+
+# Module-level queue and store shared across warm invocations
+job_queue = build_job_queue()
+job_store = JobStore()
+
+def build_message(job_id: str, kind: str, payload: Dict[str, Any], s3_bucket: str) -> Dict[str, Any]:
+    """
+    Build a job message, moving a payload too large for SQS to S3.
+
+    Args:
+        job_id: Job identifier
+        kind: Job kind, a key of document_job_worker.JOB_RUNNERS
+        payload: Arguments of the job
+        s3_bucket: Bucket receiving an oversized payload
+
+    Returns:
+        Message body carrying the payload, or "payload_s3" with its bucket and key
+    """
+    body = {'job_id': job_id, 'kind': kind, 'payload': payload}
+    encoded_payload = json.dumps(payload)
+    if len(encoded_payload) <= JOB_MAX_INLINE_BYTES:
+        return body
+
+    s3_key = f"{JOB_PAYLOAD_PREFIX}/{job_id}.json"
+    s3_client.put_object(Bucket=s3_bucket, Key=s3_key, Body=encoded_payload, ContentType='application/json')
+    return {'job_id': job_id, 'kind': kind, 'payload_s3': {'bucket': s3_bucket, 'key': s3_key}}
+
+def load_payload(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the payload of a job message, reading it from S3 when it was too large to inline.
+    """
+    if 'payload' in body:
+        return body['payload']
+    location = body['payload_s3']
+    response = s3_client.get_object(Bucket=location['bucket'], Key=location['key'])
+    return json.loads(response['Body'].read())
+
+def submit_job(job_id: str, kind: str, session_id: str, payload: Dict[str, Any],
+               s3_bucket: str) -> Dict[str, Any]:
+    """
+    Enqueue a job, or return the existing record of a job with the same id.
+
+    Resubmitting a queued, running or finished job does not enqueue it again;
+    a FAILED or DEAD_LETTERED job is queued afresh.
+
+    Args:
+        job_id: Job identifier, derived from the request so resends map to one job
+        kind: Job kind, a key of document_job_worker.JOB_RUNNERS
+        session_id: KYC session the job belongs to
+        payload: Arguments of the job
+        s3_bucket: Bucket receiving an oversized payload
+
+    Returns:
+        Job record
+
+    Raises:
+        QueueFullError: If the queue already holds KYC_JOB_MAX_DEPTH messages
+    """
+    existing = job_store.get(job_id)
+    if existing is not None and existing['state'] not in (FAILED, DEAD_LETTERED):
+        return existing
+
+    if JOB_MAX_DEPTH and job_queue.depth() >= JOB_MAX_DEPTH:
+        metrics.record('job_rejected', 1, 'Count')
+        raise QueueFullError(f"Job queue holds {JOB_MAX_DEPTH} or more messages")
+
+    now = int(time.time())
+    record = {
+        'job_id': job_id,
+        'kind': kind,
+        'session_id': session_id,
+        'state': QUEUED,
+        'attempts': 0,
+        'submitted_at': now,
+        'updated_at': now
+    }
+    if existing is None:
+        concurrent = job_store.create(job_id, record)
+        if concurrent is not None:
+            return concurrent
+    else:
+        job_store.put(job_id, record)
+
+    try:
+        job_queue.send(build_message(job_id, kind, payload, s3_bucket))
+    except Exception as e:
+        job_store.update(job_id, state=FAILED, error=f"Could not enqueue job: {str(e)}")
+        raise
+
+    metrics.record('job_submitted', 1, 'Count')
+    return record
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a job record.
+
+    Args:
+        job_id: Job identifier returned by submit_job
+
+    Returns:
+        Job record, or None if unknown or expired
+    """
+    return job_store.get(job_id)
@@ -0,0 +1,70 @@
+import os
+import json
+import base64
+import datetime
+from decimal import Decimal
+from typing import Any, Union
+
+# Optional: orjson encodes several times faster than the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "auto" uses orjson when it is installed; "json" forces the standard library
+JSON_ENCODER = os.environ.get('KYC_JSON_ENCODER', 'auto')
+
+USE_ORJSON = orjson is not None and JSON_ENCODER != 'json'
+
+def encode_default(value: Any) -> Any:
+    """
+    Convert the values boto3 and the session store return that JSON has no type for.
+
+    - bytes (e.g. Rekognition "Bytes" images): base64 text
+    - Decimal (DynamoDB numbers): int when integral, float otherwise
+    - datetime (botocore timestamps): ISO 8601
+    - set and tuple: list
+
+    Raises:
+        TypeError: For any other type, as json.dumps does
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_bytes(value: Any) -> bytes:
+    """
+    Encode a value as compact UTF-8 JSON.
+
+    Args:
+        value: JSON-compatible value, possibly holding bytes, Decimal or datetime
+
+    Returns:
+        Encoded JSON
+    """
+    if USE_ORJSON:
+        # Non-string keys are stringified as json.dumps does
+        return orjson.dumps(value, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=encode_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def dumps(value: Any) -> str:
+    """
+    Encode a value as compact JSON text; see dumps_bytes.
+    """
+    if USE_ORJSON:
+        return dumps_bytes(value).decode('utf-8')
+    return json.dumps(value, default=encode_default, separators=(',', ':'), ensure_ascii=False)
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    Decode JSON text or UTF-8 bytes.
+    """
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,74 +1,847 @@
 import json
-import boto3
+import os
+import time
+import hashlib
 import uuid
-from typing import Dict, Any
+import importlib
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
-# CORS Helper Functions (inline)
-def get_cors_headers():
-    return {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
+# Optional: recorded liveness results are only available when the watcher is packaged
+try:
+    import liveness_results_watcher
+except ImportError:
+    liveness_results_watcher = None
 
-def create_response(status_code: int, body: dict, cors_enabled: bool = True):
-    response = {
-        'statusCode': status_code,
-        'body': json.dumps(body)
-    }
-    
-    if cors_enabled:
-        response['headers'] = get_cors_headers()
-    
-    return response
+from session_store import session_store, get_step_timings
+from idempotency import IdempotencyKeyReusedError, RequestInProgressError, idempotency_layer
+from stage_graph import Stage, run_stage_graph
+import job_queue
+import json_codec
+from response_shaping import (
+    InvalidVerbosityError,
+    fit_response,
+    get_verbosity,
+    shape_face_comparison_response,
+    shape_liveness_results
+)
+
+from cors_helper import create_response
+from aws_clients import lazy_client
+from instrumentation import instrument_handler, span
+from warmup import warm
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-lambda_client = boto3.client('lambda')
+# Initialize AWS clients (built on first use)
+lambda_client = lazy_client('lambda')
+s3_client = lazy_client('s3')
+
+# Lifetime of presigned document upload URLs
+UPLOAD_URL_EXPIRY_SECONDS = int(os.environ.get('UPLOAD_URL_EXPIRY_SECONDS', '300'))
+
+# Upload content type -> S3 key extension
+UPLOAD_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'application/pdf': 'pdf'
+}
+
+# Dispatch configuration: "remote" invokes the target Lambda, "local" calls its
+# handler in-process when the module is packaged alongside the orchestrator
+DISPATCH_MODE = os.environ.get('KYC_DISPATCH_MODE', 'remote')
+
+# Screen the document holder against the sanctions list as a full_kyc stage
+SANCTIONS_SCREENING = os.environ.get('KYC_SANCTIONS_SCREENING', 'false').lower() == 'true'
+
+# Screening statuses that are final for the extracted name
+FINAL_SANCTIONS_STATUSES = ('CLEAR', 'HIT')
+
+# Liveness statuses after which the results no longer change
+TERMINAL_LIVENESS_STATUSES = ('SUCCEEDED', 'FAILED', 'EXPIRED')
+
+# Lambda function name -> module providing process_event for in-process dispatch
+LOCAL_HANDLER_MODULES = {
+    'document-processor': 'document_processor',
+    'face-comparison': 'face_comparison',
+    'liveness-session-manager': 'liveness_session_manager',
+    'batch-document-processor': 'batch_document_processor',
+    'liveness-results-watcher': 'liveness_results_watcher',
+    'sanctions-screening': 'sanctions_screening'
+}
+
+# Action -> functions it dispatches to, and clients the orchestrator itself calls
+ACTION_FUNCTIONS = {
+    'start_kyc': ['liveness-session-manager'],
+    'create_upload_url': [],
+    'process_document': ['document-processor'],
+    'complete_liveness': ['liveness-session-manager'],
+    'final_verification': ['face-comparison'],
+    'full_kyc': ['document-processor', 'liveness-session-manager', 'face-comparison']
+                + (['sanctions-screening'] if SANCTIONS_SCREENING else []),
+    'screen_sanctions': ['sanctions-screening'],
+    'process_document_batch': ['batch-document-processor'],
+    'job_status': []
+}
+ACTION_CLIENTS = {
+    'create_upload_url': ['s3'],
+    'process_document': ['sqs'] if job_queue.JOB_QUEUE == 'sqs' else []
+}
+
+# Actions de-duplicated by the idempotency layer -> whether a 200 response is
+# final and may be replayed to later duplicates; these actions report a failed
+# downstream call inside a 200 body, and a pending liveness check is not final
+IDEMPOTENT_ACTIONS = {
+    'start_kyc': lambda body: True,
+    'process_document': lambda body: body['document_processing'].get('status') == 'PROCESSED',
+    'final_verification': lambda body: body['face_comparison'].get('status') == 'COMPLETED',
+    'full_kyc': lambda body: body.get('verdict') in ('PASSED', 'FAILED', 'REVIEW')
+}
+
+def warm_actions(actions: Optional[list] = None) -> Dict[str, Any]:
+    """
+    Prepare only what the given actions need.
+    
+    With remote dispatch that is the Lambda client; with local dispatch the
+    target handler modules are imported and their clients and deferred
+    imports are warmed.
+    
+    Args:
+        actions: Orchestrator actions expected next, or None for all of them
+    
+    Returns:
+        Response body from warmup.warm, with the warmed actions
+    """
+    actions = [action for action in (actions or ACTION_FUNCTIONS) if action in ACTION_FUNCTIONS]
+    service_names = [service for action in actions for service in ACTION_CLIENTS.get(action, [])]
+    module_names = []
+    
+    for function_name in sorted({function for action in actions for function in ACTION_FUNCTIONS[action]}):
+        module_name = LOCAL_HANDLER_MODULES.get(function_name)
+        if DISPATCH_MODE != 'local' or module_name is None:
+            service_names.append('lambda')
+            continue
+        try:
+            handler_module = importlib.import_module(module_name)
+        except ImportError:
+            service_names.append('lambda')
+            continue
+        service_names.extend(getattr(handler_module, 'WARM_CLIENTS', []))
+        module_names.extend(getattr(handler_module, 'WARM_IMPORTS', []))
+    
+    return dict(warm(service_names, module_names), actions=actions)
 
-def invoke_lambda_function(function_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+def invoke_remote_function(function_name: str, payload: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
     """
-    Invoke another Lambda function.
+    Invoke another Lambda function synchronously.
     
     Args:
         function_name: Name of the Lambda function to invoke
         payload: Payload to send to the function
+        context: Unused; the invoked function gets its own context
     
     Returns:
-        Response from the invoked function
+        Response with statusCode and a decoded body dictionary
     """
     try:
         response = lambda_client.invoke(
             FunctionName=function_name,
             InvocationType='RequestResponse',
-            Payload=json.dumps(payload)
+            Payload=json_codec.dumps_bytes(payload)
         )
         
-        # Parse response
-        response_payload = json.loads(response['Payload'].read())
+        # Parse response and the nested JSON body
+        response_payload = json_codec.loads(response['Payload'].read())
+        body = response_payload.get('body')
+        if isinstance(body, str):
+            response_payload['body'] = json_codec.loads(body)
         return response_payload
         
     except Exception as e:
         logger.error(f"Error invoking Lambda function {function_name}: {str(e)}")
         raise
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def invoke_local_function(function_name: str, payload: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
     """
-    Main Lambda handler for KYC orchestration.
+    Call another function's handler in the current process.
+    
+    Falls back to a remote invoke when the handler module is not deployed
+    with the orchestrator. The handler gets the orchestrator's context, so
+    its deadline budgets (download timeouts, batch time margin) follow the
+    orchestrator's remaining time.
+    
+    Args:
+        function_name: Name of the Lambda function to dispatch to
+        payload: Payload to send to the function
+        context: Orchestrator's Lambda context
+    
+    Returns:
+        Response with statusCode and a native body dictionary
+    """
+    module_name = LOCAL_HANDLER_MODULES.get(function_name)
+    if not module_name:
+        return invoke_remote_function(function_name, payload)
+    
+    try:
+        handler_module = importlib.import_module(module_name)
+    except ImportError as e:
+        logger.warning(f"Handler module {module_name} unavailable, invoking {function_name} remotely: {str(e)}")
+        return invoke_remote_function(function_name, payload)
+    
+    status_code, response_body = handler_module.process_event(payload, context)
+    return {
+        'statusCode': status_code,
+        'body': response_body
+    }
+
+# Dispatch mode -> dispatcher; additional modes can be registered here
+DISPATCHERS = {
+    'remote': invoke_remote_function,
+    'local': invoke_local_function
+}
+
+def invoke_lambda_function(function_name: str, payload: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+    """
+    Dispatch a payload to another KYC function using the configured mode.
+    
+    Args:
+        function_name: Name of the Lambda function to invoke
+        payload: Payload to send to the function
+        context: Orchestrator's Lambda context, for handlers dispatched in-process
+    
+    Returns:
+        Response with statusCode and a decoded body dictionary
+    """
+    dispatcher = DISPATCHERS.get(DISPATCH_MODE, invoke_remote_function)
+    with span(f"dispatch_{function_name.replace('-', '_')}"):
+        return dispatcher(function_name, payload, context)
+
+def load_session(session_id: str) -> Dict[str, Any]:
+    """
+    Load the stored state for a KYC session.
+    
+    Args:
+        session_id: KYC session identifier
+    
+    Returns:
+        Session record, or an empty dict when no store is configured or nothing is stored
+    """
+    if session_store is None:
+        return {}
+    return session_store.get_session(session_id) or {}
+
+def get_stored_step(session: Dict[str, Any], step: str, fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return a step's stored result if it was recorded for the same input.
+    
+    Args:
+        session: Session record from load_session
+        step: Action name
+        fingerprint: Hash of the step input, or None to accept any stored result
+    
+    Returns:
+        Stored result, or None if the step must run
+    """
+    entry = session.get('steps', {}).get(step)
+    if entry is None:
+        return None
+    if fingerprint is not None and entry.get('fingerprint') != fingerprint:
+        return None
+    return entry['result']
+
+def save_step(session_id: str, step: str, result: Dict[str, Any], started_at: float,
+              fingerprint: Optional[str] = None) -> None:
+    """
+    Record a completed step and how long it took.
+    
+    Args:
+        session_id: KYC session identifier
+        step: Action name
+        result: Result to store
+        started_at: time.perf_counter() value taken before the step ran
+        fingerprint: Hash of the step input, so retried requests are recognised
+    """
+    if session_store is None:
+        return
+    duration_ms = (time.perf_counter() - started_at) * 1000
+    try:
+        session_store.record_step(session_id, step, result, duration_ms, fingerprint)
+    except Exception as e:
+        # State is an optimisation; the action result is still returned to the client
+        logger.warning(f"Error recording step {step} for session {session_id}: {str(e)}")
+
+def fingerprint_of(*values: Any) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+def is_retryable_failure(result: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check whether a downstream handler failed in a way the client should retry.
+
+    Handlers mark timeouts and fail-fast responses on a degraded dependency
+    (503/504) as retryable; they are returned as they are rather than as a
+    processed result or a 500.
+    """
+    return bool((result or {}).get('retryable'))
+
+def get_reference_image_key(liveness_results: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Extract the liveness reference image S3 key from stored liveness results.
+    """
+    reference_image = (liveness_results or {}).get('reference_image') or {}
+    return reference_image.get('S3Object', {}).get('Name')
+
+def create_upload_url(session_id: str, s3_bucket: str, content_type: str) -> Dict[str, Any]:
+    """
+    Issue a presigned PUT URL so the client uploads the document straight to S3.
+    
+    Args:
+        session_id: KYC session identifier
+        s3_bucket: Bucket receiving the upload
+        content_type: Content type the client must send with the PUT
+    
+    Returns:
+        Upload URL, the S3 key to pass to process_document, and its expiry
+    """
+    # document_processor recognises PDFs by the key's extension
+    extension = UPLOAD_EXTENSIONS.get(content_type, 'jpg')
+    s3_key = f"uploads/{session_id}/{uuid.uuid4()}.{extension}"
+    upload_url = s3_client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': s3_bucket,
+            'Key': s3_key,
+            'ContentType': content_type
+        },
+        ExpiresIn=UPLOAD_URL_EXPIRY_SECONDS
+    )
+    
+    return {
+        'upload_url': upload_url,
+        's3_key': s3_key,
+        'content_type': content_type,
+        'expires_in': UPLOAD_URL_EXPIRY_SECONDS
+    }
+
+def is_session_upload_key(session_id: str, s3_key: str) -> bool:
+    """
+    Check that an upload key was issued for this session by create_upload_url.
+    """
+    return s3_key.startswith(f"uploads/{session_id}/") and '..' not in s3_key
+
+def run_process_document(session_id: str, image_data: Optional[str], document_type: str,
+                         session: Dict[str, Any], s3_key: Optional[str] = None,
+                         s3_bucket: str = 'your-kyc-bucket',
+                         pages: Optional[List[str]] = None, context: Any = None) -> Tuple[int, Dict[str, Any], str]:
+    """
+    Process the ID document, reusing the stored result for an identical image.
+    
+    Args:
+        session_id: KYC session identifier
+        image_data: Base64-encoded document image (None when s3_key is given)
+        document_type: Document type
+        session: Session record from load_session
+        s3_key: Key of a document uploaded through create_upload_url
+        s3_bucket: Bucket holding the upload
+        pages: Base64-encoded page images or PDFs, instead of image_data
+        context: Orchestrator's Lambda context, passed on to handlers dispatched in-process
+    
+    Returns:
+        Tuple of (status_code, document_result, result_source)
+    """
+    fingerprint = fingerprint_of(image_data or pages or s3_key, document_type)
+    stored_result = get_stored_step(session, 'process_document', fingerprint)
+    if stored_result is not None:
+        return 200, stored_result, 'session_store'
+    
+    document_payload = {
+        'session_id': session_id,
+        'document_type': document_type
+    }
+    if s3_key:
+        # Only the object reference travels; the image never passes through this payload
+        document_payload['s3_key'] = s3_key
+        document_payload['s3_bucket'] = s3_bucket
+    elif pages:
+        document_payload['pages'] = pages
+    else:
+        document_payload['image_data'] = image_data
+    
+    started_at = time.perf_counter()
+    document_response = invoke_lambda_function('document-processor', document_payload, context)
+    
+    if document_response['statusCode'] == 200:
+        save_step(session_id, 'process_document', document_response['body'], started_at, fingerprint)
+    
+    return document_response['statusCode'], document_response['body'], 'processed'
+
+def submit_document_job(session_id: str, image_data: Optional[str], document_type: str,
+                        s3_key: Optional[str], s3_bucket: str,
+                        pages: Optional[List[str]]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Queue a document for processing by document_job_worker and return a ticket.
+    
+    The job id is derived from the session and document, so a resent
+    submission returns the ticket of the job already queued.
+    
+    Args:
+        session_id: KYC session identifier
+        image_data: Base64-encoded document image (None when s3_key or pages is given)
+        document_type: Document type
+        s3_key: Key of a document uploaded through create_upload_url
+        s3_bucket: Bucket holding the upload, and any payload too large for the queue
+        pages: Base64-encoded page images or PDFs, instead of image_data
+    
+    Returns:
+        Tuple of (status_code, response_body): 202 with the job ticket, or 503 when the queue is full
+    """
+    job_id = fingerprint_of(session_id, 'process_document', image_data or pages or s3_key, document_type)[:32]
+    payload = {
+        'session_id': session_id,
+        'document_type': document_type,
+        's3_bucket': s3_bucket
+    }
+    if s3_key:
+        payload['s3_key'] = s3_key
+    elif pages:
+        payload['pages'] = pages
+    else:
+        payload['image_data'] = image_data
+    
+    try:
+        job = job_queue.submit_job(job_id, 'process_document', session_id, payload, s3_bucket)
+    except job_queue.QueueFullError as e:
+        return 503, {
+            'error': 'Document queue full',
+            'message': str(e),
+            'retryable': True,
+            'session_id': session_id
+        }
+    
+    # The in-process queue has no consumer other than this process
+    if job_queue.JOB_QUEUE == 'memory':
+        importlib.import_module('document_job_worker').start_local_pool()
+    
+    return 202, {
+        'session_id': session_id,
+        'job_id': job_id,
+        'job_state': job['state'],
+        'submitted_at': job['submitted_at'],
+        'status': 'DOCUMENT_QUEUED'
+    }
+
+def build_job_status(session_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the job_status response for a job record.
+    
+    A finished job carries its document result under "document_processing",
+    as a synchronous process_document response does.
+    """
+    response_data = {
+        'session_id': session_id,
+        'job_id': job['job_id'],
+        'job_state': job['state'],
+        'attempts': job.get('attempts', 0),
+        'submitted_at': job.get('submitted_at'),
+        'updated_at': job.get('updated_at'),
+        'status': f"JOB_{job['state']}"
+    }
+    if job.get('result') is not None:
+        response_data['document_processing'] = job['result']
+    if job['state'] != job_queue.SUCCEEDED and job.get('error'):
+        response_data['error'] = job['error']
+    if job['state'] == job_queue.RETRYING:
+        response_data['retry_at'] = job.get('retry_at')
+    # A dead-lettered document can be submitted again once the downstream service recovers
+    if job['state'] == job_queue.DEAD_LETTERED:
+        response_data['retryable'] = True
+    return response_data
+
+def run_complete_liveness(session_id: str, liveness_session_id: str, session: Dict[str, Any],
+                          wait_seconds: Optional[float] = None, context: Any = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Get liveness results, preferring a recorded terminal result over Rekognition.
+    
+    Args:
+        session_id: KYC session identifier
+        liveness_session_id: Rekognition liveness session ID
+        session: Session record from load_session
+        wait_seconds: When set, wait server-side for a terminal status
+        context: Orchestrator's Lambda context, passed on to handlers dispatched in-process
+    
+    Returns:
+        Tuple of (liveness_results, result_source)
+    """
+    # Return the recorded terminal result without touching Rekognition; a retry
+    # with a new liveness session must not get the previous session's result
+    fingerprint = fingerprint_of(liveness_session_id)
+    liveness_results = get_stored_step(session, 'complete_liveness', fingerprint)
+    if liveness_results is None and liveness_results_watcher is not None:
+        liveness_results = liveness_results_watcher.get_recorded_result(liveness_session_id)
+    if liveness_results is not None:
+        return liveness_results, 'recorded'
+    
+    started_at = time.perf_counter()
+    
+    if wait_seconds:
+        # Let the watcher poll with backoff instead of the client
+        watch_payload = {
+            'action': 'watch',
+            'liveness_session_id': liveness_session_id,
+            'max_wait_seconds': wait_seconds
+        }
+        
+        watch_response = invoke_lambda_function('liveness-results-watcher', watch_payload, context)
+        liveness_results = watch_response['body']
+        result_source = 'watched'
+    
+    else:
+        liveness_payload = {
+            'action': 'get_results',
+            'session_id': liveness_session_id
+        }
+        
+        liveness_response = invoke_lambda_function('liveness-session-manager', liveness_payload, context)
+        liveness_results = liveness_response['body']
+        result_source = 'polled'
+        
+        if liveness_results_watcher is not None and liveness_response['statusCode'] == 200:
+            liveness_results_watcher.record_result(liveness_results)
+    
+    if liveness_results.get('status') in TERMINAL_LIVENESS_STATUSES:
+        save_step(session_id, 'complete_liveness', liveness_results, started_at, fingerprint)
+    
+    return liveness_results, result_source
+
+def get_face_candidate_keys(document_result: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Extract the S3 keys of the ranked ID face crops from a process_document result.
+    """
+    return [candidate['s3_key'] for candidate in (document_result or {}).get('face_candidates') or []]
+
+def run_face_comparison(session_id: str, id_face_s3_key: str, liveness_reference_s3_key: str,
+                        s3_bucket: str, session: Dict[str, Any],
+                        candidate_s3_keys: Optional[List[str]] = None,
+                        context: Any = None) -> Tuple[int, Dict[str, Any], str]:
+    """
+    Compare the ID face with the liveness reference, reusing a stored verdict for the same keys.
+    
+    Args:
+        session_id: KYC session identifier
+        id_face_s3_key: S3 key of the cropped ID face
+        liveness_reference_s3_key: S3 key of the liveness reference image
+        s3_bucket: Bucket holding both images
+        session: Session record from load_session
+        candidate_s3_keys: Ranked ID face crops to fall back on, best first
+        context: Orchestrator's Lambda context, passed on to handlers dispatched in-process
+    
+    Returns:
+        Tuple of (status_code, face_comparison_results, result_source)
+    """
+    fingerprint = fingerprint_of(id_face_s3_key, liveness_reference_s3_key, candidate_s3_keys or [])
+    stored_result = get_stored_step(session, 'final_verification', fingerprint)
+    if stored_result is not None:
+        return 200, stored_result, 'session_store'
+    
+    face_comparison_payload = {
+        'session_id': session_id,
+        'id_face_s3_key': id_face_s3_key,
+        'id_face_candidate_s3_keys': candidate_s3_keys or [],
+        'liveness_reference_s3_key': liveness_reference_s3_key,
+        's3_bucket': s3_bucket,
+        'similarity_threshold': 95.0
+    }
+    
+    started_at = time.perf_counter()
+    face_comparison_response = invoke_lambda_function('face-comparison', face_comparison_payload, context)
+    
+    if face_comparison_response['statusCode'] == 200:
+        save_step(session_id, 'final_verification', face_comparison_response['body'], started_at, fingerprint)
+    
+    return face_comparison_response['statusCode'], face_comparison_response['body'], 'compared'
+
+def run_sanctions_screening(session_id: str, extracted_fields: Dict[str, Any],
+                            session: Dict[str, Any], context: Any = None) -> Tuple[int, Dict[str, Any], str]:
+    """
+    Screen the name and birth date extracted from the document, reusing a stored result for the same fields.
+    
+    Args:
+        session_id: KYC session identifier
+        extracted_fields: "extracted_fields" of the process_document result
+        session: Session record from load_session
+        context: Orchestrator's Lambda context, passed on to handlers dispatched in-process
+    
+    Returns:
+        Tuple of (status_code, sanctions_screening_results, result_source)
+    """
+    fingerprint = fingerprint_of(extracted_fields)
+    stored_result = get_stored_step(session, 'screen_sanctions', fingerprint)
+    if stored_result is not None:
+        return 200, stored_result, 'session_store'
+    
+    screening_payload = {
+        'session_id': session_id,
+        'extracted_fields': extracted_fields
+    }
+    
+    started_at = time.perf_counter()
+    screening_response = invoke_lambda_function('sanctions-screening', screening_payload, context)
+    
+    # A PENDING result (no list available) is screened again on the next request
+    if (screening_response['statusCode'] == 200
+            and screening_response['body'].get('sanctions_status') in FINAL_SANCTIONS_STATUSES):
+        save_step(session_id, 'screen_sanctions', screening_response['body'], started_at, fingerprint)
+    
+    return screening_response['statusCode'], screening_response['body'], 'screened'
+
+def run_full_kyc(session_id: str, image_data: Optional[str], document_type: str,
+                 liveness_session_id: str, s3_bucket: str, session: Dict[str, Any],
+                 wait_seconds: Optional[float] = None, s3_key: Optional[str] = None,
+                 pages: Optional[List[str]] = None, context: Any = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run document processing, liveness retrieval and face comparison in one invocation.
+    
+    Document processing and liveness retrieval do not depend on each other and
+    run concurrently; face comparison starts once both have finished. With
+    KYC_SANCTIONS_SCREENING, the extracted name is screened as soon as the
+    document is processed, alongside the rest.
+    
+    Args:
+        session_id: KYC session identifier
+        image_data: Base64-encoded document image (optional if already processed)
+        document_type: Document type
+        liveness_session_id: Rekognition liveness session ID
+        s3_bucket: Bucket holding the face images
+        session: Session record from load_session
+        wait_seconds: When set, wait server-side for a terminal liveness status
+        s3_key: Key of a document uploaded through create_upload_url, instead of image_data
+        pages: Base64-encoded page images or PDFs, instead of image_data
+        context: Orchestrator's Lambda context, passed on to handlers dispatched in-process
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    def process_document_stage(_: Dict[str, Any]) -> Dict[str, Any]:
+        if not (image_data or pages or s3_key):
+            stored_result = get_stored_step(session, 'process_document')
+            if stored_result is None:
+                raise ValueError('Missing required parameter: image_data, pages or s3_key')
+            return stored_result
+        
+        status_code, document_result, _ = run_process_document(
+            session_id, image_data, document_type, session, s3_key, s3_bucket, pages, context
+        )
+        if status_code != 200:
+            raise RuntimeError(document_result.get('message') or document_result.get('error'))
+        return document_result
+    
+    def complete_liveness_stage(_: Dict[str, Any]) -> Dict[str, Any]:
+        liveness_results, _ = run_complete_liveness(session_id, liveness_session_id, session, wait_seconds, context)
+        if 'error' in liveness_results:
+            raise RuntimeError(liveness_results.get('message') or liveness_results['error'])
+        return liveness_results
+    
+    def final_verification_stage(dependencies: Dict[str, Any]) -> Dict[str, Any]:
+        id_face_s3_key = dependencies['process_document'].get('face_s3_key')
+        liveness_results = dependencies['complete_liveness']
+        liveness_reference_s3_key = get_reference_image_key(liveness_results)
+        
+        # No comparison is needed when the verdict is already decided
+        if liveness_results.get('status') != 'SUCCEEDED':
+            return {'verification_passed': False, 'reason': f"Liveness {liveness_results.get('status')}"}
+        if not id_face_s3_key:
+            return {'verification_passed': False, 'reason': 'No face detected on document'}
+        if not liveness_reference_s3_key:
+            raise RuntimeError('Liveness results have no reference image')
+        
+        status_code, face_comparison_results, _ = run_face_comparison(
+            session_id, id_face_s3_key, liveness_reference_s3_key, s3_bucket, session,
+            get_face_candidate_keys(dependencies['process_document']), context
+        )
+        if status_code != 200:
+            raise RuntimeError(face_comparison_results.get('message') or face_comparison_results.get('error'))
+        return face_comparison_results
+    
+    def screen_sanctions_stage(dependencies: Dict[str, Any]) -> Dict[str, Any]:
+        status_code, screening_results, _ = run_sanctions_screening(
+            session_id, dependencies['process_document'].get('extracted_fields') or {}, session, context
+        )
+        if status_code != 200:
+            raise RuntimeError(screening_results.get('message') or screening_results.get('error'))
+        return screening_results
+    
+    stages = {
+        'process_document': Stage(process_document_stage),
+        'complete_liveness': Stage(complete_liveness_stage),
+        'final_verification': Stage(final_verification_stage, ['process_document', 'complete_liveness'])
+    }
+    if SANCTIONS_SCREENING:
+        stages['screen_sanctions'] = Stage(screen_sanctions_stage, ['process_document'])
+    graph_result = run_stage_graph(stages)
+    
+    liveness_results = graph_result.results.get('complete_liveness') or {}
+    face_comparison_results = graph_result.results.get('final_verification')
+    sanctions_status = (graph_result.results.get('screen_sanctions') or {}).get('sanctions_status')
+    
+    if graph_result.errors:
+        verdict = 'ERROR'
+    elif liveness_results.get('status') not in TERMINAL_LIVENESS_STATUSES:
+        verdict = 'INCOMPLETE'
+    elif not face_comparison_results['verification_passed']:
+        verdict = 'FAILED'
+    elif sanctions_status == 'HIT':
+        # A possible match is for a reviewer to confirm or dismiss
+        verdict = 'REVIEW'
+    elif SANCTIONS_SCREENING and sanctions_status != 'CLEAR':
+        verdict = 'INCOMPLETE'
+    else:
+        verdict = 'PASSED'
+    
+    response_data = {
+        'session_id': session_id,
+        'verdict': verdict,
+        'verification_passed': verdict == 'PASSED',
+        'document_processing': graph_result.results.get('process_document'),
+        'liveness_results': graph_result.results.get('complete_liveness'),
+        'face_comparison': face_comparison_results,
+        'stage_timings': graph_result.timings_ms,
+        'total_ms': graph_result.total_ms,
+        'status': 'KYC_COMPLETED'
+    }
+    if SANCTIONS_SCREENING:
+        response_data['sanctions_screening'] = graph_result.results.get('screen_sanctions')
+    
+    if graph_result.errors:
+        response_data['stage_errors'] = graph_result.errors
+        response_data['status'] = 'KYC_FAILED'
+        return 500, response_data
+    
+    return 200, response_data
+
+def build_idempotency_key(event: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Derive the idempotency key and payload fingerprint of an orchestrator event.
+    
+    Clients may send their own "idempotency_key"; otherwise the key is the
+    hash of the session, action and payload, so only exact resends match.
+    
+    Args:
+        event: Orchestrator event
+    
+    Returns:
+        Tuple of (key, fingerprint), or None when the request cannot be identified
+        (e.g. start_kyc without a session_id or idempotency_key)
+    """
+    client_key = event.get('idempotency_key')
+    fingerprint = fingerprint_of({name: value for name, value in event.items() if name != 'idempotency_key'})
+    if client_key:
+        return fingerprint_of(event.get('session_id'), event.get('action'), client_key), fingerprint
+    if not event.get('session_id'):
+        return None
+    return fingerprint, fingerprint
+
+def shape_step_results(response_body: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """
+    Shape the face comparison and liveness results carried by an orchestrator response.
+    
+    They arrive from face_comparison and liveness_session_manager at
+    KYC_RESPONSE_VERBOSITY, so a request can lower their detail but not raise it.
+    """
+    shaped = dict(response_body)
+    if isinstance(shaped.get('face_comparison'), dict):
+        shaped['face_comparison'] = shape_face_comparison_response(shaped['face_comparison'], verbosity)
+    if isinstance(shaped.get('liveness_results'), dict):
+        shaped['liveness_results'] = shape_liveness_results(shaped['liveness_results'], verbosity)
+    return shaped
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process an orchestrator event and shape the response at the requested verbosity.
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    try:
+        verbosity = get_verbosity(event)
+    except InvalidVerbosityError as e:
+        return 400, {
+            'error': str(e),
+            'session_id': event.get('session_id')
+        }
+    
+    status_code, response_body = run_idempotent_action(event, context)
+    return status_code, fit_response(response_body, shape_step_results, verbosity)
+
+def run_idempotent_action(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run an orchestrator action, answering duplicates of IDEMPOTENT_ACTIONS without re-running them.
+    
+    A duplicate that arrives while the original is still running waits for it
+    and gets the same response; one that arrives afterwards gets the stored
+    response. Both are marked with "idempotent_replay".
+    
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    action = event.get('action')
+    idempotency = build_idempotency_key(event) if action in IDEMPOTENT_ACTIONS else None
+    if idempotency_layer is None or idempotency is None:
+        return run_action(event, context)
+    
+    key, fingerprint = idempotency
+    try:
+        status_code, response_body, outcome = idempotency_layer.run(
+            key, fingerprint, lambda: run_action(event, context), IDEMPOTENT_ACTIONS[action]
+        )
+    except RequestInProgressError as e:
+        return 409, {
+            'error': 'Request in progress',
+            'message': str(e),
+            'retryable': True,
+            'session_id': event.get('session_id')
+        }
+    except IdempotencyKeyReusedError as e:
+        return 422, {
+            'error': 'Idempotency key reused',
+            'message': str(e),
+            'session_id': event.get('session_id')
+        }
+    
+    if outcome != 'executed':
+        logger.info(f"Answered duplicate {action} for session {event.get('session_id')} ({outcome})")
+        return status_code, dict(response_body, idempotent_replay=True)
+    return status_code, response_body
+
+def run_action(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run an orchestrator action and return the status code and response body.
     
     Expected event structure:
     {
-        "action": "start_kyc" | "process_document" | "complete_liveness" | "final_verification",
+        "action": "start_kyc" | "create_upload_url" | "process_document" | "complete_liveness" | "final_verification" | "full_kyc" | "screen_sanctions" | "process_document_batch" | "job_status" | "warm",
+        "actions": ["process_document"] (optional, for warm: only prepare what these actions need),
         "session_id": "unique-session-id" (optional for start_kyc),
-        "image_data": "base64-encoded-image" (for process_document),
+        "image_data": "base64-encoded-image" (for process_document and full_kyc),
+        "s3_key": "uploads/session-id/upload-id.jpg" (instead of image_data, from create_upload_url),
+        "pages": ["base64-front", "base64-back"] (instead of image_data; pages may be PDFs),
+        "content_type": "image/jpeg" | "image/png" | "application/pdf" (optional, for create_upload_url),
         "document_type": "passport" | "drivers-license" | "national-id",
-        "liveness_session_id": "liveness-session-id" (for complete_liveness),
-        "s3_bucket": "your-kyc-bucket"
+        "async": true (optional, for process_document: queue the document and return a job ticket),
+        "job_id": "job-id" (for job_status, from an async process_document),
+        "liveness_session_id": "liveness-session-id" (for complete_liveness and full_kyc; optional for final_verification, default the session's),
+        "wait_seconds": 20 (optional, for complete_liveness: wait server-side for a final status),
+        "extracted_fields": {"FIRST_NAME": "...", ...} (optional, for screen_sanctions; by default those of the processed document),
+        "items": [{"item_id": "...", "s3_key": "..."}] (for process_document_batch),
+        "max_concurrency": 8 (optional, for process_document_batch),
+        "cursor": 0 (optional, for process_document_batch: "next_cursor" of a partial batch),
+        "s3_bucket": "your-kyc-bucket",
+        "verbosity": "verdict" | "summary" | "full" (optional; detail of face comparison and liveness results),
+        "idempotency_key": "client-generated-key" (optional; resends with the same key get the first response)
     }
+    
+    Returns:
+        Tuple of (status_code, response_body)
     """
     try:
         # Parse input
@@ -76,14 +849,24 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         s3_bucket = event.get('s3_bucket', 'your-kyc-bucket')
         
         if not action:
-            return create_response(400, {
+            return 400, {
                 'error': 'Missing required parameter: action'
-            })
+            }
         
         if action == 'start_kyc':
             # Generate session ID
             session_id = event.get('session_id', str(uuid.uuid4()))
             
+            # A retried start_kyc returns the liveness session created the first time
+            session = load_session(session_id)
+            if session.get('liveness_session_id'):
+                return 200, {
+                    'session_id': session_id,
+                    'liveness_session_id': session['liveness_session_id'],
+                    'status': 'SESSION_CREATED',
+                    'message': 'KYC session already started'
+                }
+            
             # Create liveness session
             liveness_payload = {
                 'action': 'create',
@@ -92,7 +875,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 's3_key_prefix': 'liveness-sessions'
             }
             
-            liveness_response = invoke_lambda_function('liveness-session-manager', liveness_payload)
+            liveness_response = invoke_lambda_function('liveness-session-manager', liveness_payload, context)
             
             response_data = {
                 'session_id': session_id,
@@ -101,28 +884,63 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'message': 'KYC session started successfully'
             }
             
+            if session_store is not None:
+                session_store.create_session(session_id, {
+                    'liveness_session_id': response_data['liveness_session_id'],
+                    's3_bucket': s3_bucket
+                })
+            
+        elif action == 'create_upload_url':
+            session_id = event.get('session_id')
+            
+            if not session_id:
+                return 400, {
+                    'error': 'Missing required parameter: session_id'
+                }
+            
+            response_data = dict(
+                create_upload_url(session_id, s3_bucket, event.get('content_type', 'image/jpeg')),
+                session_id=session_id,
+                status='UPLOAD_URL_CREATED'
+            )
+            
         elif action == 'process_document':
             session_id = event.get('session_id')
             image_data = event.get('image_data')
+            pages = event.get('pages')
+            s3_key = event.get('s3_key')
             document_type = event.get('document_type', 'passport')
             
-            if not all([session_id, image_data]):
-                return create_response(400, {
-                    'error': 'Missing required parameters: session_id and image_data'
-                })
+            if not session_id or not (image_data or pages or s3_key):
+                return 400, {
+                    'error': 'Missing required parameters: session_id and image_data, pages or s3_key'
+                }
             
-            # Process document
-            document_payload = {
-                'session_id': session_id,
-                'image_data': image_data,
-                'document_type': document_type
-            }
+            if s3_key and not is_session_upload_key(session_id, s3_key):
+                return 400, {
+                    'error': 'Invalid s3_key: not an upload for this session'
+                }
             
-            document_response = invoke_lambda_function('document-processor', document_payload)
+            if event.get('async'):
+                if job_queue.job_queue is None:
+                    return 400, {
+                        'error': 'Asynchronous processing is not enabled (KYC_JOB_QUEUE)'
+                    }
+                return submit_document_job(session_id, image_data, document_type, s3_key, s3_bucket, pages)
+            
+            # Process document
+            status_code, document_result, result_source = run_process_document(
+                session_id, image_data, document_type, load_session(session_id), s3_key, s3_bucket, pages, context
+            )
+            # Retryable failures and rejections of the document (e.g. 422 for an unreadable
+            # image) keep document-processor's status and body
+            if is_retryable_failure(document_result) or 400 <= status_code < 500:
+                return status_code, dict(document_result, session_id=session_id)
             
             response_data = {
                 'session_id': session_id,
-                'document_processing': json.loads(document_response['body']),
+                'document_processing': document_result,
+                'result_source': result_source,
                 'status': 'DOCUMENT_PROCESSED'
             }
             
@@ -131,64 +949,192 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             liveness_session_id = event.get('liveness_session_id')
             
             if not all([session_id, liveness_session_id]):
-                return create_response(400, {
+                return 400, {
                     'error': 'Missing required parameters: session_id and liveness_session_id'
-                })
+                }
             
             # Get liveness results
-            liveness_payload = {
-                'action': 'get_results',
-                'session_id': liveness_session_id
-            }
-            
-            liveness_response = invoke_lambda_function('liveness-session-manager', liveness_payload)
-            liveness_results = json.loads(liveness_response['body'])
+            liveness_results, result_source = run_complete_liveness(
+                session_id, liveness_session_id, load_session(session_id), event.get('wait_seconds'), context
+            )
             
             response_data = {
                 'session_id': session_id,
                 'liveness_results': liveness_results,
+                'result_source': result_source,
                 'status': 'LIVENESS_COMPLETED'
             }
             
         elif action == 'final_verification':
             session_id = event.get('session_id')
             id_face_s3_key = event.get('id_face_s3_key')
+            candidate_s3_keys = event.get('id_face_candidate_s3_keys')
             liveness_reference_s3_key = event.get('liveness_reference_s3_key')
             
+            # Look up the face keys server-side when the client does not send them
+            session = load_session(session_id) if session_id else {}
+            if not id_face_s3_key:
+                document_result = get_stored_step(session, 'process_document') or {}
+                id_face_s3_key = document_result.get('face_s3_key')
+                candidate_s3_keys = candidate_s3_keys or get_face_candidate_keys(document_result)
+            # Only the stored result of the liveness session being verified supplies the reference image
+            liveness_session_id = event.get('liveness_session_id') or session.get('liveness_session_id')
+            if not liveness_reference_s3_key and liveness_session_id:
+                liveness_reference_s3_key = get_reference_image_key(
+                    get_stored_step(session, 'complete_liveness', fingerprint_of(liveness_session_id))
+                )
+            
             if not all([session_id, id_face_s3_key, liveness_reference_s3_key]):
-                return create_response(400, {
+                return 400, {
                     'error': 'Missing required parameters: session_id, id_face_s3_key, liveness_reference_s3_key'
-                })
+                }
             
             # Compare faces
-            face_comparison_payload = {
-                'session_id': session_id,
-                'id_face_s3_key': id_face_s3_key,
-                'liveness_reference_s3_key': liveness_reference_s3_key,
-                's3_bucket': s3_bucket,
-                'similarity_threshold': 95.0
-            }
+            started_at = time.perf_counter()
+            status_code, face_comparison_results, result_source = run_face_comparison(
+                session_id, id_face_s3_key, liveness_reference_s3_key, s3_bucket, session, candidate_s3_keys,
+                context
+            )
+            if is_retryable_failure(face_comparison_results):
+                return status_code, dict(face_comparison_results, session_id=session_id)
             
-            face_comparison_response = invoke_lambda_function('face-comparison', face_comparison_payload)
-            face_comparison_results = json.loads(face_comparison_response['body'])
+            step_timings = get_step_timings(session)
+            step_timings.setdefault('final_verification', round((time.perf_counter() - started_at) * 1000, 2))
             
             response_data = {
                 'session_id': session_id,
                 'face_comparison': face_comparison_results,
                 'verification_passed': face_comparison_results['verification_passed'],
+                'result_source': result_source,
+                'step_timings': step_timings,
                 'status': 'VERIFICATION_COMPLETED'
             }
             
+        elif action == 'full_kyc':
+            session_id = event.get('session_id')
+            session = load_session(session_id) if session_id else {}
+            liveness_session_id = event.get('liveness_session_id') or session.get('liveness_session_id')
+            
+            if not all([session_id, liveness_session_id]):
+                return 400, {
+                    'error': 'Missing required parameters: session_id and liveness_session_id'
+                }
+            
+            if event.get('s3_key') and not is_session_upload_key(session_id, event['s3_key']):
+                return 400, {
+                    'error': 'Invalid s3_key: not an upload for this session'
+                }
+            
+            status_code, response_data = run_full_kyc(
+                session_id,
+                event.get('image_data'),
+                event.get('document_type', 'passport'),
+                liveness_session_id,
+                s3_bucket,
+                session,
+                event.get('wait_seconds'),
+                event.get('s3_key'),
+                event.get('pages'),
+                context
+            )
+            return status_code, response_data
+            
+        elif action == 'screen_sanctions':
+            session_id = event.get('session_id')
+            extracted_fields = event.get('extracted_fields')
+            
+            # Screen the fields of the processed document when the client does not send them
+            session = load_session(session_id) if session_id else {}
+            if not extracted_fields:
+                extracted_fields = (get_stored_step(session, 'process_document') or {}).get('extracted_fields')
+            
+            if not all([session_id, extracted_fields]):
+                return 400, {
+                    'error': 'Missing required parameters: session_id and extracted_fields (or a processed document)'
+                }
+            
+            status_code, screening_results, result_source = run_sanctions_screening(
+                session_id, extracted_fields, session, context
+            )
+            if status_code != 200:
+                return status_code, screening_results
+            
+            response_data = {
+                'session_id': session_id,
+                'sanctions_screening': screening_results,
+                'result_source': result_source,
+                'status': 'SANCTIONS_SCREENED'
+            }
+            
+        elif action == 'job_status':
+            session_id = event.get('session_id')
+            job_id = event.get('job_id')
+            
+            if not all([session_id, job_id]):
+                return 400, {
+                    'error': 'Missing required parameters: session_id and job_id'
+                }
+            
+            # Jobs of other sessions are reported as unknown
+            job = job_queue.get_job(job_id)
+            if job is None or job.get('session_id') != session_id:
+                return 404, {
+                    'error': 'Job not found',
+                    'session_id': session_id,
+                    'job_id': job_id
+                }
+            
+            response_data = build_job_status(session_id, job)
+            
+        elif action == 'warm':
+            return 200, warm_actions(event.get('actions'))
+            
+        elif action == 'process_document_batch':
+            items = event.get('items')
+            
+            if not items:
+                return 400, {
+                    'error': 'Missing required parameter: items'
+                }
+            
+            # Process the batch with bounded concurrency; results go to an S3 manifest
+            batch_payload = {
+                'batch_id': event.get('batch_id', str(uuid.uuid4())),
+                'items': items,
+                's3_bucket': s3_bucket,
+                'max_concurrency': event.get('max_concurrency', 8)
+            }
+            if event.get('manifest_key'):
+                batch_payload['manifest_key'] = event['manifest_key']
+            if event.get('cursor'):
+                batch_payload['cursor'] = event['cursor']
+            
+            batch_response = invoke_lambda_function('batch-document-processor', batch_payload, context)
+            
+            response_data = {
+                'batch_processing': batch_response['body'],
+                # BATCH_PARTIAL when the processor ran out of time; its body has the next_cursor
+                'status': batch_response['body'].get('status', 'BATCH_PROCESSED')
+            }
+            
         else:
-            return create_response(400, {
-                'error': 'Invalid action. Must be "start_kyc", "process_document", "complete_liveness", or "final_verification"'
-            })
+            return 400, {
+                'error': 'Invalid action. Must be "start_kyc", "create_upload_url", "process_document", "complete_liveness", "final_verification", "full_kyc", "screen_sanctions", "process_document_batch", or "job_status"'
+            }
         
-        return create_response(200, response_data)
+        return 200, response_data
         
     except Exception as e:
         logger.error(f"Error in KYC orchestrator: {str(e)}")
-        return create_response(500, {
+        return 500, {
             'error': 'Internal server error',
             'message': str(e)
-        })
+        }
+
+@instrument_handler('kyc-orchestrator')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for KYC orchestration.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -0,0 +1,200 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import importlib
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Tuple
+
+# Threads running handler code; each one blocks on boto3 calls, not CPU
+SERVICE_WORKERS = int(os.environ.get('KYC_SERVICE_WORKERS', '64'))
+
+# Service mode hosts every handler in one process. These must be set before the
+# handler modules are imported, since they read them at import time.
+os.environ.setdefault('KYC_DISPATCH_MODE', 'local')
+os.environ.setdefault('AWS_MAX_POOL_CONNECTIONS', str(SERVICE_WORKERS * 2))
+os.environ.setdefault('DOCUMENT_BRANCH_WORKERS', str(SERVICE_WORKERS * 2))
+os.environ.setdefault('DOCUMENT_PAGE_WORKERS', str(SERVICE_WORKERS * 2))
+os.environ.setdefault('FACE_DOWNLOAD_WORKERS', str(SERVICE_WORKERS * 2))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import kyc_orchestrator
+import json_codec
+from cors_helper import get_cors_headers
+from instrumentation import metrics
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Requests admitted at once; further requests get 503 instead of queueing without bound
+MAX_PENDING_REQUESTS = int(os.environ.get('KYC_SERVICE_MAX_PENDING', '1024'))
+
+# Deadline handed to handlers in place of the Lambda timeout
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get('KYC_SERVICE_REQUEST_TIMEOUT', '60'))
+
+# Concurrent requests share the collector, so metrics are flushed on an interval
+METRICS_FLUSH_INTERVAL_SECONDS = float(os.environ.get('KYC_SERVICE_METRICS_INTERVAL', '10'))
+
+class ServiceContext:
+    """
+    Stand-in for the Lambda context object, so handlers budget their work against the request deadline.
+    """
+
+    def __init__(self, function_name: str, timeout_seconds: float = REQUEST_TIMEOUT_SECONDS):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int((self.deadline - time.monotonic()) * 1000), 0)
+
+class HandlerPool:
+    """
+    Runs blocking handler code on a bounded thread pool from the event loop.
+
+    The pool size caps concurrent boto3 calls; admission beyond
+    max_pending is refused so a burst cannot pile up unbounded work.
+    """
+
+    def __init__(self, max_workers: int = SERVICE_WORKERS, max_pending: int = MAX_PENDING_REQUESTS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kyc-service')
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def is_saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, process_event: Callable, event: Dict[str, Any],
+                  context: ServiceContext) -> Tuple[int, Dict[str, Any]]:
+        """
+        Run a handler's process_event and wait for it until the request deadline.
+
+        Args:
+            process_event: Handler function returning (status_code, response_body)
+            event: Handler event
+            context: Request context with the deadline
+
+        Returns:
+            Tuple of (status_code, response_body)
+        """
+        # Only touched from the event loop thread, so no lock is needed
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, process_event, event, context)
+            return await asyncio.wait_for(future, timeout=context.get_remaining_time_in_millis() / 1000.0)
+        except asyncio.TimeoutError:
+            logger.error(f"Request {context.aws_request_id} to {context.function_name} timed out")
+            return 504, {
+                'error': 'Request timed out',
+                'request_id': context.aws_request_id
+            }
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+handler_pool = HandlerPool()
+
+def get_handler(function_name: str) -> Callable:
+    """
+    Look up the process_event of a hosted handler.
+
+    Args:
+        function_name: Lambda function name, e.g. "document-processor"
+
+    Returns:
+        The handler's process_event function
+    """
+    if function_name == 'kyc-orchestrator':
+        return kyc_orchestrator.process_event
+    module_name = kyc_orchestrator.LOCAL_HANDLER_MODULES[function_name]
+    return importlib.import_module(module_name).process_event
+
+async def flush_metrics_periodically() -> None:
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL_SECONDS)
+        metrics.flush('kyc-service', {'in_flight': handler_pool.pending})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Import every handler up front so the first requests do not pay for it
+    for function_name in kyc_orchestrator.LOCAL_HANDLER_MODULES:
+        get_handler(function_name)
+
+    flusher = asyncio.create_task(flush_metrics_periodically())
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        handler_pool.shutdown()
+        metrics.flush('kyc-service', {'in_flight': handler_pool.pending})
+
+app = FastAPI(title='KYC Service', lifespan=lifespan)
+
+class CodecJSONResponse(JSONResponse):
+    """
+    JSON response encoded by json_codec, which also handles bytes, Decimal and datetime values.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_codec.dumps_bytes(content)
+
+async def dispatch(function_name: str, event: Dict[str, Any]) -> JSONResponse:
+    """
+    Run a handler for an HTTP request and convert its result into a response.
+
+    Args:
+        function_name: Hosted function to run
+        event: Handler event built from the request
+
+    Returns:
+        JSON response with the handler's status code and body
+    """
+    if handler_pool.is_saturated():
+        return JSONResponse({'error': 'Service busy'}, status_code=503,
+                            headers=dict(get_cors_headers(), **{'Retry-After': '1'}))
+
+    started_at = time.perf_counter()
+    context = ServiceContext(function_name)
+    status_code, response_body = await handler_pool.run(get_handler(function_name), event, context)
+    metrics.record('request_ms', (time.perf_counter() - started_at) * 1000)
+
+    return CodecJSONResponse(response_body, status_code=status_code, headers=get_cors_headers())
+
+async def read_event(request: Request) -> Dict[str, Any]:
+    body = await request.body()
+    return await request.json() if body else {}
+
+@app.get('/health')
+async def health() -> Dict[str, Any]:
+    return {
+        'status': 'ok',
+        'workers': handler_pool.max_workers,
+        'in_flight': handler_pool.pending
+    }
+
+@app.post('/kyc/{action}')
+async def kyc_action(action: str, request: Request) -> JSONResponse:
+    """
+    Run an orchestrator action; the JSON body carries the remaining event fields.
+    """
+    event = dict(await read_event(request), action=action)
+    return await dispatch('kyc-orchestrator', event)
+
+@app.post('/functions/{function_name}')
+async def invoke_function(function_name: str, request: Request) -> JSONResponse:
+    """
+    Call one hosted handler directly with the JSON body as its event.
+    """
+    if function_name != 'kyc-orchestrator' and function_name not in kyc_orchestrator.LOCAL_HANDLER_MODULES:
+        return JSONResponse({'error': f"Unknown function: {function_name}"}, status_code=404,
+                            headers=get_cors_headers())
+    return await dispatch(function_name, await read_event(request))
@@ -0,0 +1,363 @@
+import json
+import os
+import time
+import threading
+import logging
+from urllib.parse import unquote_plus
+from typing import Dict, Any, List, Optional, Tuple
+from botocore.exceptions import ClientError
+
+from cors_helper import create_response
+from liveness_session_manager import (
+    get_liveness_session_results,
+    build_results_response
+)
+from response_shaping import RESPONSE_VERBOSITY, fit_response, shape_liveness_results
+import json_codec
+from aws_clients import is_missing_object, lazy_client
+from instrumentation import instrument_handler
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Liveness statuses after which the results no longer change
+TERMINAL_STATUSES = {'SUCCEEDED', 'FAILED', 'EXPIRED'}
+
+# Result store: "memory" (per execution environment) or "s3" (shared across functions).
+# With remote dispatch (the orchestrator's default) the watcher and the
+# orchestrator are separate functions, so only "s3" lets them share results
+DISPATCH_MODE = os.environ.get('KYC_DISPATCH_MODE', 'remote')
+RESULT_STORE = os.environ.get('LIVENESS_RESULT_STORE', 's3' if DISPATCH_MODE == 'remote' else 'memory')
+RESULT_STORE_BUCKET = os.environ.get('LIVENESS_RESULT_BUCKET', 'your-kyc-bucket')
+RESULT_STORE_PREFIX = os.environ.get('LIVENESS_RESULT_PREFIX', 'liveness-results')
+
+# Prefix passed to create_face_liveness_session as S3KeyPrefix
+LIVENESS_OUTPUT_PREFIX = os.environ.get('LIVENESS_OUTPUT_PREFIX', 'liveness-sessions')
+
+# Server-side polling schedule
+POLL_INITIAL_DELAY_SECONDS = float(os.environ.get('LIVENESS_POLL_INITIAL_DELAY', '0.5'))
+POLL_MAX_DELAY_SECONDS = float(os.environ.get('LIVENESS_POLL_MAX_DELAY', '5.0'))
+POLL_MAX_WAIT_SECONDS = float(os.environ.get('LIVENESS_POLL_MAX_WAIT', '30.0'))
+
+class MemoryLivenessResultStore:
+    """
+    Terminal liveness results held in module state.
+
+    Suitable for tests and for in-process dispatch, where the watcher and the
+    orchestrator share one execution environment.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def get(self, liveness_session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.results.get(liveness_session_id)
+
+    def put_if_absent(self, liveness_session_id: str, result: Dict[str, Any]) -> bool:
+        with self._lock:
+            if liveness_session_id in self.results:
+                return False
+            self.results[liveness_session_id] = result
+            return True
+
+class S3LivenessResultStore:
+    """
+    Terminal liveness results stored as one JSON object per session in S3.
+    """
+
+    def __init__(self, bucket: str = RESULT_STORE_BUCKET, prefix: str = RESULT_STORE_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3_client = lazy_client('s3')
+
+    def _key(self, liveness_session_id: str) -> str:
+        return f"{self.prefix}/{liveness_session_id}.json"
+
+    def get(self, liveness_session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(liveness_session_id))
+        except ClientError as e:
+            # A missing key reads as 403 without s3:ListBucket; either way nothing is recorded
+            if is_missing_object(e):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def put_if_absent(self, liveness_session_id: str, result: Dict[str, Any]) -> bool:
+        # Terminal results never change, so a racing duplicate write is harmless
+        if self.get(liveness_session_id) is not None:
+            return False
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(liveness_session_id),
+            Body=json_codec.dumps(result),
+            ContentType='application/json'
+        )
+        return True
+
+# Store name -> factory; additional backends can be registered here
+RESULT_STORES = {
+    'memory': MemoryLivenessResultStore,
+    's3': S3LivenessResultStore
+}
+
+def build_result_store() -> Any:
+    """
+    Build the result store from the environment configuration.
+
+    Returns:
+        Result store backend
+
+    Raises:
+        RuntimeError: If the memory store is configured with remote dispatch, where the
+            orchestrator would never see the results the watcher records
+    """
+    store_factory = RESULT_STORES.get(RESULT_STORE, MemoryLivenessResultStore)
+    if DISPATCH_MODE == 'remote' and store_factory is MemoryLivenessResultStore:
+        raise RuntimeError(
+            f"LIVENESS_RESULT_STORE={RESULT_STORE} is per function; use s3 with KYC_DISPATCH_MODE=remote"
+        )
+    return store_factory()
+
+# Store shared across warm invocations, built on first use so a configuration
+# error fails the requests that need the store instead of every importer
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store() -> Any:
+    """
+    Get the result store shared across warm invocations.
+
+    Raises:
+        RuntimeError: If the configured store cannot be used; see build_result_store
+    """
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                _result_store = build_result_store()
+    return _result_store
+
+def is_terminal(results: Dict[str, Any]) -> bool:
+    return results.get('status') in TERMINAL_STATUSES
+
+def get_recorded_result(liveness_session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the stored terminal result for a liveness session.
+
+    Args:
+        liveness_session_id: Rekognition liveness session ID
+
+    Returns:
+        Stored results body, or None if the session has not finished
+    """
+    return get_result_store().get(liveness_session_id)
+
+def record_result(results: Dict[str, Any]) -> bool:
+    """
+    Store a liveness result if it is terminal and not yet recorded.
+
+    Args:
+        results: Results body from build_results_response
+
+    Returns:
+        True if the result was recorded by this call
+    """
+    if not is_terminal(results):
+        return False
+
+    recorded = get_result_store().put_if_absent(results['session_id'], results)
+    if recorded:
+        logger.info(f"Recorded terminal liveness result for {results['session_id']}: {results['status']}")
+    return recorded
+
+def fetch_and_record(liveness_session_id: str) -> Dict[str, Any]:
+    """
+    Fetch liveness results from Rekognition and record them if terminal.
+
+    Args:
+        liveness_session_id: Rekognition liveness session ID
+
+    Returns:
+        Results body
+    """
+    # Shaped as liveness_session_manager shapes results by default, so recorded and polled results match
+    results = fit_response(build_results_response(get_liveness_session_results(liveness_session_id)),
+                           shape_liveness_results, RESPONSE_VERBOSITY)
+    record_result(results)
+    return results
+
+def poll_until_terminal(liveness_session_id: str, max_wait_seconds: float = POLL_MAX_WAIT_SECONDS,
+                        initial_delay: float = POLL_INITIAL_DELAY_SECONDS,
+                        max_delay: float = POLL_MAX_DELAY_SECONDS) -> Dict[str, Any]:
+    """
+    Poll Rekognition with exponential backoff until the session reaches a terminal status.
+
+    Args:
+        liveness_session_id: Rekognition liveness session ID
+        max_wait_seconds: Give up and return the latest status after this long
+        initial_delay: Delay before the second poll
+        max_delay: Upper bound on the delay between polls
+
+    Returns:
+        Terminal results body, or the latest non-terminal one on timeout
+    """
+    recorded = get_recorded_result(liveness_session_id)
+    if recorded is not None:
+        return recorded
+
+    deadline = time.monotonic() + max_wait_seconds
+    delay = initial_delay
+
+    while True:
+        results = fetch_and_record(liveness_session_id)
+        if is_terminal(results):
+            return results
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.info(f"Liveness session {liveness_session_id} still {results['status']} after {max_wait_seconds}s")
+            return results
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+def parse_liveness_output_key(key: str, output_prefix: str = LIVENESS_OUTPUT_PREFIX) -> Optional[Tuple[str, str]]:
+    """
+    Extract session IDs from a liveness output object key.
+
+    Rekognition writes under "{S3KeyPrefix}{LivenessSessionId}/", and the
+    session manager sets S3KeyPrefix to "{prefix}/{kyc_session_id}/".
+
+    Args:
+        key: S3 object key from the event
+        output_prefix: Root prefix used when creating liveness sessions
+
+    Returns:
+        Tuple of (kyc_session_id, liveness_session_id), or None if the key does not match
+    """
+    root = output_prefix.rstrip('/') + '/'
+    if not key.startswith(root):
+        return None
+
+    parts = key[len(root):].split('/')
+    if len(parts) < 3:
+        return None
+    return parts[0], parts[1]
+
+def handle_s3_event(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Record results for every liveness session that has new output objects.
+
+    Args:
+        event: S3 ObjectCreated notification event
+
+    Returns:
+        Results bodies for the sessions referenced by the event
+    """
+    # Several output objects (reference and audit images) arrive per session
+    liveness_session_ids = set()
+    for record in event.get('Records', []):
+        key = unquote_plus(record['s3']['object']['key'])
+        session_ids = parse_liveness_output_key(key)
+        if session_ids is not None:
+            liveness_session_ids.add(session_ids[1])
+
+    results = []
+    for liveness_session_id in liveness_session_ids:
+        recorded = get_recorded_result(liveness_session_id)
+        results.append(recorded if recorded is not None else fetch_and_record(liveness_session_id))
+    return results
+
+def build_s3_event(bucket: str, keys: List[str]) -> Dict[str, Any]:
+    """
+    Build an S3 ObjectCreated event, standing in for the bucket notification locally.
+
+    Args:
+        bucket: Bucket name
+        keys: Object keys that were created
+
+    Returns:
+        Event in the shape S3 delivers to Lambda
+    """
+    return {
+        'Records': [
+            {
+                'eventSource': 'aws:s3',
+                'eventName': 'ObjectCreated:Put',
+                's3': {
+                    'bucket': {'name': bucket},
+                    'object': {'key': key}
+                }
+            }
+            for key in keys
+        ]
+    }
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a watcher event and return the status code and response body.
+
+    Accepts either an S3 ObjectCreated notification for the liveness output
+    prefix, or a direct request:
+    {
+        "action": "watch" | "get_recorded",
+        "liveness_session_id": "liveness-session-id",
+        "max_wait_seconds": 30 (optional, for watch)
+    }
+
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    try:
+        if 'Records' in event:
+            results = handle_s3_event(event)
+            return 200, {
+                'results': results,
+                'status': 'RECORDED'
+            }
+
+        action = event.get('action')
+        liveness_session_id = event.get('liveness_session_id')
+
+        if not liveness_session_id:
+            return 400, {
+                'error': 'Missing required parameter: liveness_session_id'
+            }
+
+        if action == 'watch':
+            max_wait_seconds = float(event.get('max_wait_seconds', POLL_MAX_WAIT_SECONDS))
+            results = poll_until_terminal(liveness_session_id, max_wait_seconds)
+
+        elif action == 'get_recorded':
+            results = get_recorded_result(liveness_session_id)
+            if results is None:
+                return 404, {
+                    'error': 'No terminal result recorded',
+                    'session_id': liveness_session_id
+                }
+
+        else:
+            return 400, {
+                'error': 'Invalid action. Must be "watch" or "get_recorded"'
+            }
+
+        return 200, results
+
+    except Exception as e:
+        logger.error(f"Error in liveness results watcher: {str(e)}")
+        return 500, {
+            'error': 'Internal server error',
+            'message': str(e)
+        }
+
+@instrument_handler('liveness-results-watcher')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for the liveness results watcher.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
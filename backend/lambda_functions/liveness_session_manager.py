@@ -1,34 +1,22 @@
-import json
-import boto3
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import logging
 
-# CORS Helper Functions (inline)
-def get_cors_headers():
-    return {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
-
-def create_response(status_code: int, body: dict, cors_enabled: bool = True):
-    response = {
-        'statusCode': status_code,
-        'body': json.dumps(body)
-    }
-    
-    if cors_enabled:
-        response['headers'] = get_cors_headers()
-    
-    return response
+from cors_helper import create_response
+from resilience import DependencyUnavailableError, build_dependency_failure, resilient_client
+from response_shaping import InvalidVerbosityError, fit_response, get_verbosity, shape_liveness_results
+from instrumentation import instrument_handler
+from warmup import warm
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-rekognition_client = boto3.client('rekognition')
+# Initialize AWS clients (built on first use, with adaptive timeouts, hedging and circuit breakers)
+rekognition_client = resilient_client('rekognition')
+
+# Clients a warmer event prepares
+WARM_CLIENTS = ['rekognition']
 
 def create_liveness_session(session_id: str, s3_bucket: str, s3_key_prefix: str) -> Dict[str, Any]:
     """
@@ -92,17 +80,42 @@ def get_liveness_session_results(session_id: str) -> Dict[str, Any]:
         logger.error(f"Error getting liveness session results: {str(e)}")
         raise
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def build_results_response(results: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Main Lambda handler for liveness session management.
+    Shape a GetFaceLivenessSessionResults response for API callers.
+    
+    Args:
+        results: Raw Rekognition liveness results
+    
+    Returns:
+        Response body with session status, confidence and images
+    """
+    return {
+        'session_id': results['SessionId'],
+        'status': results['Status'],
+        'confidence': results.get('Confidence'),
+        'reference_image': results.get('ReferenceImage'),
+        'audit_images': results.get('AuditImages', []),
+        'challenge': results.get('Challenge')
+    }
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a liveness session event and return the status code and response body.
+    
+    Shared by lambda_handler and in-process callers so the body stays a native dict.
     
     Expected event structure:
     {
-        "action": "create" | "get_results",
+        "action": "create" | "get_results" | "warm",
         "session_id": "unique-session-id" (optional for create),
         "s3_bucket": "your-kyc-bucket",
-        "s3_key_prefix": "liveness-sessions"
+        "s3_key_prefix": "liveness-sessions",
+        "verbosity": "verdict" | "summary" | "full" (optional for get_results, default KYC_RESPONSE_VERBOSITY)
     }
+    
+    Returns:
+        Tuple of (status_code, response_body)
     """
     try:
         # Parse input
@@ -111,9 +124,12 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         s3_key_prefix = event.get('s3_key_prefix', 'liveness-sessions')
         
         if not action:
-            return create_response(400, {
+            return 400, {
                 'error': 'Missing required parameter: action'
-            })
+            }
+        
+        if action == 'warm':
+            return 200, warm(WARM_CLIENTS)
         
         if action == 'create':
             # Generate session ID if not provided
@@ -132,32 +148,43 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             session_id = event.get('session_id')
             
             if not session_id:
-                return create_response(400, {
+                return 400, {
                     'error': 'Missing required parameter: session_id for get_results action'
-                })
+                }
+            
+            verbosity = get_verbosity(event)
             
             # Get liveness session results
             results = get_liveness_session_results(session_id)
             
-            response_data = {
-                'session_id': results['SessionId'],
-                'status': results['Status'],
-                'confidence': results.get('Confidence'),
-                'reference_image': results.get('ReferenceImage'),
-                'audit_images': results.get('AuditImages', []),
-                'challenge': results.get('Challenge')
-            }
+            response_data = fit_response(build_results_response(results), shape_liveness_results, verbosity)
             
         else:
-            return create_response(400, {
+            return 400, {
                 'error': 'Invalid action. Must be "create" or "get_results"'
-            })
+            }
         
-        return create_response(200, response_data)
+        return 200, response_data
         
+    except InvalidVerbosityError as e:
+        return 400, {
+            'error': str(e),
+            'session_id': event.get('session_id')
+        }
+    except DependencyUnavailableError as e:
+        logger.error(f"Error in liveness session manager: {str(e)}")
+        return e.status_code, build_dependency_failure(e, event.get('session_id'))
     except Exception as e:
         logger.error(f"Error in liveness session manager: {str(e)}")
-        return create_response(500, {
+        return 500, {
             'error': 'Internal server error',
             'message': str(e)
-        })
+        }
+
+@instrument_handler('liveness-session-manager')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for liveness session management.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -0,0 +1,269 @@
+import os
+import time
+import threading
+import functools
+import logging
+from typing import Dict, Any, Callable, Optional, Tuple
+from botocore import xform_name
+from botocore.exceptions import ClientError
+
+from shared_redis import LocalRedis, get_redis
+from instrumentation import metrics
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Account quotas per API, shared by every instance through Redis, e.g.
+# "rekognition.detect_faces=50,rekognition.compare_faces=50,textract.analyze_id=10"
+API_RATE_LIMITS = os.environ.get('KYC_API_RATE_LIMITS', '')
+
+# Bucket capacity in seconds of quota; 1.0 allows a burst of one second's worth of calls
+BURST_SECONDS = float(os.environ.get('KYC_RATE_LIMIT_BURST_SECONDS', '1.0'))
+
+# Longest a call waits for a token before it is rejected as throttled
+MAX_WAIT_SECONDS = float(os.environ.get('KYC_RATE_LIMIT_MAX_WAIT', '5.0'))
+
+KEY_PREFIX = 'kyc:ratelimit'
+
+# Reserves tokens and returns the wait until they are available, or -1 when
+# that exceeds max_wait. Tokens may go negative so waiting callers queue in
+# arrival order with a single round trip each. Uses the Redis clock so
+# instances with skewed clocks agree (requires Redis 5+ effect replication).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens < requested then
+  wait = (requested - tokens) / rate
+  if wait > max_wait then
+    return '-1'
+  end
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - requested), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+def local_token_bucket(store: LocalRedis, keys: list, args: list) -> str:
+    """
+    Python implementation of TOKEN_BUCKET_SCRIPT for LocalRedis.
+    """
+    rate, capacity, requested, max_wait = (float(arg) for arg in args)
+    seconds, microseconds = store.time()
+    now = seconds + microseconds / 1000000
+    tokens, updated_at = store.hmget(keys[0], ['tokens', 'updated_at'])
+    tokens = float(tokens) if tokens is not None else capacity
+    updated_at = float(updated_at) if updated_at is not None else now
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    wait = 0.0
+    if tokens < requested:
+        wait = (requested - tokens) / rate
+        if wait > max_wait:
+            return '-1'
+    store.hset(keys[0], mapping={'tokens': tokens - requested, 'updated_at': now})
+    store.expire(keys[0], capacity / rate + 60)
+    return str(wait)
+
+LocalRedis.register_local_script(TOKEN_BUCKET_SCRIPT, local_token_bucket)
+
+class RateLimitExceeded(ClientError):
+    """
+    Raised when a call cannot get a token within the wait limit.
+
+    Shaped like the ThrottlingException AWS would return, so existing
+    throttling handling (throttling.is_throttling_error) treats both alike.
+    """
+
+    def __init__(self, operation_name: str, api: str):
+        super().__init__(
+            {'Error': {'Code': 'ThrottlingException', 'Message': f"Shared rate limit exceeded for {api}"}},
+            operation_name
+        )
+
+class TokenBucket:
+    """
+    Token bucket stored in Redis, shared by every instance calling one API.
+    """
+
+    def __init__(self, redis_client: Any, key: str, rate: float, capacity: Optional[float] = None):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate * BURST_SECONDS, 1.0)
+        self.script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def reserve(self, tokens: float = 1.0, max_wait: float = MAX_WAIT_SECONDS) -> Optional[float]:
+        """
+        Reserve tokens.
+
+        Args:
+            tokens: Tokens to take
+            max_wait: Longest acceptable wait in seconds
+
+        Returns:
+            Seconds to wait before using the tokens, or None if that would exceed max_wait
+        """
+        wait = float(self.script(keys=[self.key], args=[self.rate, self.capacity, tokens, max_wait]))
+        return None if wait < 0 else wait
+
+    def acquire(self, tokens: float = 1.0, max_wait: float = MAX_WAIT_SECONDS) -> bool:
+        """
+        Block until tokens are available.
+
+        Args:
+            tokens: Tokens to take
+            max_wait: Longest acceptable wait in seconds
+
+        Returns:
+            True once the tokens are taken, False if they could not be had within max_wait
+        """
+        wait = self.reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+def parse_rate_limits(config: str) -> Dict[str, float]:
+    """
+    Parse "service.operation=rate" pairs.
+
+    Args:
+        config: Comma-separated pairs, e.g. "rekognition.detect_faces=50"
+
+    Returns:
+        "service.operation" -> calls per second
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in config.split(','))):
+        api, _, rate = entry.partition('=')
+        limits[api.strip()] = float(rate)
+    return limits
+
+class RateLimiter:
+    """
+    Applies shared token buckets to boto3 clients.
+
+    Buckets are keyed by region and API, since AWS quotas are per account and
+    region. When Redis is unreachable calls proceed unthrottled rather than fail.
+    """
+
+    def __init__(self, limits: Dict[str, float], redis_client: Any = None, max_wait: float = MAX_WAIT_SECONDS):
+        self.limits = limits
+        self.redis_client = redis_client
+        self.max_wait = max_wait
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        # Set on threads running a call whose token was taken beforehand
+        self._prepaid = threading.local()
+
+    def get_bucket(self, region: str, api: str) -> Optional[TokenBucket]:
+        rate = self.limits.get(api)
+        if rate is None:
+            return None
+
+        bucket = self.buckets.get((region, api))
+        if bucket is None:
+            with self._lock:
+                if (region, api) not in self.buckets:
+                    redis_client = self.redis_client if self.redis_client is not None else get_redis()
+                    self.buckets[(region, api)] = TokenBucket(redis_client, f"{KEY_PREFIX}:{region}:{api}", rate)
+                bucket = self.buckets[(region, api)]
+        return bucket
+
+    def acquire(self, region: str, api: str, operation_name: str, max_wait: Optional[float] = None) -> None:
+        """
+        Wait for a token for one API call.
+
+        Args:
+            region: AWS region of the client
+            api: "service.operation" key
+            operation_name: API operation name for the error
+            max_wait: Longest acceptable wait in seconds (default: the limiter's max_wait)
+
+        Raises:
+            RateLimitExceeded: If no token is available within max_wait
+        """
+        bucket = self.get_bucket(region, api)
+        if bucket is None:
+            return
+
+        started_at = time.perf_counter()
+        try:
+            acquired = bucket.acquire(max_wait=self.max_wait if max_wait is None else max_wait)
+        except Exception as e:
+            logger.warning(f"Error acquiring rate limit token for {api}: {str(e)}")
+            return
+        metrics.record('rate_limit_wait_ms', (time.perf_counter() - started_at) * 1000)
+
+        if not acquired:
+            metrics.record('rate_limit_rejections', 1, 'Count')
+            raise RateLimitExceeded(operation_name, api)
+
+    def acquire_for_call(self, client: Any, api: str, max_wait: Optional[float] = None) -> None:
+        """
+        Take the token of a call ahead of making it, e.g. so a caller timing the call can leave the wait out.
+
+        Run the call through prepaid() so its before-call hook does not take a second token.
+
+        Args:
+            client: boto3 client the call is made on; anything else (e.g. a stub) is not rate-limited
+            api: "service.operation" key
+            max_wait: Longest acceptable wait in seconds (default: the limiter's max_wait)
+
+        Raises:
+            RateLimitExceeded: If no token is available within max_wait
+        """
+        meta = getattr(client, 'meta', None)
+        if meta is None or api not in self.limits:
+            return
+        operation_name = meta.method_to_api_mapping.get(api.partition('.')[2], api)
+        self.acquire(meta.region_name, api, operation_name, max_wait)
+
+    def prepaid(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap a client call whose token was taken with acquire_for_call, so the hook lets it through.
+        """
+        @functools.wraps(fn)
+        def call(*args, **kwargs) -> Any:
+            self._prepaid.active = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._prepaid.active = False
+        return call
+
+    def attach(self, client: Any) -> Any:
+        """
+        Rate-limit every configured API called through a boto3 client.
+
+        Args:
+            client: boto3 client
+
+        Returns:
+            The same client
+        """
+        service_name = client.meta.service_model.service_name
+        if not any(api.startswith(f"{service_name}.") for api in self.limits):
+            return client
+
+        region = client.meta.region_name
+
+        def before_call(model: Any, **kwargs) -> None:
+            if getattr(self._prepaid, 'active', False):
+                return
+            self.acquire(region, f"{service_name}.{xform_name(model.name)}", model.name)
+
+        client.meta.events.register('before-call.*.*', before_call, unique_id='kyc-rate-limiter')
+        return client
+
+# Module-level limiter applied to the shared clients in aws_clients
+rate_limiter = RateLimiter(parse_rate_limits(API_RATE_LIMITS))
@@ -0,0 +1,523 @@
+import io
+import os
+import math
+import time
+import threading
+import functools
+import logging
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, Optional
+
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError
+)
+
+from aws_clients import lazy_client
+from instrumentation import ContextThreadPoolExecutor, metrics
+from rate_limiter import RateLimitExceeded, rate_limiter
+from throttling import THROTTLING_ERROR_CODES
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Wrap the AWS clients of the document, face and liveness handlers with
+# adaptive timeouts, hedging and circuit breakers
+RESILIENCE_ENABLED = os.environ.get('KYC_RESILIENCE', 'true').lower() == 'true'
+
+# Idempotent reads that may be sent twice: a duplicate goes out once the first
+# attempt has taken longer than HEDGE_PERCENTILE of recent calls, and at most
+# HEDGE_MAX_RATIO of calls are hedged, which caps the extra cost
+HEDGED_OPERATIONS = os.environ.get(
+    'KYC_HEDGED_OPERATIONS',
+    's3.get_object,rekognition.compare_faces,rekognition.get_face_liveness_session_results'
+)
+HEDGE_PERCENTILE = float(os.environ.get('KYC_HEDGE_PERCENTILE', '0.95'))
+HEDGE_MAX_RATIO = float(os.environ.get('KYC_HEDGE_MAX_RATIO', '0.05'))
+HEDGE_MIN_DELAY_MS = float(os.environ.get('KYC_HEDGE_MIN_DELAY_MS', '10'))
+
+# Per-call timeout: TIMEOUT_MULTIPLIER times the TIMEOUT_PERCENTILE latency,
+# kept within [TIMEOUT_MIN_MS, TIMEOUT_MAX_MS]; TIMEOUT_MAX_MS until an
+# operation has MIN_SAMPLES successful calls
+TIMEOUT_PERCENTILE = float(os.environ.get('KYC_TIMEOUT_PERCENTILE', '0.99'))
+TIMEOUT_MULTIPLIER = float(os.environ.get('KYC_TIMEOUT_MULTIPLIER', '3'))
+TIMEOUT_MIN_MS = float(os.environ.get('KYC_TIMEOUT_MIN_MS', '500'))
+TIMEOUT_MAX_MS = float(os.environ.get('KYC_TIMEOUT_MAX_MS', '10000'))
+MIN_SAMPLES = int(os.environ.get('KYC_RESILIENCE_MIN_SAMPLES', '50'))
+
+# Samples after which histogram counts are halved, so percentiles follow recent traffic
+HISTOGRAM_HALF_LIFE = int(os.environ.get('KYC_HISTOGRAM_HALF_LIFE', '1000'))
+
+# An operation's breaker opens when BREAKER_FAILURE_RATE of its last
+# BREAKER_WINDOW calls (and at least BREAKER_MIN_CALLS) failed with a
+# timeout, throttle or server error, and lets one probe call through after
+# BREAKER_COOLDOWN_SECONDS
+BREAKER_WINDOW = int(os.environ.get('KYC_BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('KYC_BREAKER_MIN_CALLS', '10'))
+BREAKER_FAILURE_RATE = float(os.environ.get('KYC_BREAKER_FAILURE_RATE', '0.5'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('KYC_BREAKER_COOLDOWN_SECONDS', '10'))
+
+# Threads running the wrapped calls, so they can be timed out and hedged
+RESILIENCE_WORKERS = int(os.environ.get('KYC_RESILIENCE_WORKERS', '64'))
+
+# Operations whose streaming body is read inside the call, so a slow transfer
+# counts toward the timeout and can be hedged
+BUFFERED_OPERATIONS = {'s3.get_object'}
+
+# Client attributes returned unwrapped: metadata and helpers that make no request
+PASSTHROUGH_ATTRIBUTES = {
+    'meta', 'exceptions', 'can_paginate', 'get_paginator', 'get_waiter',
+    'generate_presigned_url', 'generate_presigned_post', 'close'
+}
+
+# Error codes of a dependency failing, as opposed to rejecting the request
+SERVER_ERROR_CODES = {
+    'InternalServerError',
+    'InternalFailure',
+    'InternalError',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'ServiceFailure'
+}
+
+# Errors raised before any response when the endpoint cannot be reached or stops answering
+CONNECTION_ERRORS = (EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError)
+
+# Prefix of the messages of DependencyUnavailableError, matched in branch error strings
+DEPENDENCY_UNAVAILABLE = 'Dependency unavailable'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class DependencyUnavailableError(RuntimeError):
+    """
+    Raised instead of waiting on a degraded AWS dependency; handlers answer with a retryable status.
+
+    Attributes:
+        api: "service.operation" that was not called or did not answer
+        status_code: HTTP status for the handler response
+        retry_after_seconds: When a retry may succeed
+    """
+
+    status_code = 503
+
+    def __init__(self, api: str, reason: str, retry_after_seconds: float):
+        self.api = api
+        self.retry_after_seconds = round(retry_after_seconds, 1)
+        super().__init__(f"{DEPENDENCY_UNAVAILABLE}: {api} {reason}")
+
+class CircuitOpenError(DependencyUnavailableError):
+    """
+    Raised without calling the operation while its circuit breaker is open.
+    """
+
+    def __init__(self, api: str, retry_after_seconds: float):
+        super().__init__(api, 'is failing, circuit open', retry_after_seconds)
+
+class CallTimeoutError(DependencyUnavailableError):
+    """
+    Raised when no attempt of a call answered within its adaptive timeout.
+    """
+
+    status_code = 504
+
+    def __init__(self, api: str, timeout_seconds: float):
+        super().__init__(api, f"did not answer within {timeout_seconds * 1000:.0f} ms", 1.0)
+
+def build_dependency_failure(error: DependencyUnavailableError, session_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Build the response body of a handler that failed fast on a degraded dependency.
+
+    Args:
+        error: Error raised by the resilience layer
+        session_id: Session of the request
+
+    Returns:
+        Body telling the caller the request can be retried, and when
+    """
+    return {
+        'error': DEPENDENCY_UNAVAILABLE,
+        'message': str(error),
+        'dependency': error.api,
+        'retryable': True,
+        'retry_after_seconds': error.retry_after_seconds,
+        'session_id': session_id
+    }
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """
+    Check whether an error means the dependency is degraded, rather than that the request was invalid.
+
+    Throttles, 5xx responses, timeouts and connection errors count. Other
+    ClientErrors (e.g. InvalidParameterException) are answers, and errors
+    raised on our side (ParamValidationError, TypeError, ...) are bugs, not
+    outages.
+    """
+    if isinstance(error, (DependencyUnavailableError,) + CONNECTION_ERRORS):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    response = error.response
+    error_code = response.get('Error', {}).get('Code')
+    status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return error_code in THROTTLING_ERROR_CODES or error_code in SERVER_ERROR_CODES or status_code >= 500
+
+class LatencyHistogram:
+    """
+    Latency counts in log-spaced buckets, 10% wide from 1 ms to about two minutes.
+
+    Recording is O(1) and a percentile is one pass over the buckets. Counts
+    are halved every half_life samples, so percentiles follow recent
+    traffic and a dependency that recovered stops looking slow.
+    """
+
+    GROWTH = 1.1
+    BUCKET_COUNT = 124
+
+    def __init__(self, half_life: int = HISTOGRAM_HALF_LIFE):
+        self.half_life = half_life
+        self.counts = [0.0] * self.BUCKET_COUNT
+        self.total = 0.0
+        self.observed = 0
+        self.since_decay = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        index = 0 if latency_ms <= 1.0 else min(math.ceil(math.log(latency_ms, self.GROWTH)), self.BUCKET_COUNT - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.observed += 1
+            self.since_decay += 1
+            if self.since_decay >= self.half_life:
+                self.counts = [count / 2 for count in self.counts]
+                self.total /= 2
+                self.since_decay = 0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Upper bound in milliseconds of the bucket holding the given percentile, or None before any sample.
+        """
+        with self._lock:
+            if self.total == 0:
+                return None
+            rank = fraction * self.total
+            cumulative = 0.0
+            for index, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= rank:
+                    return self.GROWTH ** index
+            return self.GROWTH ** (self.BUCKET_COUNT - 1)
+
+class CircuitBreaker:
+    """
+    Fails calls fast while an operation keeps failing, instead of queueing more work behind it.
+
+    Closed, it tracks the outcome of the last `window` calls and opens when
+    `failure_rate` of them failed. Open, it rejects calls for `cooldown`
+    seconds, then half-opens and lets a single probe through: success closes
+    it, failure opens it for another cooldown.
+    """
+
+    def __init__(self, api: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.api = api
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: If the call must not be made
+        """
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(self.api, remaining)
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self.probe_in_flight:
+                    raise CircuitOpenError(self.api, 1.0)
+                self.probe_in_flight = True
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        metrics.record('circuit_opened', 1, 'Count')
+        logger.warning(f"Circuit opened for {self.api} for {self.cooldown:g}s")
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                logger.info(f"Circuit closed for {self.api}")
+            self.outcomes.append(False)
+
+    def on_unrelated_error(self) -> None:
+        """
+        Record a call that failed before it told anything about the dependency.
+
+        Leaves the outcomes alone, but frees the half-open probe so the next call can probe.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.outcomes.append(True)
+            if len(self.outcomes) >= self.min_calls and sum(self.outcomes) >= self.failure_rate * len(self.outcomes):
+                self._open()
+
+class OperationPolicy:
+    """
+    Latency histogram, hedge budget and circuit breaker of one "service.operation".
+    """
+
+    def __init__(self, api: str, hedged: bool):
+        self.api = api
+        self.hedged = hedged
+        self.histogram = LatencyHistogram()
+        self.breaker = CircuitBreaker(api)
+        self.calls = 0.0
+        self.hedges = 0.0
+        self._lock = threading.Lock()
+
+    def timeout_seconds(self) -> float:
+        latency_ms = self.histogram.percentile(TIMEOUT_PERCENTILE)
+        if latency_ms is None or self.histogram.observed < MIN_SAMPLES:
+            return TIMEOUT_MAX_MS / 1000
+        return min(max(latency_ms * TIMEOUT_MULTIPLIER, TIMEOUT_MIN_MS), TIMEOUT_MAX_MS) / 1000
+
+    def hedge_delay_seconds(self) -> Optional[float]:
+        if not self.hedged or self.histogram.observed < MIN_SAMPLES:
+            return None
+        return max(self.histogram.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY_MS) / 1000
+
+    def count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            # Decayed with the same half-life as the histogram
+            if self.calls >= 2 * HISTOGRAM_HALF_LIFE:
+                self.calls /= 2
+                self.hedges /= 2
+
+    def take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > HEDGE_MAX_RATIO * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_delay = self.hedge_delay_seconds()
+        return {
+            'p50_ms': self.histogram.percentile(0.5),
+            'p99_ms': self.histogram.percentile(0.99),
+            'samples': self.histogram.observed,
+            'timeout_ms': round(self.timeout_seconds() * 1000, 1),
+            'hedge_delay_ms': round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+            'hedges': round(self.hedges, 1),
+            'circuit': self.breaker.state
+        }
+
+def read_body(fn: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Wrap a get_object-style call to read its streaming body before returning.
+    """
+    @functools.wraps(fn)
+    def call(*args, **kwargs) -> Dict[str, Any]:
+        response = fn(*args, **kwargs)
+        response['Body'] = io.BytesIO(response['Body'].read())
+        return response
+    return call
+
+class ResilienceLayer:
+    """
+    Runs AWS calls with an adaptive timeout, optional hedging and a circuit breaker per operation.
+
+    Every attempt runs on a shared executor, so the caller stops waiting at
+    the timeout (the attempt itself finishes in the background, bounded by
+    botocore's own timeouts) and a hedge can race the first attempt.
+
+    The shared rate limit token is taken before the timeout starts, so a wait
+    for it neither times the call out nor enters the latency the timeout and
+    hedge delay are learned from. A hedge only goes out when a token is free.
+    """
+
+    def __init__(self, hedged_operations: str = HEDGED_OPERATIONS, workers: int = RESILIENCE_WORKERS):
+        self.hedged_operations = {api.strip() for api in hedged_operations.split(',') if api.strip()}
+        self.executor = ContextThreadPoolExecutor(max_workers=workers, thread_name_prefix='aws-call')
+        self.policies: Dict[str, OperationPolicy] = {}
+        self._lock = threading.Lock()
+
+    def policy(self, api: str) -> OperationPolicy:
+        policy = self.policies.get(api)
+        if policy is None:
+            with self._lock:
+                if api not in self.policies:
+                    self.policies[api] = OperationPolicy(api, api in self.hedged_operations)
+                policy = self.policies[api]
+        return policy
+
+    def _submit(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Future:
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def _take_hedge_token(self, client: Any, api: str) -> bool:
+        # A hedge that would wait for a token cannot beat the attempt it races
+        try:
+            rate_limiter.acquire_for_call(client, api, max_wait=0)
+        except RateLimitExceeded:
+            return False
+        return True
+
+    def call(self, api: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call an AWS operation through the operation's policy.
+
+        Args:
+            api: "service.operation", e.g. "rekognition.compare_faces"
+            fn: Bound client method
+            *args, **kwargs: Arguments passed to fn
+
+        Returns:
+            Result of the first attempt to succeed
+
+        Raises:
+            CircuitOpenError: If the operation's breaker is open
+            CallTimeoutError: If no attempt answered within the timeout
+            RateLimitExceeded: If no rate limit token was available in time
+            Exception: The error of the first attempt, when every attempt failed
+        """
+        policy = self.policy(api)
+        try:
+            policy.breaker.before_call()
+        except CircuitOpenError:
+            metrics.record('circuit_rejections', 1, 'Count')
+            raise
+
+        client = getattr(fn, '__self__', None)
+        try:
+            rate_limiter.acquire_for_call(client, api)
+        except RateLimitExceeded:
+            # Our own limit, not the dependency's answer
+            policy.breaker.on_unrelated_error()
+            raise
+
+        if api in BUFFERED_OPERATIONS:
+            fn = read_body(fn)
+        fn = rate_limiter.prepaid(fn)
+        policy.count_call()
+        timeout = policy.timeout_seconds()
+        hedge_delay = policy.hedge_delay_seconds()
+        started_at = time.monotonic()
+        deadline = started_at + timeout
+
+        primary = self._submit(fn, args, kwargs)
+        pending = {primary}
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and policy.take_hedge() and self._take_hedge_token(client, api):
+                metrics.record('hedged_calls', 1, 'Count')
+                pending.add(self._submit(fn, args, kwargs))
+
+        first_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for attempt in done:
+                error = attempt.exception()
+                if error is None:
+                    # The latency the caller saw: a stalled attempt that lost to its hedge
+                    # does not count, nor does a fast rejection
+                    policy.histogram.record((time.monotonic() - started_at) * 1000)
+                    policy.breaker.on_success()
+                    if attempt is not primary:
+                        metrics.record('hedge_wins', 1, 'Count')
+                    return attempt.result()
+                first_error = first_error or error
+
+        if pending:
+            policy.breaker.on_failure()
+            metrics.record('call_timeouts', 1, 'Count')
+            logger.warning(f"Timed out calling {api} after {timeout * 1000:.0f} ms")
+            raise CallTimeoutError(api, timeout)
+
+        if is_dependency_failure(first_error):
+            policy.breaker.on_failure()
+        elif isinstance(first_error, ClientError):
+            # The service answered, so it is up
+            policy.breaker.on_success()
+        else:
+            policy.breaker.on_unrelated_error()
+        raise first_error
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            policies = dict(self.policies)
+        return {api: policy.stats() for api, policy in sorted(policies.items())}
+
+class ResilientClient:
+    """
+    Client proxy sending every API call through a ResilienceLayer.
+
+    Wraps a LazyClient, so clients registered later (e.g. stubs) are used.
+    """
+
+    def __init__(self, service_name: str, client: Any, layer: ResilienceLayer):
+        self._service_name = service_name
+        self._client = client
+        self._layer = layer
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._client, name)
+        if name in PASSTHROUGH_ATTRIBUTES or name.startswith('_') or not callable(attribute):
+            return attribute
+        return functools.partial(self._layer.call, f"{self._service_name}.{name}", attribute)
+
+    def __repr__(self) -> str:
+        return f"ResilientClient({self._service_name!r})"
+
+def build_resilience_layer() -> Optional[ResilienceLayer]:
+    """
+    Build the resilience layer from the environment configuration.
+
+    Returns:
+        ResilienceLayer, or None when KYC_RESILIENCE is disabled
+    """
+    return ResilienceLayer() if RESILIENCE_ENABLED else None
+
+# Module-level layer shared by every wrapped client in the process
+resilience_layer = build_resilience_layer()
+
+def resilient_client(service_name: str) -> Any:
+    """
+    Get a lazily built handle on the shared client for a service, wrapped by the resilience layer.
+
+    Args:
+        service_name: boto3 service name, e.g. "rekognition"
+
+    Returns:
+        ResilientClient, or the plain LazyClient when the layer is disabled
+    """
+    client = lazy_client(service_name)
+    return ResilientClient(service_name, client, resilience_layer) if resilience_layer is not None else client
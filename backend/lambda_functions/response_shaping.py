@@ -0,0 +1,158 @@
+import os
+import logging
+from typing import Dict, Any, Callable, List, Optional
+
+import json_codec
+from instrumentation import metrics
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Detail levels of face comparison and liveness results, least to most:
+# - verdict: the decision and what the next step needs
+# - summary: plus each face's similarity, box and confidence, and image references
+# - full: the Rekognition structures as returned (landmarks, pose, quality, image bytes)
+VERBOSITY_LEVELS = ['verdict', 'summary', 'full']
+
+# Level used when a request does not ask for one; the orchestrator's calls to
+# face_comparison and liveness_session_manager use it too
+RESPONSE_VERBOSITY = os.environ.get('KYC_RESPONSE_VERBOSITY', 'summary')
+
+# Encoded size above which a response is shaped at the next lower level, well
+# under the 6 MB synchronous invoke limit and the 256 KB asynchronous one
+RESPONSE_MAX_BYTES = int(os.environ.get('KYC_RESPONSE_MAX_BYTES', str(256 * 1024)))
+
+# Keys of a Rekognition face kept in summary responses
+SUMMARY_FACE_KEYS = ['BoundingBox', 'Confidence']
+
+class InvalidVerbosityError(ValueError):
+    """
+    Raised when a request asks for a verbosity that is not in VERBOSITY_LEVELS.
+    """
+
+def get_verbosity(event: Dict[str, Any]) -> str:
+    """
+    Read the verbosity a request asks for.
+
+    Args:
+        event: Handler event, optionally with "verbosity"
+
+    Returns:
+        One of VERBOSITY_LEVELS
+
+    Raises:
+        InvalidVerbosityError: If the requested level is unknown
+    """
+    verbosity = event.get('verbosity') or RESPONSE_VERBOSITY
+    if verbosity not in VERBOSITY_LEVELS:
+        raise InvalidVerbosityError(f"Invalid verbosity {verbosity!r}: must be one of {', '.join(VERBOSITY_LEVELS)}")
+    return verbosity
+
+def pick(source: Optional[Dict[str, Any]], keys: List[str]) -> Dict[str, Any]:
+    return {key: source[key] for key in keys if key in (source or {})}
+
+def shape_face(face: Dict[str, Any]) -> Dict[str, Any]:
+    return pick(face, SUMMARY_FACE_KEYS)
+
+def shape_image(image: Optional[Dict[str, Any]], keys: List[str]) -> Optional[Dict[str, Any]]:
+    # A reference by S3 location, never the image bytes
+    return pick(image, keys) if image is not None else None
+
+def shape_comparison_result(comparison_result: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """
+    Shape a compare_faces result from face_comparison.
+
+    Args:
+        comparison_result: Result with is_match, similarity_score, face_matches and unmatched_faces
+        verbosity: One of VERBOSITY_LEVELS
+
+    Returns:
+        Result at the given level
+    """
+    if verbosity == 'full':
+        return comparison_result
+    if verbosity == 'verdict':
+        return pick(comparison_result, ['is_match', 'similarity_score'])
+    return dict(
+        comparison_result,
+        face_matches=[
+            {'Similarity': match.get('Similarity'), 'Face': shape_face(match.get('Face') or {})}
+            for match in comparison_result.get('face_matches') or []
+        ],
+        unmatched_faces=[shape_face(face) for face in comparison_result.get('unmatched_faces') or []]
+    )
+
+def shape_face_comparison_response(body: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """
+    Shape a face_comparison response body.
+
+    Args:
+        body: Response body of face_comparison.process_event
+        verbosity: One of VERBOSITY_LEVELS
+
+    Returns:
+        Body at the given level; error bodies are returned as they are
+    """
+    if verbosity == 'full' or 'face_comparison' not in body:
+        return body
+    shaped = dict(body, face_comparison=shape_comparison_result(body['face_comparison'], verbosity))
+    if verbosity == 'verdict':
+        shaped = pick(shaped, ['session_id', 'face_comparison', 'verification_passed', 'duplicate_detected', 'status'])
+    return shaped
+
+def shape_liveness_results(body: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """
+    Shape a liveness results body from build_results_response.
+
+    Every level keeps the reference image's S3 location, which face comparison reads.
+
+    Args:
+        body: Liveness results body
+        verbosity: One of VERBOSITY_LEVELS
+
+    Returns:
+        Body at the given level; error bodies are returned as they are
+    """
+    if verbosity == 'full' or 'reference_image' not in body:
+        return body
+    audit_images = body.get('audit_images') or []
+    if verbosity == 'verdict':
+        return dict(
+            pick(body, ['session_id', 'status', 'confidence']),
+            reference_image=shape_image(body['reference_image'], ['S3Object']),
+            audit_image_count=len(audit_images)
+        )
+    return dict(
+        body,
+        reference_image=shape_image(body['reference_image'], ['S3Object', 'BoundingBox']),
+        audit_images=[shape_image(image, ['S3Object', 'BoundingBox']) for image in audit_images]
+    )
+
+def fit_response(body: Dict[str, Any], shaper: Callable[[Dict[str, Any], str], Dict[str, Any]],
+                 verbosity: str) -> Dict[str, Any]:
+    """
+    Shape a response body at the requested level, lowering it until the body fits in RESPONSE_MAX_BYTES.
+
+    A body shaped below the requested level says so in "verbosity" and
+    "requested_verbosity".
+
+    Args:
+        body: Response body with full detail
+        shaper: Function shaping the body at a level, e.g. shape_face_comparison_response
+        verbosity: Requested level
+
+    Returns:
+        Shaped body
+    """
+    levels = VERBOSITY_LEVELS[:VERBOSITY_LEVELS.index(verbosity) + 1]
+    for level in reversed(levels):
+        shaped = shaper(body, level)
+        size = len(json_codec.dumps_bytes(shaped))
+        if size <= RESPONSE_MAX_BYTES:
+            break
+        logger.warning(f"Response of {size} bytes at verbosity {level} exceeds {RESPONSE_MAX_BYTES} bytes")
+    if level != verbosity:
+        metrics.record('response_reduced', 1, 'Count')
+        shaped = dict(shaped, verbosity=level, requested_verbosity=verbosity)
+    return shaped
@@ -0,0 +1,301 @@
+import json
+import os
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+from botocore.exceptions import ClientError
+
+from aws_clients import is_missing_object, lazy_client
+from shared_redis import get_redis
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cache configuration
+CACHE_ENABLED = os.environ.get('KYC_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_TTL_SECONDS = int(os.environ.get('KYC_CACHE_TTL_SECONDS', '3600'))
+CACHE_MAX_ENTRIES = int(os.environ.get('KYC_CACHE_MAX_ENTRIES', '256'))
+CACHE_MAX_BYTES = int(os.environ.get('KYC_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Persistent tier: "none", "s3", "file" or "redis"
+PERSISTENT_TIER = os.environ.get('KYC_CACHE_PERSISTENT_TIER', 'none')
+CACHE_S3_BUCKET = os.environ.get('KYC_CACHE_S3_BUCKET', 'your-kyc-bucket')
+CACHE_S3_PREFIX = os.environ.get('KYC_CACHE_S3_PREFIX', 'result-cache')
+CACHE_DIR = os.environ.get('KYC_CACHE_DIR', '/tmp/kyc-result-cache')
+CACHE_REDIS_PREFIX = os.environ.get('KYC_CACHE_REDIS_PREFIX', 'kyc:cache')
+CACHE_DIR_MAX_BYTES = int(os.environ.get('KYC_CACHE_DIR_MAX_BYTES', str(256 * 1024 * 1024)))
+
+def hash_image(image_bytes: bytes) -> str:
+    """
+    Content hash used as the cache key for an image.
+
+    Args:
+        image_bytes: Decoded image bytes
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+class MemoryCacheTier:
+    """
+    LRU cache held in module state, so it survives warm Lambda invocations.
+
+    Entries are evicted when they expire, when there are more than max_entries,
+    or when the serialized values exceed max_bytes in total.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        size = len(json.dumps(value))
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, time.time() + self.ttl_seconds)
+            self.total_bytes += size
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+class LocalFileCacheTier:
+    """
+    Persistent tier storing one JSON file per key in a local directory.
+
+    Stands in for the S3 tier in tests; on Lambda it persists in /tmp for the
+    lifetime of the execution environment.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_DIR_MAX_BYTES,
+                 ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key)) as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, key: str, value: Any) -> None:
+        entry = {'expires_at': time.time() + self.ttl_seconds, 'value': value}
+        with self._lock:
+            with open(self._path(key), 'w') as cache_file:
+                json.dump(entry, cache_file)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Drop expired files first, then the least recently written until under max_bytes
+        files = []
+        total_bytes = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            if stat.st_mtime + self.ttl_seconds < now:
+                os.remove(path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+
+class S3CacheTier:
+    """
+    Persistent tier storing one JSON object per key in S3.
+
+    Expiry is checked on read; pair the prefix with an S3 lifecycle rule so
+    expired objects are also removed from the bucket.
+    """
+
+    def __init__(self, bucket: str = CACHE_S3_BUCKET, prefix: str = CACHE_S3_PREFIX,
+                 ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.s3_client = lazy_client('s3')
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}.json")
+        except ClientError as e:
+            # A missing key reads as 403 without s3:ListBucket; either way it is a miss
+            if is_missing_object(e):
+                return None
+            raise
+        entry = json.loads(response['Body'].read())
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, key: str, value: Any) -> None:
+        entry = {'expires_at': time.time() + self.ttl_seconds, 'value': value}
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}/{key}.json",
+            Body=json.dumps(entry),
+            ContentType='application/json'
+        )
+
+class RedisCacheTier:
+    """
+    Persistent tier in the shared Redis, so every instance reuses results computed by any other.
+
+    Redis expires entries itself; without KYC_REDIS_URL this is the
+    in-process LocalRedis and behaves like a second memory tier.
+    """
+
+    def __init__(self, ttl_seconds: int = CACHE_TTL_SECONDS, redis_client: Any = None):
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client if redis_client is not None else get_redis()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.redis_client.get(f"{CACHE_REDIS_PREFIX}:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.redis_client.set(f"{CACHE_REDIS_PREFIX}:{key}", json.dumps(value), ex=self.ttl_seconds)
+
+# Persistent tier name -> factory; additional backends can be registered here
+PERSISTENT_TIERS = {
+    's3': S3CacheTier,
+    'file': LocalFileCacheTier,
+    'redis': RedisCacheTier
+}
+
+class ResultCache:
+    """
+    Two-tier cache for AWS API results keyed by namespace and image hash.
+
+    Lookups try the in-memory tier, then the persistent tier (promoting hits
+    into memory). Hit and miss counts are kept per tier.
+    """
+
+    def __init__(self, memory_tier: MemoryCacheTier, persistent_tier: Optional[Any] = None):
+        self.memory_tier = memory_tier
+        self.persistent_tier = persistent_tier
+        self.counters = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def get(self, namespace: str, image_hash: str) -> Optional[Any]:
+        key = f"{namespace}-{image_hash}"
+
+        value = self.memory_tier.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        if self.persistent_tier is not None:
+            try:
+                value = self.persistent_tier.get(key)
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"Error reading persistent cache for {key}: {str(e)}")
+                value = None
+            if value is not None:
+                self._count('persistent_hits')
+                self.memory_tier.set(key, value)
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, namespace: str, image_hash: str, value: Any) -> None:
+        key = f"{namespace}-{image_hash}"
+        self.memory_tier.set(key, value)
+
+        if self.persistent_tier is not None:
+            try:
+                self.persistent_tier.set(key, value)
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"Error writing persistent cache for {key}: {str(e)}")
+
+    def get_or_compute(self, namespace: str, image_hash: Optional[str], compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for an image, computing and storing it on a miss.
+
+        Args:
+            namespace: Result type, e.g. the AWS operation name
+            image_hash: Content hash of the image, or None to bypass the cache
+            compute: Function producing the result on a miss
+
+        Returns:
+            Cached or freshly computed result
+        """
+        if not CACHE_ENABLED or image_hash is None:
+            return compute()
+
+        value = self.get(namespace, image_hash)
+        if value is not None:
+            logger.info(f"Cache hit for {namespace} {image_hash[:12]}")
+            return value
+
+        value = compute()
+        self.set(namespace, image_hash, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters, memory_entries=len(self.memory_tier.entries))
+
+def build_result_cache() -> ResultCache:
+    """
+    Build the result cache from the environment configuration.
+
+    Returns:
+        ResultCache with an in-memory tier and the configured persistent tier
+    """
+    persistent_tier = None
+    tier_factory = PERSISTENT_TIERS.get(PERSISTENT_TIER)
+    if tier_factory is not None:
+        persistent_tier = tier_factory()
+    return ResultCache(MemoryCacheTier(), persistent_tier)
+
+# Module-level cache shared by every handler in the execution environment
+result_cache = build_result_cache()
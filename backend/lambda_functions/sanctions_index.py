@@ -0,0 +1,765 @@
+import os
+import re
+import json
+import time
+import zlib
+import shutil
+import threading
+import logging
+import unicodedata
+from array import array
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+from instrumentation import metrics
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Snapshot directory written by build_snapshot, e.g. shipped in a Lambda layer or on EFS
+SANCTIONS_INDEX_PATH = os.environ.get('SANCTIONS_INDEX_PATH', '/opt/sanctions-index')
+
+# Append-only JSONL of list changes applied on top of the snapshot (optional)
+SANCTIONS_UPDATES_PATH = os.environ.get('SANCTIONS_UPDATES_PATH', '')
+
+# How often the updates file is checked for new lines
+SANCTIONS_REFRESH_SECONDS = float(os.environ.get('SANCTIONS_REFRESH_SECONDS', '60'))
+
+# Jaro-Winkler similarity (0-1) at which a listed name counts as a match
+SANCTIONS_MATCH_THRESHOLD = float(os.environ.get('SANCTIONS_MATCH_THRESHOLD', '0.9'))
+SANCTIONS_MAX_RESULTS = int(os.environ.get('SANCTIONS_MAX_RESULTS', '10'))
+
+# Names scored per query, those sharing the most blocking keys with it
+SANCTIONS_MAX_CANDIDATES = int(os.environ.get('SANCTIONS_MAX_CANDIDATES', '1000'))
+
+# Row ids read from posting lists per query; the rarest keys are read first
+SANCTIONS_MAX_POSTINGS = int(os.environ.get('SANCTIONS_MAX_POSTINGS', '100000'))
+
+# Best candidates by shared keys that are also compared on their common tokens
+SANCTIONS_PARTIAL_CANDIDATES = int(os.environ.get('SANCTIONS_PARTIAL_CANDIDATES', '50'))
+
+# Birth years further apart than this rule a name match out
+SANCTIONS_BIRTH_YEAR_TOLERANCE = int(os.environ.get('SANCTIONS_BIRTH_YEAR_TOLERANCE', '1'))
+
+# Characters of a normalized name that are stored and compared
+NAME_WIDTH = 48
+
+# Jaro-Winkler prefix bonus: up to 4 leading characters, applied above a Jaro of 0.7
+WINKLER_PREFIX = 4
+WINKLER_SCALING = 0.1
+WINKLER_BOOST_THRESHOLD = 0.7
+
+# Similarity at which two tokens count as the same name in partial matching
+TOKEN_MATCH_THRESHOLD = 0.88
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_ARRAYS = [
+    'names', 'name_lengths', 'row_entities', 'birth_years', 'entity_id_hashes',
+    'entity_offsets', 'entity_blob', 'keys', 'key_offsets', 'postings'
+]
+
+# Letter -> Soundex digit; vowels, H, W and Y have none
+SOUNDEX_DIGITS = {
+    letter: digit
+    for letters, digit in (('BFPV', '1'), ('CGJKQSXZ', '2'), ('DT', '3'), ('L', '4'), ('MN', '5'), ('R', '6'))
+    for letter in letters
+}
+
+NON_LETTERS = re.compile(r'[^A-Z]+')
+FOUR_DIGIT_YEAR = re.compile(r'(?<!\d)(19\d{2}|20\d{2})(?!\d)')
+TWO_DIGITS = re.compile(r'(?<!\d)(\d{2})(?!\d)')
+
+# Imported on first use, so modules importing this one without an index never load it
+np = None
+
+def load_numpy() -> Any:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+def normalize_tokens(name: str) -> List[str]:
+    """
+    Split a name into upper-case ASCII tokens in sorted order.
+
+    Accents are stripped and apostrophes dropped (O'Brien -> OBRIEN). Sorting
+    makes "ORINA TOLULOPE" and "Tolulope Orina" compare equal, since lists and
+    documents order given names and surnames differently. Names in non-Latin
+    scripts normalize to nothing; lists carry Latin transliterations for them.
+    """
+    ascii_name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.upper().replace("'", '').replace('`', '')
+    return sorted(NON_LETTERS.sub(' ', ascii_name).split())
+
+def soundex(token: str) -> str:
+    """
+    American Soundex code of a token, e.g. MOHAMMED and MUHAMAD both give M530.
+    """
+    code = token[0]
+    previous = SOUNDEX_DIGITS.get(token[0], '')
+    for letter in token[1:]:
+        digit = SOUNDEX_DIGITS.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+def hash_key(key: str) -> int:
+    return zlib.crc32(key.encode('utf-8'))
+
+def token_signature(token: str) -> Set[str]:
+    padded = f"^{token}$"
+    return {padded[start:start + 3] for start in range(len(padded) - 2)} | {f"#{soundex(token)}"}
+
+def blocking_keys(tokens: List[str]) -> List[int]:
+    """
+    Hashed blocking keys of a name: the trigrams of each token and its Soundex code.
+
+    Trigrams find names with typos and transliteration variants; Soundex finds
+    spellings that sound alike but share few trigrams. Hash collisions only
+    add candidates, which scoring then rejects.
+    """
+    return sorted({hash_key(key) for token in tokens for key in token_signature(token)})
+
+def encode_name(tokens: List[str]) -> bytes:
+    return ' '.join(tokens).encode('ascii')[:NAME_WIDTH]
+
+def name_matrix(encoded_names: List[bytes]) -> Tuple[Any, Any]:
+    """
+    Zero-padded (count, NAME_WIDTH) matrix and lengths of encoded names, as jaro_winkler takes them.
+    """
+    load_numpy()
+    names = np.zeros((len(encoded_names), NAME_WIDTH), dtype=np.uint8)
+    for index, encoded in enumerate(encoded_names):
+        names[index, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+    return names, np.array([len(encoded) for encoded in encoded_names], dtype=np.int64)
+
+def parse_birth_year(value: Any) -> Optional[int]:
+    """
+    Birth year from a list entry or an extracted DATE_OF_BIRTH field.
+
+    Accepts years, ISO dates and document formats such as "12 SEP /SEPT 96".
+    A two-digit year is the last two-digit group, in the past century.
+
+    Returns:
+        Year, or None when the value holds none
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    text = str(value)
+    match = FOUR_DIGIT_YEAR.search(text)
+    if match:
+        return int(match.group(1))
+    groups = TWO_DIGITS.findall(text)
+    if not groups:
+        return None
+    year = 2000 + int(groups[-1])
+    return year if year <= datetime.utcnow().year else year - 100
+
+def jaro_winkler(query: Any, names: Any, lengths: Any) -> Any:
+    """
+    Jaro-Winkler similarity of one name against many, vectorized over the names.
+
+    The usual matching loop runs once per query character, each step
+    handling every candidate name at once, so a query costs about
+    len(query) array operations instead of one Python loop per name.
+
+    Args:
+        query: Query name as a uint8 array
+        names: Candidate names as a (count, width) uint8 array, zero-padded
+        lengths: Length of each candidate name
+
+    Returns:
+        float64 array of similarities in [0, 1]
+    """
+    load_numpy()
+    count, width = names.shape
+    query_length = len(query)
+    if count == 0 or query_length == 0:
+        return np.zeros(count)
+
+    lengths = lengths.astype(np.int64)
+    window = np.maximum(np.maximum(lengths, query_length) // 2 - 1, 0)
+    positions = np.arange(width)
+    within_length = positions[None, :] < lengths[:, None]
+    rows = np.arange(count)
+
+    # Each query character takes the first unused equal character within the window
+    unused = within_length.copy()
+    query_matched = np.zeros((count, query_length), dtype=bool)
+    for index, character in enumerate(query):
+        in_window = np.abs(positions - index)[None, :] <= window[:, None]
+        allowed = unused & in_window & (names == character)
+        first = allowed.argmax(axis=1)
+        found = allowed[rows, first]
+        unused[rows[found], first[found]] = False
+        query_matched[:, index] = found
+
+    matches = query_matched.sum(axis=1)
+    name_matched = within_length & ~unused
+
+    # Matched characters of both names, in order; half the mismatches are transpositions
+    query_order = np.argsort(~query_matched, axis=1, kind='stable')
+    name_order = np.argsort(~name_matched, axis=1, kind='stable')[:, :query_length]
+    query_characters = query[query_order]
+    name_characters = np.take_along_axis(names, name_order, axis=1)
+    in_sequence = np.arange(query_characters.shape[1])[None, :] < matches[:, None]
+    transpositions = ((query_characters[:, :name_characters.shape[1]] != name_characters)
+                      & in_sequence[:, :name_characters.shape[1]]).sum(axis=1) / 2
+
+    safe_matches = np.maximum(matches, 1)
+    jaro = np.where(
+        matches > 0,
+        (matches / query_length + matches / np.maximum(lengths, 1) + (matches - transpositions) / safe_matches) / 3,
+        0.0
+    )
+
+    prefix_width = min(WINKLER_PREFIX, query_length, width)
+    prefix = np.cumprod(names[:, :prefix_width] == query[:prefix_width], axis=1).sum(axis=1)
+    return np.where(jaro > WINKLER_BOOST_THRESHOLD, jaro + prefix * WINKLER_SCALING * (1 - jaro), jaro)
+
+def partial_name_scores(tokens: List[str], encoded_names: List[bytes]) -> Any:
+    """
+    Jaro-Winkler similarity of a query and names with more or fewer tokens, over the tokens they share.
+
+    Documents often carry fewer names than the list entry, or more, which
+    whole-name scoring punishes ("ORINA TOLULOPE" against "ADEYEMI ORINA
+    TOLULOPE"). When every token of the shorter name has a counterpart in
+    the longer one (token similarity of at least TOKEN_MATCH_THRESHOLD), the
+    longer name's other tokens are dropped and the rest compared. The shorter
+    name needs at least two tokens, so a common surname alone is not a match.
+
+    Args:
+        tokens: Normalized query tokens
+        encoded_names: Candidate names from encode_name
+
+    Returns:
+        Similarity per name; 0 where the token counts are equal or the tokens do not line up
+    """
+    load_numpy()
+    scores = np.zeros(len(encoded_names))
+    name_tokens = [encoded.decode('ascii').split() for encoded in encoded_names]
+    vocabulary = sorted({token for candidate_tokens in name_tokens for token in candidate_tokens})
+    if len(tokens) < 2 or not vocabulary:
+        return scores
+
+    # Query token -> {name token: similarity} for the similar ones, one vectorized pass per query token
+    vocabulary_names, vocabulary_lengths = name_matrix([token.encode('ascii') for token in vocabulary])
+    similar: Dict[str, Dict[str, float]] = {}
+    for token in set(tokens):
+        similarities = jaro_winkler(np.frombuffer(token.encode('ascii'), dtype=np.uint8),
+                                    vocabulary_names, vocabulary_lengths)
+        similar[token] = {vocabulary[index]: similarities[index]
+                          for index in np.nonzero(similarities >= TOKEN_MATCH_THRESHOLD)[0]}
+
+    # Reduced query -> (name index, reduced name); names reducing the query alike are scored together
+    groups: Dict[bytes, List[Tuple[int, bytes]]] = {}
+    for index, candidate_tokens in enumerate(name_tokens):
+        if len(candidate_tokens) == len(tokens) or min(len(candidate_tokens), len(tokens)) < 2:
+            continue
+        query_is_shorter = len(tokens) < len(candidate_tokens)
+        shorter, longer = (tokens, candidate_tokens) if query_is_shorter else (candidate_tokens, tokens)
+
+        # Pair each token of the shorter name with its most similar unpaired token of the longer one
+        paired = set()
+        for token in shorter:
+            similarity, position = max(
+                ((similar[token].get(other, 0.0) if query_is_shorter else similar[other].get(token, 0.0), position)
+                 for position, other in enumerate(longer) if position not in paired),
+                default=(0.0, None)
+            )
+            if similarity < TOKEN_MATCH_THRESHOLD:
+                break
+            paired.add(position)
+        else:
+            kept = [longer[position] for position in sorted(paired)]
+            reduced_query, reduced_name = (tokens, kept) if query_is_shorter else (kept, candidate_tokens)
+            groups.setdefault(encode_name(reduced_query), []).append((index, encode_name(reduced_name)))
+
+    for reduced_query, reduced_names in groups.items():
+        names, lengths = name_matrix([reduced_name for _, reduced_name in reduced_names])
+        group_scores = jaro_winkler(np.frombuffer(reduced_query, dtype=np.uint8), names, lengths)
+        scores[[index for index, _ in reduced_names]] = group_scores
+    return scores
+
+def score_names(tokens: List[str], query: Any, names: Any, lengths: Any,
+                shared_keys: Any, partial_candidates: int) -> Tuple[Any, Any]:
+    """
+    Whole-name similarity of every candidate, raised to the partial-name
+    similarity for the partial_candidates sharing the most blocking keys.
+
+    Returns:
+        Tuple of (scores, whether each score came from the partial comparison)
+    """
+    scores = jaro_winkler(query, names, lengths)
+    partial = np.zeros(len(scores), dtype=bool)
+    if len(scores) == 0 or partial_candidates <= 0:
+        return scores, partial
+
+    if len(scores) > partial_candidates:
+        selected = np.argpartition(shared_keys, -partial_candidates)[-partial_candidates:]
+    else:
+        selected = np.arange(len(scores))
+    encoded_names = [bytes(names[row][:lengths[row]]) for row in selected]
+    partial_scores = partial_name_scores(tokens, encoded_names)
+    improved = partial_scores > scores[selected]
+    scores[selected[improved]] = partial_scores[improved]
+    partial[selected[improved]] = True
+    return scores, partial
+
+def entity_names(entity: Dict[str, Any]) -> List[str]:
+    return [entity.get('name') or ''] + list(entity.get('aliases') or [])
+
+def entity_birth_year(entity: Dict[str, Any]) -> Optional[int]:
+    return parse_birth_year(entity.get('birth_year', entity.get('date_of_birth')))
+
+def build_snapshot(entities: Iterable[Dict[str, Any]], path: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build an index snapshot from list entries.
+
+    Every name and alias becomes a row pointing at its entry. The snapshot is
+    a directory of .npy arrays that SanctionsIndex.load memory-maps, so
+    loading it reads no more than the manifest. It is written next to path
+    and renamed into place, so readers never see a partial snapshot.
+
+    Args:
+        entities: Entries with "entity_id", "name", and optionally "aliases",
+            "birth_year" or "date_of_birth" and "source"; other fields are
+            kept and returned with matches
+        path: Directory to create; it must not exist
+        version: List version recorded in the manifest, by default the build time
+
+    Returns:
+        The snapshot manifest
+
+    Raises:
+        FileExistsError: If path already exists
+        ValueError: If no entry has a usable name
+    """
+    load_numpy()
+    if os.path.exists(path):
+        raise FileExistsError(f"Snapshot path already exists: {path}")
+
+    build_start = time.perf_counter()
+    names = bytearray()
+    name_lengths = array('B')
+    row_entities = array('i')
+    birth_years = array('h')
+    entity_id_hashes = array('I')
+    entity_offsets = array('q', [0])
+    entity_blob = bytearray()
+    posting_keys = array('I')
+    posting_rows = array('i')
+
+    for entity in entities:
+        encoded_names = {}
+        for name in entity_names(entity):
+            tokens = normalize_tokens(name)
+            if tokens:
+                encoded_names.setdefault(encode_name(tokens), tokens)
+        if not encoded_names:
+            logger.warning(f"Skipping list entry {entity.get('entity_id')} without a usable name")
+            continue
+
+        entity_index = len(birth_years)
+        for encoded, tokens in encoded_names.items():
+            row = len(name_lengths)
+            names += encoded.ljust(NAME_WIDTH, b'\0')
+            name_lengths.append(len(encoded))
+            row_entities.append(entity_index)
+            keys = blocking_keys(tokens)
+            posting_keys.extend(keys)
+            posting_rows.extend([row] * len(keys))
+
+        birth_years.append(entity_birth_year(entity) or 0)
+        entity_id_hashes.append(hash_key(str(entity.get('entity_id'))))
+        entity_blob += json.dumps(entity, separators=(',', ':')).encode('utf-8')
+        entity_offsets.append(len(entity_blob))
+
+    if not name_lengths:
+        raise ValueError('No list entry has a usable name')
+
+    # Posting lists: row ids grouped by key, keys sorted for binary search
+    keys = np.frombuffer(posting_keys, dtype=np.uint32)
+    rows = np.frombuffer(posting_rows, dtype=np.int32)
+    order = np.lexsort((rows, keys))
+    keys, rows = keys[order], rows[order]
+    unique_keys, key_starts = np.unique(keys, return_index=True)
+
+    arrays = {
+        'names': np.frombuffer(bytes(names), dtype=np.uint8).reshape(-1, NAME_WIDTH),
+        'name_lengths': np.frombuffer(name_lengths, dtype=np.uint8),
+        'row_entities': np.frombuffer(row_entities, dtype=np.int32),
+        'birth_years': np.frombuffer(birth_years, dtype=np.int16),
+        'entity_id_hashes': np.frombuffer(entity_id_hashes, dtype=np.uint32),
+        'entity_offsets': np.frombuffer(entity_offsets, dtype=np.int64),
+        'entity_blob': np.frombuffer(bytes(entity_blob), dtype=np.uint8),
+        'keys': unique_keys,
+        'key_offsets': np.append(key_starts, len(keys)).astype(np.int64),
+        'postings': rows
+    }
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version or datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'entity_count': len(birth_years),
+        'row_count': len(name_lengths),
+        'key_count': len(unique_keys),
+        'name_width': NAME_WIDTH,
+        'build_seconds': round(time.perf_counter() - build_start, 2)
+    }
+
+    partial_path = f"{path}.partial-{os.getpid()}"
+    os.makedirs(partial_path)
+    try:
+        for name, values in arrays.items():
+            np.save(os.path.join(partial_path, f"{name}.npy"), values)
+        with open(os.path.join(partial_path, 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.rename(partial_path, path)
+    except Exception:
+        shutil.rmtree(partial_path, ignore_errors=True)
+        raise
+
+    logger.info(f"Built sanctions index snapshot at {path}: {manifest}")
+    return manifest
+
+class SanctionsIndex:
+    """
+    Name index over a watchlist, memory-mapped from a snapshot with an in-memory layer of updates.
+
+    A query is normalized, its blocking keys select candidate rows from the
+    posting lists, and only those candidates are scored with Jaro-Winkler.
+    Pages of the snapshot are read from disk as queries touch them, so a cold
+    start does not pay for loading the list.
+
+    Updates (upserts and removals of entries) are applied without rebuilding
+    the snapshot: removed entries are masked and new entries are held in
+    memory with their own posting lists. Rebuild the snapshot from
+    entities() when the updates grow large.
+    """
+
+    def __init__(self, arrays: Dict[str, Any], manifest: Dict[str, Any]):
+        load_numpy()
+        self.manifest = manifest
+        for name in SNAPSHOT_ARRAYS:
+            setattr(self, name, arrays[name])
+        self._lock = threading.Lock()
+        self.updates_identity = None
+        self.updates_offset = 0
+        self.updates_checked_at = 0.0
+        self._reset_updates()
+
+    @classmethod
+    def load(cls, path: str = SANCTIONS_INDEX_PATH) -> 'SanctionsIndex':
+        """
+        Memory-map a snapshot written by build_snapshot.
+
+        Raises:
+            FileNotFoundError: If the snapshot does not exist
+            ValueError: If the snapshot was written in another format
+        """
+        load_numpy()
+        with open(os.path.join(path, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('name_width') != NAME_WIDTH:
+            raise ValueError(f"Unsupported sanctions index snapshot at {path}: {manifest}")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in SNAPSHOT_ARRAYS}
+        logger.info(f"Loaded sanctions index {manifest['version']} with {manifest['entity_count']} entries")
+        return cls(arrays, manifest)
+
+    def _reset_updates(self) -> None:
+        self.removed = None
+        self.update_names: List[bytes] = []
+        self.update_row_entities: List[int] = []
+        self.update_entities: List[Dict[str, Any]] = []
+        self.update_live: List[bool] = []
+        self.update_postings: Dict[int, List[int]] = {}
+        self.update_ids: Dict[str, int] = {}
+        self.update_count = 0
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    def __len__(self) -> int:
+        removed = int(self.removed.sum()) if self.removed is not None else 0
+        return self.manifest['entity_count'] - removed + len(self.update_ids)
+
+    def get_entity(self, entity_index: int) -> Dict[str, Any]:
+        start, end = self.entity_offsets[entity_index], self.entity_offsets[entity_index + 1]
+        return json.loads(bytes(self.entity_blob[start:end]))
+
+    def entities(self) -> Iterator[Dict[str, Any]]:
+        """
+        Current entries with the updates applied, e.g. to build the next snapshot.
+        """
+        for entity_index in range(self.manifest['entity_count']):
+            if self.removed is None or not self.removed[entity_index]:
+                yield self.get_entity(entity_index)
+        for update_index in sorted(self.update_ids.values()):
+            yield self.update_entities[update_index]
+
+    def _remove(self, entity_id: str) -> None:
+        for entity_index in np.nonzero(self.entity_id_hashes == hash_key(entity_id))[0]:
+            if str(self.get_entity(entity_index).get('entity_id')) == entity_id:
+                if self.removed is None:
+                    self.removed = np.zeros(self.manifest['entity_count'], dtype=bool)
+                self.removed[entity_index] = True
+        update_index = self.update_ids.pop(entity_id, None)
+        if update_index is not None:
+            self.update_live[update_index] = False
+
+    def apply_update(self, update: Dict[str, Any]) -> None:
+        """
+        Apply one list change.
+
+        Args:
+            update: {"op": "upsert", "entity": {...}} to add or replace an
+                entry, or {"op": "remove", "entity_id": "..."}
+        """
+        operation = update.get('op')
+        entity = update.get('entity') or {}
+        entity_id = str(update.get('entity_id') or entity.get('entity_id'))
+        if operation not in ('upsert', 'remove'):
+            raise ValueError(f"Invalid sanctions list update: {operation}")
+
+        with self._lock:
+            self._remove(entity_id)
+            if operation == 'upsert':
+                update_index = len(self.update_entities)
+                self.update_entities.append(entity)
+                self.update_live.append(True)
+                self.update_ids[entity_id] = update_index
+                for name in entity_names(entity):
+                    tokens = normalize_tokens(name)
+                    if not tokens:
+                        continue
+                    row = len(self.update_names)
+                    self.update_names.append(encode_name(tokens))
+                    self.update_row_entities.append(update_index)
+                    for key in blocking_keys(tokens):
+                        self.update_postings.setdefault(key, []).append(row)
+            self.update_count += 1
+
+    def refresh_updates(self, path: str = SANCTIONS_UPDATES_PATH, force: bool = False) -> int:
+        """
+        Apply the lines appended to the updates file since the last refresh.
+
+        The file is checked at most every SANCTIONS_REFRESH_SECONDS. When it is
+        replaced or truncated, the updates are re-applied from its start.
+
+        Returns:
+            Number of updates applied
+        """
+        now = time.monotonic()
+        if not path or (not force and now - self.updates_checked_at < SANCTIONS_REFRESH_SECONDS):
+            return 0
+        self.updates_checked_at = now
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 0
+
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self.updates_identity or stat.st_size < self.updates_offset:
+            with self._lock:
+                self._reset_updates()
+            self.updates_identity = identity
+            self.updates_offset = 0
+        if stat.st_size == self.updates_offset:
+            return 0
+
+        with open(path, 'rb') as updates_file:
+            updates_file.seek(self.updates_offset)
+            data = updates_file.read(stat.st_size - self.updates_offset)
+
+        # A line still being written is picked up by the next refresh
+        complete = data[:data.rfind(b'\n') + 1]
+        applied = 0
+        for line in complete.splitlines():
+            if line.strip():
+                self.apply_update(json.loads(line))
+                applied += 1
+        self.updates_offset += len(complete)
+        logger.info(f"Applied {applied} sanctions list updates from {path}")
+        return applied
+
+    def _candidate_rows(self, keys: Any, max_candidates: int) -> Tuple[Any, Any]:
+        positions = np.searchsorted(self.keys, keys)
+        in_range = positions < len(self.keys)
+        positions = positions[in_range]
+        positions = positions[self.keys[positions] == keys[in_range]]
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+        starts = self.key_offsets[positions]
+        sizes = self.key_offsets[positions + 1] - starts
+        order = np.argsort(sizes, kind='stable')
+        # The rarest keys are the most selective; common ones are read while the budget lasts
+        within_budget = np.cumsum(sizes[order]) <= SANCTIONS_MAX_POSTINGS
+        within_budget[0] = True
+        selected = order[within_budget]
+        postings = np.concatenate([self.postings[starts[index]:starts[index] + sizes[index]] for index in selected])
+
+        rows, shared_keys = np.unique(postings, return_counts=True)
+        if self.removed is not None:
+            kept = ~self.removed[self.row_entities[rows]]
+            rows, shared_keys = rows[kept], shared_keys[kept]
+        if len(rows) > max_candidates:
+            top = np.argpartition(shared_keys, -max_candidates)[-max_candidates:]
+            rows, shared_keys = rows[top], shared_keys[top]
+        return rows, shared_keys
+
+    def screen(self, name: str, birth_year: Optional[int] = None,
+               threshold: float = SANCTIONS_MATCH_THRESHOLD, max_results: int = SANCTIONS_MAX_RESULTS,
+               max_candidates: int = SANCTIONS_MAX_CANDIDATES) -> List[Dict[str, Any]]:
+        """
+        Find listed entries whose name or alias matches a name.
+
+        Args:
+            name: Name to screen, in any order of given names and surname
+            birth_year: Birth year of the person, compared when the entry has one
+            threshold: Minimum Jaro-Winkler similarity, 0-1
+            max_results: Largest number of entries returned
+            max_candidates: Names scored from the snapshot
+
+        Returns:
+            Entries ordered by descending score, each with the best-matching
+            'matched_name', its 'score', 'match_type' ("full", or "partial"
+            when only the tokens both names share were compared) and
+            'dob_match' (None when either birth year is unknown)
+        """
+        screen_start = time.perf_counter()
+        tokens = normalize_tokens(name)
+        if not tokens:
+            return []
+        query = np.frombuffer(encode_name(tokens), dtype=np.uint8)
+        keys = np.asarray(blocking_keys(tokens), dtype=np.uint32)
+
+        rows, shared_keys = self._candidate_rows(keys, max_candidates)
+        scores, partial = score_names(tokens, query, self.names[rows], self.name_lengths[rows].astype(np.int64),
+                                      shared_keys, SANCTIONS_PARTIAL_CANDIDATES)
+
+        # Entry -> (score, matched name, partial); aliases of one entry count once
+        best: Dict[Tuple[str, int], Tuple[float, bytes, bool]] = {}
+        for position in np.nonzero(scores >= threshold)[0]:
+            row = rows[position]
+            entity_key = ('list', int(self.row_entities[row]))
+            if scores[position] > best.get(entity_key, (0.0,))[0]:
+                matched_name = bytes(self.names[row][:self.name_lengths[row]])
+                best[entity_key] = (float(scores[position]), matched_name, bool(partial[position]))
+
+        with self._lock:
+            update_keys: Dict[int, int] = {}
+            for key in keys.tolist():
+                for row in self.update_postings.get(key, []):
+                    if self.update_live[self.update_row_entities[row]]:
+                        update_keys[row] = update_keys.get(row, 0) + 1
+            update_rows = sorted(update_keys)
+            update_names = [self.update_names[row] for row in update_rows]
+            update_row_entities = [self.update_row_entities[row] for row in update_rows]
+        if update_rows:
+            names, lengths = name_matrix(update_names)
+            update_scores, update_partial = score_names(
+                tokens, query, names, lengths, np.array([update_keys[row] for row in update_rows]),
+                SANCTIONS_PARTIAL_CANDIDATES
+            )
+            for update_index, encoded, score, is_partial in zip(update_row_entities, update_names,
+                                                                update_scores, update_partial):
+                entity_key = ('update', update_index)
+                if score >= threshold and score > best.get(entity_key, (0.0,))[0]:
+                    best[entity_key] = (float(score), encoded, bool(is_partial))
+
+        matches = []
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])[:max_results]
+        for (origin, index), (score, matched_name, is_partial) in ranked:
+            if origin == 'list':
+                entity = self.get_entity(index)
+                listed_year = int(self.birth_years[index]) or None
+            else:
+                entity = self.update_entities[index]
+                listed_year = entity_birth_year(entity)
+            matches.append({
+                'entity_id': entity.get('entity_id'),
+                'name': entity.get('name'),
+                'matched_name': matched_name.decode('ascii'),
+                'source': entity.get('source'),
+                'score': round(score, 4),
+                'match_type': 'partial' if is_partial else 'full',
+                'listed_birth_year': listed_year,
+                'dob_match': None if not (birth_year and listed_year)
+                else abs(birth_year - listed_year) <= SANCTIONS_BIRTH_YEAR_TOLERANCE
+            })
+
+        metrics.record('sanctions_screen_ms', (time.perf_counter() - screen_start) * 1000)
+        metrics.record('sanctions_candidates', len(rows) + len(update_rows), 'Count')
+        return matches
+
+def build_sanctions_index(path: str = SANCTIONS_INDEX_PATH) -> Optional[SanctionsIndex]:
+    """
+    Load the sanctions index configured by SANCTIONS_INDEX_PATH.
+
+    Returns:
+        The index, or None when no snapshot is deployed or it cannot be read
+    """
+    if not os.path.exists(os.path.join(path, 'manifest.json')):
+        logger.info(f"No sanctions index snapshot at {path}; screening is unavailable")
+        return None
+    try:
+        return SanctionsIndex.load(path)
+    except Exception as e:
+        logger.error(f"Error loading sanctions index from {path}: {str(e)}")
+        return None
+
+# Module-level index shared across warm invocations
+sanctions_index = build_sanctions_index()
+
+def screen_identity(full_name: str, date_of_birth: Any = None,
+                    threshold: float = SANCTIONS_MATCH_THRESHOLD) -> Dict[str, Any]:
+    """
+    Screen a person against the watchlist.
+
+    A name match whose listed birth year contradicts the person's is reported
+    but is not a hit.
+
+    Args:
+        full_name: Name to screen
+        date_of_birth: Birth date or year in any format parse_birth_year accepts
+        threshold: Minimum Jaro-Winkler similarity, 0-1
+
+    Returns:
+        Dict with "sanctions_status" ("HIT", "CLEAR", or "PENDING" when no
+        index is available), the "matches" and the "list_version"
+    """
+    if sanctions_index is None:
+        return {
+            'sanctions_status': 'PENDING',
+            'reason': 'Sanctions index unavailable',
+            'matches': [],
+            'list_version': None
+        }
+
+    try:
+        sanctions_index.refresh_updates()
+    except Exception as e:
+        # Screening continues against the snapshot and the updates applied so far
+        logger.warning(f"Error applying sanctions list updates: {str(e)}")
+
+    birth_year = parse_birth_year(date_of_birth)
+    matches = sanctions_index.screen(full_name, birth_year, threshold)
+    return {
+        'sanctions_status': 'HIT' if any(match['dob_match'] is not False for match in matches) else 'CLEAR',
+        'matches': matches,
+        'birth_year': birth_year,
+        'list_version': sanctions_index.version,
+        'list_updates': sanctions_index.update_count
+    }
@@ -0,0 +1,98 @@
+import time
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from cors_helper import create_response
+import sanctions_index
+from instrumentation import instrument_handler
+from warmup import is_warm_event, warm
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Deferred imports a warmer event prepares; the snapshot itself is mapped at import
+WARM_IMPORTS = ['numpy']
+
+# Textract analyze_id fields joined into the screened name, in order
+NAME_FIELDS = ['FIRST_NAME', 'MIDDLE_NAME', 'LAST_NAME']
+
+def get_screened_name(extracted_fields: Dict[str, Any]) -> Optional[str]:
+    """
+    Join the name fields Textract extracted from the document.
+
+    Args:
+        extracted_fields: "extracted_fields" of a document_processor result
+
+    Returns:
+        Full name, or None when the document has no name fields
+    """
+    parts = [str(extracted_fields.get(field) or '').strip() for field in NAME_FIELDS]
+    full_name = ' '.join(part for part in parts if part)
+    return full_name or None
+
+def process_event(event: Dict[str, Any], context: Any) -> Tuple[int, Dict[str, Any]]:
+    """
+    Process a sanctions screening event and return the status code and response body.
+
+    Shared by lambda_handler and in-process callers so the body stays a native dict.
+
+    Expected event structure:
+    {
+        "session_id": "unique-session-id",
+        "extracted_fields": {"FIRST_NAME": "...", "LAST_NAME": "...", "DATE_OF_BIRTH": "..."},
+        "full_name": "First Last" (instead of extracted_fields),
+        "date_of_birth": "1990-01-31" (optional with full_name),
+        "match_threshold": 0.9 (optional)
+    }
+
+    Returns:
+        Tuple of (status_code, response_body)
+    """
+    try:
+        if is_warm_event(event):
+            return 200, warm([], WARM_IMPORTS)
+
+        # Parse input
+        session_id = event.get('session_id')
+        extracted_fields = event.get('extracted_fields') or {}
+        full_name = event.get('full_name') or get_screened_name(extracted_fields)
+        date_of_birth = event.get('date_of_birth') or extracted_fields.get('DATE_OF_BIRTH')
+        match_threshold = float(event.get('match_threshold', sanctions_index.SANCTIONS_MATCH_THRESHOLD))
+
+        if not full_name:
+            return 400, {
+                'error': 'Missing required parameter: full_name or extracted_fields with a name',
+                'session_id': session_id
+            }
+
+        screen_start = time.perf_counter()
+        screening = sanctions_index.screen_identity(full_name, date_of_birth, match_threshold)
+
+        if screening['sanctions_status'] == 'HIT':
+            logger.info(f"Sanctions hit for session {session_id}: "
+                        f"{[match['entity_id'] for match in screening['matches']]}")
+
+        return 200, dict(
+            screening,
+            session_id=session_id,
+            screened_name=full_name,
+            screen_ms=round((time.perf_counter() - screen_start) * 1000, 2),
+            screened_at=int(time.time()),
+            status='SCREENED'
+        )
+
+    except Exception as e:
+        logger.error(f"Error in sanctions screening: {str(e)}")
+        return 500, {
+            'error': 'Internal server error',
+            'message': str(e)
+        }
+
+@instrument_handler('sanctions-screening')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Main Lambda handler for sanctions screening.
+    """
+    status_code, response_body = process_event(event, context)
+    return create_response(status_code, response_body)
@@ -0,0 +1,211 @@
+import json
+import os
+import time
+import sqlite3
+import threading
+import logging
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+from aws_clients import build_client_config
+from instrumentation import instrument_client
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Session store backend: "none", "dynamodb" or "sqlite"
+SESSION_STORE = os.environ.get('KYC_SESSION_STORE', 'none')
+SESSION_TABLE = os.environ.get('KYC_SESSION_TABLE', 'kyc-sessions')
+SESSION_SQLITE_PATH = os.environ.get('KYC_SESSION_SQLITE_PATH', ':memory:')
+
+# Sessions expire through the DynamoDB TTL attribute "expires_at"
+SESSION_TTL_SECONDS = int(os.environ.get('KYC_SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
+
+def to_dynamodb(value: Any) -> Any:
+    """
+    Convert floats to Decimal, which is the only number type DynamoDB accepts.
+    """
+    return json.loads(json.dumps(value), parse_float=Decimal)
+
+def from_dynamodb(value: Any) -> Any:
+    """
+    Convert DynamoDB Decimals back to int or float.
+    """
+    if isinstance(value, dict):
+        return {key: from_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_dynamodb(item) for item in value]
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+def build_step_entry(result: Dict[str, Any], duration_ms: float, fingerprint: Optional[str]) -> Dict[str, Any]:
+    return {
+        'result': result,
+        'duration_ms': round(duration_ms, 2),
+        'fingerprint': fingerprint,
+        'recorded_at': int(time.time())
+    }
+
+def get_step_timings(session: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Collect the recorded duration of every step in a session.
+
+    Args:
+        session: Session record from a store
+
+    Returns:
+        Step name -> duration in milliseconds
+    """
+    return {
+        step: entry['duration_ms']
+        for step, entry in session.get('steps', {}).items()
+    }
+
+class DynamoDBSessionStore:
+    """
+    KYC sessions stored as one DynamoDB item per session_id.
+
+    Each step is a key of the "steps" map, written with a condition so a
+    repeated step with the same fingerprint never overwrites the first result.
+    """
+
+    def __init__(self, table_name: str = SESSION_TABLE):
+        self.table_name = table_name
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self) -> Any:
+        # Built on first use so importing the orchestrator does not load boto3
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    import boto3
+
+                    table = boto3.resource('dynamodb', config=build_client_config('dynamodb')).Table(self.table_name)
+                    instrument_client(table.meta.client)
+                    self._table = table
+        return self._table
+
+    def create_session(self, session_id: str, attributes: Dict[str, Any]) -> bool:
+        now = int(time.time())
+        item = dict(attributes, session_id=session_id, steps={}, created_at=now,
+                    updated_at=now, expires_at=now + SESSION_TTL_SECONDS)
+        try:
+            self.table.put_item(
+                Item=to_dynamodb(item),
+                ConditionExpression='attribute_not_exists(session_id)'
+            )
+            return True
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        response = self.table.get_item(Key={'session_id': session_id}, ConsistentRead=True)
+        item = response.get('Item')
+        return from_dynamodb(item) if item is not None else None
+
+    def record_step(self, session_id: str, step: str, result: Dict[str, Any], duration_ms: float,
+                    fingerprint: Optional[str] = None) -> bool:
+        now = int(time.time())
+        entry = build_step_entry(result, duration_ms, fingerprint)
+        try:
+            # Sessions created before the store was enabled have no steps map yet
+            self.table.update_item(
+                Key={'session_id': session_id},
+                UpdateExpression='SET steps = if_not_exists(steps, :empty), updated_at = :now, '
+                                 'expires_at = if_not_exists(expires_at, :expires_at)',
+                ExpressionAttributeValues={
+                    ':empty': {},
+                    ':now': now,
+                    ':expires_at': now + SESSION_TTL_SECONDS
+                }
+            )
+            self.table.update_item(
+                Key={'session_id': session_id},
+                UpdateExpression='SET steps.#step = :entry',
+                ConditionExpression='attribute_not_exists(steps.#step) OR steps.#step.fingerprint <> :fingerprint',
+                ExpressionAttributeNames={'#step': step},
+                ExpressionAttributeValues={
+                    ':entry': to_dynamodb(entry),
+                    ':fingerprint': fingerprint
+                }
+            )
+            return True
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+class SQLiteSessionStore:
+    """
+    KYC sessions stored as JSON documents in SQLite.
+
+    Defaults to an in-memory database for tests and local runs; the write
+    conditions match DynamoDBSessionStore.
+    """
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        self.connection.commit()
+        self._lock = threading.Lock()
+
+    def _read(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute('SELECT data FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, session: Dict[str, Any]) -> None:
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sessions (session_id, data) VALUES (?, ?)',
+            (session['session_id'], json.dumps(session))
+        )
+        self.connection.commit()
+
+    def create_session(self, session_id: str, attributes: Dict[str, Any]) -> bool:
+        now = int(time.time())
+        with self._lock:
+            if self._read(session_id) is not None:
+                return False
+            self._write(dict(attributes, session_id=session_id, steps={}, created_at=now,
+                             updated_at=now, expires_at=now + SESSION_TTL_SECONDS))
+            return True
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read(session_id)
+
+    def record_step(self, session_id: str, step: str, result: Dict[str, Any], duration_ms: float,
+                    fingerprint: Optional[str] = None) -> bool:
+        now = int(time.time())
+        with self._lock:
+            session = self._read(session_id) or {
+                'session_id': session_id, 'steps': {}, 'created_at': now,
+                'expires_at': now + SESSION_TTL_SECONDS
+            }
+            existing = session['steps'].get(step)
+            if existing is not None and existing.get('fingerprint') == fingerprint:
+                return False
+            session['steps'][step] = build_step_entry(result, duration_ms, fingerprint)
+            session['updated_at'] = now
+            self._write(session)
+            return True
+
+# Backend name -> factory; additional backends can be registered here
+SESSION_STORES = {
+    'dynamodb': DynamoDBSessionStore,
+    'sqlite': SQLiteSessionStore
+}
+
+def build_session_store() -> Optional[Any]:
+    """
+    Build the session store from the environment configuration.
+
+    Returns:
+        Configured store, or None when session state is disabled
+    """
+    store_factory = SESSION_STORES.get(SESSION_STORE)
+    return store_factory() if store_factory is not None else None
+
+# Module-level store shared across warm invocations
+session_store = build_session_store()
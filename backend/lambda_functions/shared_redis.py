@@ -0,0 +1,158 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Callable, List, Optional
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Shared Redis (e.g. ElastiCache); without it every process uses its own LocalRedis
+REDIS_URL = os.environ.get('KYC_REDIS_URL', '')
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.environ.get('KYC_REDIS_SOCKET_TIMEOUT', '0.5'))
+
+class LocalScript:
+    """
+    Callable matching redis-py's Script, running a Python equivalent of the Lua source.
+    """
+
+    def __init__(self, store: 'LocalRedis', implementation: Callable):
+        self.store = store
+        self.implementation = implementation
+
+    def __call__(self, keys: Optional[List[str]] = None, args: Optional[List[Any]] = None) -> Any:
+        # Lua scripts run atomically in Redis; the store lock gives the same guarantee here
+        with self.store._lock:
+            return self.implementation(self.store, keys or [], args or [])
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis-py client used by the KYC functions.
+
+    Used for tests and local runs, and as the fallback when no Redis is
+    configured. Scripts are registered with a Python implementation of the
+    same Lua source via register_local_script.
+    """
+
+    # Lua source -> Python implementation taking (store, keys, args)
+    local_scripts: Dict[str, Callable] = {}
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.expires_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def register_local_script(cls, script: str, implementation: Callable) -> None:
+        cls.local_scripts[script] = implementation
+
+    def _expire(self, name: str) -> None:
+        expires_at = self.expires_at.get(name)
+        if expires_at is not None and expires_at <= time.time():
+            self.values.pop(name, None)
+            self.expires_at.pop(name, None)
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            self._expire(name)
+            return self.values.get(name)
+
+    def set(self, name: str, value: Any, ex: Optional[float] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            self._expire(name)
+            if nx and name in self.values:
+                return None
+            self.values[name] = value.encode() if isinstance(value, str) else value
+            if ex is not None:
+                self.expires_at[name] = time.time() + ex
+            else:
+                self.expires_at.pop(name, None)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            deleted = 0
+            for name in names:
+                self._expire(name)
+                if name in self.values:
+                    deleted += 1
+                self.values.pop(name, None)
+                self.expires_at.pop(name, None)
+            return deleted
+
+    def hmget(self, name: str, keys: List[str]) -> List[Optional[Any]]:
+        with self._lock:
+            self._expire(name)
+            fields = self.values.get(name) or {}
+            return [fields.get(key) for key in keys]
+
+    def hset(self, name: str, mapping: Dict[str, Any]) -> int:
+        with self._lock:
+            self._expire(name)
+            fields = self.values.setdefault(name, {})
+            added = len([key for key in mapping if key not in fields])
+            fields.update(mapping)
+            return added
+
+    def expire(self, name: str, seconds: float) -> bool:
+        with self._lock:
+            self._expire(name)
+            if name not in self.values:
+                return False
+            self.expires_at[name] = time.time() + seconds
+            return True
+
+    def time(self) -> List[int]:
+        now = time.time()
+        return [int(now), int((now % 1) * 1000000)]
+
+    def register_script(self, script: str) -> LocalScript:
+        implementation = self.local_scripts.get(script)
+        if implementation is None:
+            raise NotImplementedError('Script has no local implementation; register one with register_local_script')
+        return LocalScript(self, implementation)
+
+    def ping(self) -> bool:
+        return True
+
+def connect_redis(url: str = REDIS_URL) -> Any:
+    """
+    Connect to the shared Redis, falling back to an in-process LocalRedis.
+
+    Args:
+        url: Redis URL, e.g. "rediss://kyc-cache.xxxxxx.use1.cache.amazonaws.com:6379"
+
+    Returns:
+        redis-py client, or LocalRedis when no URL is set or redis is not installed
+    """
+    if not url:
+        return LocalRedis()
+
+    # Imported here so functions without a shared Redis never load the client library
+    try:
+        import redis
+    except ImportError:
+        logger.warning("KYC_REDIS_URL is set but the redis package is not installed; using in-process state")
+        return LocalRedis()
+
+    return redis.Redis.from_url(
+        url,
+        socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+        health_check_interval=30
+    )
+
+_client = None
+_lock = threading.Lock()
+
+def get_redis() -> Any:
+    """
+    Get the Redis client shared by the rate limiter and the result cache.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = connect_redis()
+    return _client
@@ -0,0 +1,92 @@
+import time
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List
+
+from instrumentation import ContextThreadPoolExecutor
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+@dataclass
+class Stage:
+    """
+    One node of a stage graph.
+
+    Attributes:
+        run: Called with the results of the dependencies, keyed by stage name
+        dependencies: Names of stages that must succeed before this one starts
+    """
+    run: Callable[[Dict[str, Any]], Any]
+    dependencies: List[str] = field(default_factory=list)
+
+@dataclass
+class StageGraphResult:
+    results: Dict[str, Any]
+    errors: Dict[str, str]
+    timings_ms: Dict[str, float]
+    total_ms: float
+
+def run_stage_graph(stages: Dict[str, Stage]) -> StageGraphResult:
+    """
+    Run stages as soon as their dependencies finish, running independent stages concurrently.
+
+    A stage whose dependency failed is skipped and reported in errors.
+
+    Args:
+        stages: Stage name -> Stage
+
+    Returns:
+        StageGraphResult with per-stage results, errors and timings
+    """
+    for name, stage in stages.items():
+        unknown = [dependency for dependency in stage.dependencies if dependency not in stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages: {unknown}")
+
+    results = {}
+    errors = {}
+    timings_ms = {}
+    started_at = {}
+    remaining = dict(stages)
+    graph_start = time.perf_counter()
+
+    def timed_run(name: str, stage: Stage) -> Any:
+        started_at[name] = time.perf_counter()
+        try:
+            return stage.run({dependency: results[dependency] for dependency in stage.dependencies})
+        finally:
+            timings_ms[name] = round((time.perf_counter() - started_at[name]) * 1000, 2)
+
+    with ContextThreadPoolExecutor(max_workers=max(len(stages), 1), thread_name_prefix='stage') as executor:
+        running = {}
+
+        while remaining or running:
+            for name, stage in list(remaining.items()):
+                failed = [dependency for dependency in stage.dependencies if dependency in errors]
+                if failed:
+                    errors[name] = f"Skipped: dependency {failed[0]} failed"
+                    del remaining[name]
+                elif all(dependency in results for dependency in stage.dependencies):
+                    running[executor.submit(timed_run, name, stage)] = name
+                    del remaining[name]
+
+            if not running:
+                # Only reachable with a dependency cycle
+                for name in remaining:
+                    errors[name] = 'Skipped: dependency cycle'
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Stage {name} failed: {str(e)}")
+                    errors[name] = str(e)
+
+    total_ms = round((time.perf_counter() - graph_start) * 1000, 2)
+    return StageGraphResult(results, errors, timings_ms, total_ms)
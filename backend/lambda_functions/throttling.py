@@ -0,0 +1,87 @@
+import time
+import random
+import threading
+import logging
+from typing import Any, Callable
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Error codes AWS services return when a request rate or quota is exceeded
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'SlowDown'
+}
+
+def is_throttling_error(error: Exception) -> bool:
+    """
+    Check whether an exception is an AWS throttling response.
+
+    Args:
+        error: Exception raised by a boto3 call
+
+    Returns:
+        True if the error code is a known throttling code
+    """
+    error_code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return error_code in THROTTLING_ERROR_CODES
+
+class AdaptiveBackoff:
+    """
+    Delay shared by every worker calling the same API.
+
+    The delay doubles each time a call is throttled and halves after each
+    success, so a pool of workers slows down together when the service pushes
+    back and recovers once it stops.
+    """
+
+    def __init__(self, base_delay: float = 0.2, max_delay: float = 20.0, max_attempts: int = 6):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.delay = 0.0
+        self.throttle_count = 0
+        self._lock = threading.Lock()
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.throttle_count += 1
+            self.delay = min(max(self.delay * 2, self.base_delay), self.max_delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base_delay else 0.0
+
+    def wait(self) -> None:
+        delay = self.delay
+        if delay > 0:
+            # Full jitter keeps workers from retrying in lockstep
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn, retrying throttled attempts with the shared backoff delay.
+
+        Args:
+            fn: Function making the AWS call
+            *args, **kwargs: Arguments passed to fn
+
+        Returns:
+            Return value of fn
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.wait()
+            try:
+                result = fn(*args, **kwargs)
+                self.on_success()
+                return result
+            except Exception as e:
+                if not is_throttling_error(e) or attempt == self.max_attempts:
+                    raise
+                self.on_throttle()
+                logger.warning(f"Throttled on attempt {attempt}, backing off {self.delay:.2f}s: {str(e)}")
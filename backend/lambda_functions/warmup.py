@@ -0,0 +1,42 @@
+import time
+import importlib
+import logging
+from typing import Dict, Any, Iterable
+
+from aws_clients import warm_clients
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def is_warm_event(event: Dict[str, Any]) -> bool:
+    """
+    Check for a warmer event, e.g. from a scheduled rule or after provisioned concurrency starts.
+    """
+    return isinstance(event, dict) and event.get('action') == 'warm'
+
+def warm(service_names: Iterable[str], module_names: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Import deferred modules and build AWS clients ahead of real traffic.
+
+    Args:
+        service_names: boto3 services whose shared clients to build
+        module_names: Modules imported lazily by the handlers, e.g. "PIL.Image"
+
+    Returns:
+        Response body with the time spent on each import and client
+    """
+    imports_ms = {}
+    for module_name in module_names:
+        started_at = time.perf_counter()
+        importlib.import_module(module_name)
+        imports_ms[module_name] = round((time.perf_counter() - started_at) * 1000, 2)
+
+    clients_ms = warm_clients(sorted(set(service_names)))
+    logger.info(f"Warmed clients {clients_ms} and imports {imports_ms}")
+
+    return {
+        'clients_ms': clients_ms,
+        'imports_ms': imports_ms,
+        'status': 'WARM'
+    }